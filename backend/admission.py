@@ -0,0 +1,68 @@
+"""
+Admission control for the asynchronous server
+Blocking work is handed to a thread pool, but only up to a fixed number of
+in-flight tasks; beyond that, callers are refused right away so the server
+can answer 429 instead of building an unbounded backlog.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when the pool has no room for another task"""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work once max_pending tasks are in flight
+
+    The slot is released when the task actually finishes, not when the
+    caller gives up waiting, so timed-out requests still count against the
+    limit until their thread is free again. Must be used from one event loop.
+    """
+
+    def __init__(self, max_workers, max_pending, name='pool', metrics=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.name = name
+        self.metrics = metrics
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn, *args, timeout=None):
+        """Run fn(*args) on the pool, raising Overloaded or asyncio.TimeoutError"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            if self.metrics:
+                self.metrics.increment(f'{self.name}.rejected')
+            raise Overloaded()
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self._record_pending()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        future.add_done_callback(self._release)
+        # shield() keeps the task (and its slot) alive after a timeout
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def _release(self, future):
+        """Free the slot of a finished task"""
+        self.pending -= 1
+        self._record_pending()
+
+    def _record_pending(self):
+        if self.metrics:
+            self.metrics.set_gauge(f'{self.name}.pending', self.pending)
+
+    def stats(self):
+        """Pool size and admission counters for /metrics"""
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
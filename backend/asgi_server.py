@@ -0,0 +1,158 @@
+"""
+Asynchronous (ASGI) front end for the FinAnswer API
+Usage: uvicorn asgi_server:app --host 0.0.0.0 --port 5001
+
+Request handling runs on the event loop; the blocking model work runs on a
+bounded thread pool. When that pool and its pending queue are full, new
+inference requests are rejected immediately with 429 and a Retry-After
+header instead of piling up. /health never touches the pool and /feedback
+has its own small pool, so neither waits behind inference.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import server as core
+from admission import BoundedExecutor, Overloaded
+from scheduler import QueueFullError, SchedulerTimeoutError
+
+# Threads blocked on model work (each waits on the micro-batcher, so more
+# threads mean larger batches, not more concurrent forward passes)
+INFERENCE_WORKERS = int(os.environ.get('FINANSWER_ASGI_INFERENCE_WORKERS', '16'))
+# Requests allowed in flight (running + waiting for a thread) before 429
+MAX_PENDING = int(os.environ.get('FINANSWER_ASGI_MAX_PENDING', '64'))
+REQUEST_TIMEOUT = float(os.environ.get('FINANSWER_ASGI_REQUEST_TIMEOUT', str(core.INFERENCE_TIMEOUT)))
+RETRY_AFTER_SECONDS = int(os.environ.get('FINANSWER_ASGI_RETRY_AFTER', '1'))
+FEEDBACK_WORKERS = int(os.environ.get('FINANSWER_ASGI_FEEDBACK_WORKERS', '2'))
+
+
+inference_pool = BoundedExecutor(INFERENCE_WORKERS, MAX_PENDING, 'inference', core.metrics)
+feedback_pool = ThreadPoolExecutor(max_workers=FEEDBACK_WORKERS, thread_name_prefix='feedback')
+
+
+def busy_response():
+    """429 telling the client when to retry"""
+    return JSONResponse(
+        {'error': 'Server busy, please retry'},
+        status_code=429,
+        headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
+    )
+
+
+async def read_json(request):
+    """Parse the request body, returning None for invalid JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def run_inference(handler, request):
+    """Run a blocking analysis handler on the bounded pool"""
+    data = await read_json(request)
+    try:
+        payload, status = await inference_pool.run(handler, data, timeout=REQUEST_TIMEOUT)
+        return JSONResponse(payload, status_code=status)
+    except (Overloaded, QueueFullError, SchedulerTimeoutError):
+        return busy_response()
+    except asyncio.TimeoutError:
+        core.metrics.increment('inference.timeouts')
+        return JSONResponse({'error': 'Inference timed out'}, status_code=504)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return JSONResponse({'error': 'Internal server error'}, status_code=500)
+
+
+async def analyze_sentiment(request):
+    return await run_inference(core.handle_analyze, request)
+
+
+async def analyze_batch(request):
+    return await run_inference(core.handle_analyze_batch, request)
+
+
+async def submit_feedback(request):
+    """Store feedback on its own pool so it never queues behind inference"""
+    data = await read_json(request)
+    loop = asyncio.get_running_loop()
+    try:
+        payload, status = await loop.run_in_executor(feedback_pool, core.handle_feedback, data)
+        return JSONResponse(payload, status_code=status)
+    except Exception as e:
+        print(f"Error processing feedback: {str(e)}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+
+
+async def get_feedback(request):
+    """Look up one feedback submission by id (may scan log segments, so off the loop)"""
+    loop = asyncio.get_running_loop()
+    payload, status = await loop.run_in_executor(
+        feedback_pool, core.handle_feedback_lookup, request.path_params['feedback_id']
+    )
+    return JSONResponse(payload, status_code=status)
+
+
+async def feedback_statistics(request):
+    """Feedback counters merged across workers (reads the snapshot files)"""
+    try:
+        hours = int(request.query_params.get('hours', 24))
+    except ValueError:
+        hours = 24
+    loop = asyncio.get_running_loop()
+    payload = await loop.run_in_executor(feedback_pool, core.feedback_statistics.statistics, hours)
+    return JSONResponse(payload)
+
+
+async def health_check(request):
+    return JSONResponse({'status': 'healthy', 'model_loaded': True})
+
+
+async def get_metrics(request):
+    """Runtime metrics plus the state of the inference pool"""
+    payload = core.metrics_payload()
+    payload['asgi'] = dict(
+        inference_pool.stats(),
+        request_timeout=REQUEST_TIMEOUT,
+        feedback_workers=FEEDBACK_WORKERS
+    )
+    return JSONResponse(payload)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if core.classifier is None:
+        # Deferred load (e.g. FINANSWER_DEFER_MODEL_LOAD=1): load once per worker process
+        await asyncio.get_running_loop().run_in_executor(None, core.load_inference_backend)
+    yield
+    inference_pool.shutdown()
+    feedback_pool.shutdown(wait=True)
+    # Persist whatever is still queued for the background feedback writer
+    await asyncio.get_running_loop().run_in_executor(None, core.feedback_writer.close)
+
+
+app = Starlette(
+    routes=[
+        Route('/analyze', analyze_sentiment, methods=['POST']),
+        Route('/analyze/batch', analyze_batch, methods=['POST']),
+        Route('/feedback', submit_feedback, methods=['POST']),
+        Route('/feedback/statistics', feedback_statistics, methods=['GET']),
+        Route('/feedback/{feedback_id}', get_feedback, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', get_metrics, methods=['GET'])
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', '5001')))
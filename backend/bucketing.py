@@ -0,0 +1,53 @@
+"""
+Shared batching utilities: length bucketing and dynamic padding
+Used by serving, bulk scoring and retraining so each batch is padded only to
+its own longest sequence (rounded up to a hardware-friendly multiple).
+"""
+
+import numpy as np
+
+
+def round_up(length, multiple):
+    """Round a length up to the next multiple"""
+    if multiple <= 1:
+        return length
+    return ((length + multiple - 1) // multiple) * multiple
+
+
+def pad_batch(sequences, pad_id=0, multiple=8, max_length=512):
+    """Pad token id lists to the batch maximum
+
+    Returns ``(input_ids, attention_mask)`` as int32 arrays whose width is the
+    longest sequence rounded up to ``multiple`` and capped at ``max_length``.
+    """
+    longest = max(len(ids) for ids in sequences)
+    width = min(round_up(longest, multiple), max(max_length, longest))
+    input_ids = np.full((len(sequences), width), pad_id, dtype=np.int32)
+    attention_mask = np.zeros((len(sequences), width), dtype=np.int32)
+    for row, ids in enumerate(sequences):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    return input_ids, attention_mask
+
+
+def bucket_by_length(lengths, max_batch_size=32, max_tokens=None):
+    """Group indices into batches of similar length
+
+    Indices are sorted by length and cut into batches of at most
+    ``max_batch_size`` items; with ``max_tokens`` a batch is also closed once
+    its padded size (items x longest) would exceed the token budget.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for index in order:
+        if current:
+            padded_tokens = (len(current) + 1) * lengths[index]
+            if len(current) >= max_batch_size or (max_tokens and padded_tokens > max_tokens):
+                batches.append(current)
+                current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
@@ -0,0 +1,60 @@
+"""
+Long-document support: overlapping token windows and chunk score aggregation
+"""
+
+import numpy as np
+
+AGGREGATION_METHODS = ('mean', 'weighted', 'max_confidence')
+
+
+def split_into_windows(token_ids, window_size=510, stride=128):
+    """Split content token ids into overlapping windows
+
+    ``window_size`` excludes the [CLS]/[SEP] tokens added per chunk and
+    consecutive windows share ``stride`` tokens of context.
+    """
+    if window_size <= stride:
+        raise ValueError("window_size must be larger than stride")
+    if len(token_ids) <= window_size:
+        return [list(token_ids)]
+
+    windows = []
+    step = window_size - stride
+    start = 0
+    while True:
+        windows.append(list(token_ids[start:start + window_size]))
+        if start + window_size >= len(token_ids):
+            break
+        start += step
+    return windows
+
+
+def select_windows(count, max_chunks):
+    """Indices of at most ``max_chunks`` windows spread evenly over ``count``
+
+    The first and last windows are always kept, so a capped document is
+    still sampled from beginning to end instead of only its opening part.
+    """
+    if count <= max_chunks:
+        return list(range(count))
+    if max_chunks <= 1:
+        return [0]
+    return [int(index) for index in np.linspace(0, count - 1, max_chunks).round()]
+
+
+def aggregate_chunk_scores(probabilities, lengths, method='mean'):
+    """Combine per-chunk class probabilities into document scores
+
+    mean           - unweighted average over chunks
+    weighted       - average weighted by chunk token count
+    max_confidence - scores of the single most confident chunk
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    if method == 'mean':
+        return probabilities.mean(axis=0)
+    if method == 'weighted':
+        weights = np.asarray(lengths, dtype=np.float64)
+        return (probabilities * weights[:, None]).sum(axis=0) / weights.sum()
+    if method == 'max_confidence':
+        return probabilities[np.argmax(probabilities.max(axis=1))]
+    raise ValueError(f"Unknown aggregation method: {method}")
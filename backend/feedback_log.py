@@ -0,0 +1,300 @@
+"""
+Append-only feedback log
+Feedback records are appended as JSON lines to segment files under
+feedback_data/log/. Every process writes its own active segment (so gunicorn
+workers never interleave writes), segments rotate at a size limit, and each
+segment has a companion .idx file of record start offsets for random access.
+fsync is batched: at most every ``sync_every`` records or ``sync_interval``
+seconds of appends, and on close. Lookups by feedback_id go through ids.sqlite,
+an index that readers extend with the records appended since the last lookup.
+"""
+
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+LOG_DIRNAME = 'log'
+SEGMENT_SUFFIX = '.jsonl'
+INDEX_SUFFIX = '.idx'
+LEGACY_PREFIX = 'feedback_'
+ID_INDEX_FILENAME = 'ids.sqlite'
+
+# One little-endian uint64 byte offset per record
+_OFFSET = struct.Struct('<Q')
+
+
+def log_directory(feedback_dir):
+    """Directory holding the log segments of a feedback directory"""
+    return os.path.join(feedback_dir, LOG_DIRNAME)
+
+
+class FeedbackLog:
+    """Thread-safe appender writing this process's segments"""
+
+    def __init__(self, directory, segment_max_bytes=64 * 1024 * 1024, sync_every=32, sync_interval=1.0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.segment = None
+        self._data = None
+        self._index = None
+        self._size = 0
+        self._records = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open_segment(self):
+        """Start a new segment named by creation time and pid, so names sort chronologically"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment = f"{time.time_ns():020d}-{os.getpid()}"
+        path = os.path.join(self.directory, self.segment)
+        self._data = open(path + SEGMENT_SUFFIX, 'ab')
+        self._index = open(path + INDEX_SUFFIX, 'ab')
+        self._size = 0
+        self._records = 0
+        self._pid = os.getpid()
+
+    def append(self, record):
+        """Append one record and return its (segment, record number)"""
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """Append records under one lock and return their (segment, record number)"""
+        lines = [(json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8') for record in records]
+        locations = []
+        with self._lock:
+            offsets = []
+            for line in lines:
+                if self._pid != os.getpid():
+                    # First write, or first write after a fork: never share the parent's segment
+                    self._open_segment()
+                elif self._size and self._size + len(line) > self.segment_max_bytes:
+                    self._write_index(offsets)
+                    offsets = []
+                    self._close_segment()
+                    self._open_segment()
+
+                self._data.write(line)
+                offsets.append(self._size)
+                locations.append((self.segment, self._records))
+                self._size += len(line)
+                self._records += 1
+                self._pending += 1
+
+            self._write_index(offsets)
+            if self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+            return locations
+
+    def _write_index(self, offsets):
+        """Index entries go out after their data, so they never point at a partial line"""
+        self._data.flush()
+        self._index.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+        self._index.flush()
+
+    def _sync(self):
+        """fsync the active segment and its index"""
+        if self._pending:
+            os.fsync(self._data.fileno())
+            os.fsync(self._index.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _close_segment(self):
+        self._sync()
+        self._data.close()
+        self._index.close()
+
+    def sync(self):
+        """Force pending records to disk"""
+        with self._lock:
+            if self._data is not None and self._pid == os.getpid():
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._data is not None and self._pid == os.getpid():
+                self._close_segment()
+            self._data = None
+            self._pid = None
+
+
+class FeedbackLogReader:
+    """Streams records from every segment in chronological order"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self):
+        """Segment names, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            filename[:-len(SEGMENT_SUFFIX)]
+            for filename in os.listdir(self.directory)
+            if filename.endswith(SEGMENT_SUFFIX)
+        )
+
+    def active_segments(self):
+        """Segments another running process may still append to
+
+        Segment names end in the writer's pid, and a writer only appends to
+        its newest segment, so that one is active while the pid is alive.
+        Only processes on this host can be checked.
+        """
+        newest = {}
+        for segment in self.segments():
+            newest[segment.rsplit('-', 1)[-1]] = segment
+        active = set()
+        for pid, segment in newest.items():
+            if pid.isdigit() and int(pid) != os.getpid() and _process_alive(int(pid)):
+                active.add(segment)
+        return active
+
+    def __iter__(self):
+        for segment in self.segments():
+            yield from self.iter_segment(segment)
+
+    def iter_segment(self, segment):
+        """Yield the records of one segment, stopping at a torn final line"""
+        for _, record in self.iter_segment_from(segment):
+            yield record
+
+    def iter_segment_from(self, segment, offset=0):
+        """Yield (offset after the record, record) from a byte offset onwards
+
+        The offset only moves past complete lines, so a reader can resume
+        from the last value it saw even if the segment was mid-append.
+        """
+        with open(os.path.join(self.directory, segment + SEGMENT_SUFFIX), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    print(f"⚠️ Skipping corrupt feedback record in {segment}")
+
+    def find(self, feedback_id):
+        """Record with the given feedback_id, or None (through the id index)"""
+        if not self.segments():
+            return None
+        index = FeedbackIdIndex(self.directory)
+        try:
+            index.update(self)
+            return index.lookup(feedback_id)
+        finally:
+            index.close()
+
+    def count(self):
+        """Number of indexed records, without reading the segments"""
+        return sum(
+            os.path.getsize(os.path.join(self.directory, segment + INDEX_SUFFIX)) // _OFFSET.size
+            for segment in self.segments()
+            if os.path.exists(os.path.join(self.directory, segment + INDEX_SUFFIX))
+        )
+
+    def read(self, segment, number):
+        """Random access to one record through the offset index"""
+        path = os.path.join(self.directory, segment)
+        with open(path + INDEX_SUFFIX, 'rb') as index:
+            index.seek(number * _OFFSET.size)
+            entry = index.read(_OFFSET.size)
+        if len(entry) != _OFFSET.size:
+            raise IndexError(f"record {number} not in segment {segment}")
+        with open(path + SEGMENT_SUFFIX, 'rb') as f:
+            f.seek(_OFFSET.unpack(entry)[0])
+            return json.loads(f.readline())
+
+
+class FeedbackIdIndex:
+    """SQLite map of feedback_id to (segment, byte offset) for a log directory
+
+    Writers never touch it: ``update`` indexes whatever was appended since the
+    last call, from a per-segment watermark, and forgets segments that were
+    migrated or archived. Each record is indexed once, so a lookup costs the
+    new records plus one B-tree search instead of a scan of the whole log.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._conn = sqlite3.connect(os.path.join(directory, ID_INDEX_FILENAME), timeout=30,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS ids "
+                           "(feedback_id TEXT PRIMARY KEY, segment TEXT NOT NULL, offset INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS segments (segment TEXT PRIMARY KEY, offset INTEGER NOT NULL)")
+
+    def update(self, reader):
+        """Index the records appended since the previous update"""
+        segments = reader.segments()
+        # One writer at a time; a concurrent reader waits and then finds little left to do
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexed = dict(self._conn.execute("SELECT segment, offset FROM segments"))
+            for segment in set(indexed) - set(segments):
+                self._conn.execute("DELETE FROM ids WHERE segment = ?", (segment,))
+                self._conn.execute("DELETE FROM segments WHERE segment = ?", (segment,))
+            for segment in segments:
+                start = indexed.get(segment, 0)
+                if os.path.getsize(os.path.join(self.directory, segment + SEGMENT_SUFFIX)) <= start:
+                    continue
+                rows, end = [], start
+                for end, record in reader.iter_segment_from(segment, start):
+                    if record.get('feedback_id'):
+                        rows.append((record['feedback_id'], segment, start))
+                    start = end
+                self._conn.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO segments VALUES (?, ?)", (segment, end))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def lookup(self, feedback_id):
+        """Read the indexed record, or None"""
+        row = self._conn.execute("SELECT segment, offset FROM ids WHERE feedback_id = ?", (feedback_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, row[0] + SEGMENT_SUFFIX), 'rb') as f:
+                f.seek(row[1])
+                record = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+        return record if record.get('feedback_id') == feedback_id else None
+
+    def close(self):
+        self._conn.close()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+def iter_legacy_files(feedback_dir):
+    """Yield (filename, record) for the old one-file-per-submission format"""
+    if not os.path.isdir(feedback_dir):
+        return
+    for filename in sorted(os.listdir(feedback_dir)):
+        if filename.endswith('.json') and filename.startswith(LEGACY_PREFIX):
+            try:
+                with open(os.path.join(feedback_dir, filename), 'r', encoding='utf-8') as f:
+                    yield filename, json.load(f)
+            except Exception as e:
+                print(f"⚠️ Could not read {filename}: {e}")
+
@@ -0,0 +1,196 @@
+"""
+Write-behind feedback ingestion
+/feedback hands records to a bounded in-memory queue and returns at once; a
+background thread persists them to the feedback store in batches (one
+append_many plus one sync per batch). When the queue is full the record is
+spilled: written straight to the store and synced before the request
+returns. A batch the store still rejects after retrying goes to one JSON file
+per record in the legacy format, which every feedback reader also picks up,
+so accepted feedback is never dropped. close() drains the queue.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from feedback_log import LEGACY_PREFIX
+
+_STOP = object()
+
+
+class FeedbackWriter:
+    """Batching background writer in front of a feedback store
+
+    ``on_written`` is called from the writer thread with each persisted batch
+    and the locations the store returned for it. The thread is started lazily
+    so the writer can be created before a pre-forking server spawns workers.
+    ``fallback_dir`` receives batches the store keeps failing on.
+    """
+
+    def __init__(self, store, max_queue_size=10000, max_batch_size=256, max_wait_ms=50,
+                 on_written=None, metrics=None, fallback_dir=None):
+        self.store = store
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_written = on_written
+        self.metrics = metrics
+        self.fallback_dir = fallback_dir
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def config(self):
+        return {
+            'max_queue_size': self.max_queue_size,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0
+        }
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, record):
+        """Queue one record for writing; spill synchronously if the queue is full"""
+        self._ensure_started()
+        feedback_id = record.get('feedback_id')
+        if feedback_id:
+            self._pending[feedback_id] = record
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._spill(record)
+            return
+        if self.metrics:
+            self.metrics.set_gauge('feedback.queue_depth', self._queue.qsize())
+
+    def pending(self, feedback_id):
+        """A record that is accepted but not yet written, or None"""
+        return self._pending.get(feedback_id)
+
+    def _spill(self, record):
+        """Write one record in the caller's thread and force it to disk"""
+        try:
+            locations = self.store.append_many([record])
+            self.store.sync()
+        finally:
+            self._pending.pop(record.get('feedback_id'), None)
+        if self.metrics:
+            self.metrics.increment('feedback.spilled')
+        self._written([record], locations)
+
+    def _ensure_started(self):
+        """Start the writer thread once per process"""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                # A forked child inherits the parent's queue but not its thread
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+                self._pending = {}
+            self._worker = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _collect_batch(self):
+        """Block for the first record, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Writer loop: collect a batch, persist it, repeat until stopped"""
+        while True:
+            batch = self._collect_batch()
+            stopping = batch[-1] is _STOP
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                self._write(records)
+            if stopping:
+                break
+
+    def _write(self, records, attempts=3):
+        """Persist one batch, retrying transient store errors"""
+        started = time.monotonic()
+        for attempt in range(attempts):
+            try:
+                locations = self.store.append_many(records)
+                self.store.sync()
+                break
+            except Exception as e:
+                print(f"Error writing feedback batch (attempt {attempt + 1}/{attempts}): {e}")
+                time.sleep(0.1 * 2 ** attempt)
+        else:
+            if self.metrics:
+                self.metrics.increment('feedback.write_errors', len(records))
+            self._write_fallback(records)
+            return
+
+        for record in records:
+            self._pending.pop(record.get('feedback_id'), None)
+        if self.metrics:
+            self.metrics.increment('feedback.written', len(records))
+            self.metrics.observe('feedback.batch_size', len(records))
+            self.metrics.observe('feedback.batch_latency_ms', (time.monotonic() - started) * 1000.0)
+            self.metrics.set_gauge('feedback.queue_depth', self._queue.qsize())
+        self._written(records, locations)
+
+    def _write_fallback(self, records):
+        """Save a batch the store rejected as legacy one-file-per-record JSON"""
+        lost = records
+        if self.fallback_dir:
+            lost = []
+            os.makedirs(self.fallback_dir, exist_ok=True)
+            for record in records:
+                name = f"{LEGACY_PREFIX}{record.get('feedback_id') or uuid.uuid4()}.json"
+                path = os.path.join(self.fallback_dir, name)
+                try:
+                    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                        json.dump(record, f, ensure_ascii=False)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(path + '.tmp', path)
+                except Exception as e:
+                    print(f"Error writing feedback fallback file {path}: {e}")
+                    lost.append(record)
+            if self.metrics and len(records) > len(lost):
+                self.metrics.increment('feedback.fallback_written', len(records) - len(lost))
+            if len(records) > len(lost):
+                print(f"⚠️ Feedback store unavailable: {len(records) - len(lost)} record(s) saved to {self.fallback_dir}")
+        if lost:
+            print(f"🚨 LOST {len(lost)} feedback record(s): "
+                  f"{', '.join(str(record.get('feedback_id')) for record in lost)}")
+            if self.metrics:
+                self.metrics.increment('feedback.lost', len(lost))
+        for record in records:
+            self._pending.pop(record.get('feedback_id'), None)
+
+    def _written(self, records, locations):
+        if self.on_written:
+            try:
+                self.on_written(records, locations)
+            except Exception as e:
+                print(f"Error in feedback callback: {e}")
+
+    def close(self, timeout=30):
+        """Write everything still queued, then stop the thread"""
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
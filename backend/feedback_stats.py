@@ -0,0 +1,269 @@
+"""
+Incremental feedback statistics
+Every /feedback call bumps in-memory counters; nothing touches disk on the
+request path. Each thread increments its own shard, so recording needs no
+lock. A background thread per process writes the process's cumulative
+counters as a snapshot file under feedback_data/stats/ on an interval, and
+readers merge the snapshots of every worker. Snapshots of processes that
+have exited are folded into a base file so the directory does not grow
+with worker restarts.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+
+BASE_FILENAME = 'base.json'
+LOCK_FILENAME = '.lock'
+SNAPSHOT_SUFFIX = '.snapshot.json'
+HIGH_CONFIDENCE = 0.8
+
+
+class FeedbackCounters:
+    """Per-thread counter shards; only the owning thread writes a shard"""
+
+    def __init__(self, high_confidence=HIGH_CONFIDENCE):
+        self.high_confidence = high_confidence
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # taken once per thread, not per record
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def record(self, feedback, now=None):
+        """Count one feedback submission"""
+        shard = self._shard()
+        hour = time.strftime('%Y-%m-%dT%H', time.gmtime(now))
+        keys = ['total_feedback', f'hour:{hour}:total', f"sentiment:{feedback.get('predicted_sentiment')}"]
+        if feedback.get('user_feedback') == 'accurate':
+            keys += ['accurate_predictions', f'hour:{hour}:accurate']
+        else:
+            keys += ['inaccurate_predictions', f'hour:{hour}:inaccurate']
+            if (feedback.get('predicted_confidence') or 0) > self.high_confidence:
+                keys.append('high_confidence_errors')
+        for key in keys:
+            shard[key] = shard.get(key, 0) + 1
+
+    def totals(self):
+        """Sum of every shard (dict.copy() is atomic under the GIL)"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        return merge_counts(shard.copy() for shard in shards)
+
+    def reset(self):
+        """Drop all shards, e.g. in a freshly forked child"""
+        with self._shards_lock:
+            self._shards = []
+        self._local = threading.local()
+
+
+def merge_counts(parts):
+    totals = {}
+    for part in parts:
+        for key, value in part.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def counts_from_legacy(stats):
+    """Flat counters from an old statistics.json document"""
+    counts = {
+        key: stats.get(key, 0)
+        for key in ('total_feedback', 'accurate_predictions', 'inaccurate_predictions', 'high_confidence_errors')
+    }
+    for sentiment, count in stats.get('sentiment_distribution', {}).items():
+        counts[f'sentiment:{sentiment}'] = count
+    return counts
+
+
+def statistics_payload(counts, hours=24, now=None):
+    """statistics.json-style document from flat counters, with the last N hourly buckets"""
+    total = counts.get('total_feedback', 0)
+    accurate = counts.get('accurate_predictions', 0)
+    hourly = {}
+    for key, value in counts.items():
+        if key.startswith('hour:'):
+            _, hour, field = key.split(':')
+            hourly.setdefault(hour, {'total': 0, 'accurate': 0, 'inaccurate': 0})[field] = value
+    recent = {}
+    if hours > 0:
+        cutoff = time.strftime('%Y-%m-%dT%H', time.gmtime((time.time() if now is None else now) - (hours - 1) * 3600))
+        recent = {hour: hourly[hour] for hour in sorted(hourly) if hour >= cutoff}
+    return {
+        "total_feedback": total,
+        "accurate_predictions": accurate,
+        "inaccurate_predictions": counts.get('inaccurate_predictions', 0),
+        "accuracy_rate": accurate / total if total else 0.0,
+        "high_confidence_errors": counts.get('high_confidence_errors', 0),
+        "sentiment_distribution": {
+            key[len('sentiment:'):]: value for key, value in sorted(counts.items()) if key.startswith('sentiment:')
+        },
+        "hourly": recent
+    }
+
+
+def _write_json(path, document):
+    """Atomic replace, so readers never see a half-written file"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(document, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FeedbackStatistics:
+    """Counters of this process plus interval snapshots merged across workers
+
+    ``legacy_file`` is an old statistics.json whose totals seed the base the
+    first time the snapshot directory is compacted.
+    """
+
+    def __init__(self, directory, legacy_file=None, flush_interval=5.0, high_confidence=HIGH_CONFIDENCE):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self.flush_interval = flush_interval
+        self.counters = FeedbackCounters(high_confidence)
+        self._pid = None
+        self._snapshot = None
+        self._flushed = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Per-process setup on first use (and again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked child: the parent's counts belong to the parent's snapshot
+                self.counters.reset()
+            self._snapshot = os.path.join(self.directory, f"{time.time_ns():020d}-{os.getpid()}{SNAPSHOT_SUFFIX}")
+            self._flushed = None
+            self._stop = threading.Event()
+            if self.flush_interval > 0:
+                self._thread = threading.Thread(target=self._flush_loop, name='feedback-stats', daemon=True)
+                self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, feedback):
+        """Count one submission; no I/O"""
+        self._ensure_started()
+        self.counters.record(feedback)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing feedback statistics: {e}")
+
+    def flush(self):
+        """Write this process's snapshot if it changed, then fold in exited workers"""
+        if self._pid != os.getpid():
+            return
+        counts = self.counters.totals()
+        if counts and counts != self._flushed:
+            os.makedirs(self.directory, exist_ok=True)
+            _write_json(self._snapshot, {'pid': os.getpid(), 'updated': time.time(), 'counts': counts})
+            self._flushed = counts
+        self.compact()
+
+    def compact(self):
+        """Fold snapshots of exited processes (and a legacy statistics.json) into the base file"""
+        if not os.path.isdir(self.directory):
+            return
+        with open(os.path.join(self.directory, LOCK_FILENAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            base_path = os.path.join(self.directory, BASE_FILENAME)
+            base = _read_json(base_path)
+            changed = base is None
+            if base is None:
+                legacy = _read_json(self.legacy_file) if self.legacy_file else None
+                base = {'counts': counts_from_legacy(legacy) if legacy else {}}
+
+            # Snapshots already folded in: a crash after the base was written but
+            # before the files were removed must not count them twice
+            folded = set(base.get('folded', []))
+            dead = []
+            for filename in os.listdir(self.directory):
+                if filename.endswith(SNAPSHOT_SUFFIX):
+                    pid = int(filename[:-len(SNAPSHOT_SUFFIX)].rsplit('-', 1)[1])
+                    if pid != os.getpid() and not _process_alive(pid):
+                        dead.append(filename)
+            for filename in dead:
+                if filename not in folded:
+                    snapshot = _read_json(os.path.join(self.directory, filename))
+                    if snapshot:
+                        base['counts'] = merge_counts([base['counts'], snapshot['counts']])
+                changed = True
+
+            if changed:
+                base['folded'] = dead
+                base['updated'] = time.time()
+                _write_json(base_path, base)
+                for filename in dead:
+                    os.remove(os.path.join(self.directory, filename))
+
+    def totals(self):
+        """Counts merged over the base, every worker's snapshot and this process's live counters"""
+        parts = []
+        base = _read_json(os.path.join(self.directory, BASE_FILENAME))
+        folded = set()
+        if base:
+            parts.append(base['counts'])
+            folded = set(base.get('folded', []))
+        elif self.legacy_file:
+            legacy = _read_json(self.legacy_file)
+            if legacy:
+                parts.append(counts_from_legacy(legacy))
+        if os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                path = os.path.join(self.directory, filename)
+                if filename.endswith(SNAPSHOT_SUFFIX) and filename not in folded and path != self._snapshot:
+                    snapshot = _read_json(path)
+                    if snapshot:
+                        parts.append(snapshot['counts'])
+        if self._pid == os.getpid():
+            parts.append(self.counters.totals())
+        return merge_counts(parts)
+
+    def statistics(self, hours=24):
+        return statistics_payload(self.totals(), hours)
+
+    def close(self):
+        """Stop the flusher and write a final snapshot"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
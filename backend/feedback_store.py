@@ -0,0 +1,340 @@
+"""
+Feedback storage backends
+'log' is the append-only segmented JSONL log (feedback_log.py); 'sqlite'
+keeps feedback in a WAL-mode SQLite database whose indexed columns
+(timestamp, predicted_sentiment, user_feedback, confidence) answer filtered
+queries and aggregate statistics without scanning every record.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from feedback_log import FeedbackLog, FeedbackLogReader, iter_legacy_files, log_directory
+
+FEEDBACK_BACKENDS = ('log', 'sqlite')
+DB_FILENAME = 'feedback.db'
+HIGH_CONFIDENCE = 0.8
+
+
+def parse_timestamp(value, default=None):
+    """ISO-8601 timestamp (as sent by the extension) to epoch seconds"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return default
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class SQLiteFeedbackStore:
+    """Feedback table in SQLite with one row per submission"""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Connection for this process (connections must not cross a fork)"""
+        if self._db_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db_pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "feedback_id TEXT, "
+                "timestamp REAL NOT NULL, "
+                "predicted_sentiment TEXT, "
+                "user_feedback TEXT, "
+                "confidence REAL, "
+                "record TEXT NOT NULL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(feedback)")}
+            if 'feedback_id' not in columns:
+                self._db.execute("ALTER TABLE feedback ADD COLUMN feedback_id TEXT")
+            self._ensure_unique_feedback_id()
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback(timestamp)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_feedback_sentiment ON feedback(predicted_sentiment)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_feedback_user_feedback ON feedback(user_feedback, timestamp)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_feedback_confidence ON feedback(confidence)")
+            self._db.commit()
+        return self._db
+
+    def _ensure_unique_feedback_id(self):
+        """One row per feedback_id, so importing the same records twice adds nothing
+
+        Databases created before the unique index may hold duplicates from
+        repeated migrations; the oldest row of each feedback_id is kept.
+        """
+        exists = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_feedback_feedback_id_unique'"
+        ).fetchone()
+        if exists:
+            return
+        with self._db:
+            self._db.execute(
+                "DELETE FROM feedback WHERE feedback_id IS NOT NULL AND id NOT IN "
+                "(SELECT MIN(id) FROM feedback WHERE feedback_id IS NOT NULL GROUP BY feedback_id)"
+            )
+            self._db.execute("DROP INDEX IF EXISTS idx_feedback_feedback_id")
+            self._db.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_feedback_feedback_id_unique "
+                "ON feedback(feedback_id) WHERE feedback_id IS NOT NULL"
+            )
+
+    def append(self, record):
+        """Insert one record and return its row id"""
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """Insert records in one transaction and return their row ids
+
+        A record whose feedback_id is already stored is skipped and the
+        existing row id is returned in its place.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            ids = []
+            with db:
+                for record in records:
+                    cursor = db.execute(
+                        "INSERT OR IGNORE INTO feedback (feedback_id, timestamp, predicted_sentiment, user_feedback, confidence, record) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            record.get('feedback_id'),
+                            parse_timestamp(record.get('timestamp'), now),
+                            record.get('predicted_sentiment'),
+                            record.get('user_feedback'),
+                            record.get('predicted_confidence'),
+                            json.dumps(record, ensure_ascii=False)
+                        )
+                    )
+                    if cursor.rowcount:
+                        ids.append(cursor.lastrowid)
+                    else:
+                        ids.append(db.execute(
+                            "SELECT id FROM feedback WHERE feedback_id = ?", (record.get('feedback_id'),)
+                        ).fetchone()[0])
+            return ids
+
+    def get(self, row_id):
+        """Fetch one record by row id, or None"""
+        with self._lock:
+            row = self._connect().execute("SELECT record FROM feedback WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, feedback_id):
+        """Fetch one record by its feedback_id, or None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT record FROM feedback WHERE feedback_id = ?", (feedback_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _where(self, user_feedback=None, predicted_sentiment=None, min_confidence=None, since=None, until=None):
+        """SQL filter clause over the indexed columns"""
+        clauses, params = [], []
+        if user_feedback is not None:
+            clauses.append("user_feedback = ?")
+            params.append(user_feedback)
+        if predicted_sentiment is not None:
+            clauses.append("predicted_sentiment = ?")
+            params.append(predicted_sentiment)
+        if min_confidence is not None:
+            clauses.append("confidence > ?")
+            params.append(min_confidence)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit=None, batch_size=1000, **filters):
+        """Stream matching records in insertion order"""
+        where, params = self._where(**filters)
+        sql = f"SELECT record FROM feedback{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            cursor = self._connect().execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for (record,) in rows:
+                yield json.loads(record)
+
+    def __iter__(self):
+        return self.query()
+
+    def rows_after(self, row_id, batch_size=1000):
+        """Stream (row id, record) for rows inserted after row_id"""
+        with self._lock:
+            cursor = self._connect().execute("SELECT id, record FROM feedback WHERE id > ? ORDER BY id", (row_id,))
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row_id, record in rows:
+                yield row_id, json.loads(record)
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._connect().execute(f"SELECT COUNT(*) FROM feedback{where}", params).fetchone()[0]
+
+    def high_confidence_errors(self, days=7, threshold=HIGH_CONFIDENCE, limit=None):
+        """Inaccurate predictions above a confidence threshold in the last N days"""
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
+        return list(self.query(limit=limit, user_feedback='inaccurate', min_confidence=threshold, since=since))
+
+    def statistics(self, threshold=HIGH_CONFIDENCE):
+        """statistics.json-style summary computed by SQL aggregates"""
+        with self._lock:
+            db = self._connect()
+            total, accurate, high_confidence_errors, first, last = db.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(user_feedback = 'accurate'), 0), "
+                "COALESCE(SUM(user_feedback != 'accurate' AND confidence > ?), 0), "
+                "MIN(timestamp), MAX(timestamp) FROM feedback",
+                (threshold,)
+            ).fetchone()
+            distribution = dict(db.execute(
+                "SELECT predicted_sentiment, COUNT(*) FROM feedback GROUP BY predicted_sentiment"
+            ).fetchall())
+        return {
+            "total_feedback": total,
+            "accurate_predictions": accurate,
+            "inaccurate_predictions": total - accurate,
+            "accuracy_rate": accurate / total if total else 0.0,
+            "high_confidence_errors": high_confidence_errors,
+            "sentiment_distribution": distribution,
+            "first_timestamp": first,
+            "last_timestamp": last
+        }
+
+    def sync(self):
+        """Commits are durable already (WAL); kept for interface parity with the log"""
+
+    def close(self):
+        with self._lock:
+            if self._db is not None and self._db_pid == os.getpid():
+                self._db.close()
+            self._db = None
+            self._db_pid = None
+
+
+def database_path(feedback_dir):
+    return os.path.join(feedback_dir, DB_FILENAME)
+
+
+def open_feedback_store(backend, feedback_dir, db_path=None, **log_options):
+    """Writer for the configured backend; both expose append() and close()"""
+    if backend not in FEEDBACK_BACKENDS:
+        raise ValueError(f"Unknown feedback backend: {backend}")
+    if backend == 'sqlite':
+        return SQLiteFeedbackStore(db_path or database_path(feedback_dir))
+    return FeedbackLog(log_directory(feedback_dir), **log_options)
+
+
+def iter_feedback(feedback_dir, db_path=None, include_database=True):
+    """Stream every feedback record: SQLite rows, log segments, then unmigrated files"""
+    db_path = db_path or database_path(feedback_dir)
+    if include_database and os.path.exists(db_path):
+        store = SQLiteFeedbackStore(db_path)
+        try:
+            yield from store
+        finally:
+            store.close()
+    yield from FeedbackLogReader(log_directory(feedback_dir))
+    for _, record in iter_legacy_files(feedback_dir):
+        yield record
+
+
+def find_feedback(feedback_dir, feedback_id, db_path=None):
+    """Look a record up by feedback_id across the database, the log and unmigrated files"""
+    db_path = db_path or database_path(feedback_dir)
+    if os.path.exists(db_path):
+        store = SQLiteFeedbackStore(db_path)
+        try:
+            record = store.find(feedback_id)
+        finally:
+            store.close()
+        if record is not None:
+            return record
+    record = FeedbackLogReader(log_directory(feedback_dir)).find(feedback_id)
+    if record is not None:
+        return record
+    for _, record in iter_legacy_files(feedback_dir):
+        if record.get('feedback_id') == feedback_id:
+            return record
+    return None
+
+
+class FeedbackCursor:
+    """Resumable read position over every feedback source
+
+    ``state`` records the last SQLite row id, the byte offset reached in each
+    log segment and the legacy files already read; iterating yields only
+    records added since and advances the state. A state is stale once a
+    segment or legacy file it mentions is gone (migrated or archived), since
+    those records now live in another source. With ``include_database=False``
+    only the log and legacy files are read (callers that query SQLite directly).
+    ``source`` names where the record last yielded came from: 'database',
+    'log' or 'legacy'.
+    """
+
+    def __init__(self, feedback_dir, db_path=None, state=None, include_database=True):
+        self.feedback_dir = feedback_dir
+        self.db_path = db_path or database_path(feedback_dir)
+        self.include_database = include_database
+        self.state = state or {'database': 0, 'segments': {}, 'legacy': []}
+        self.source = None
+
+    def is_valid(self):
+        reader = FeedbackLogReader(log_directory(self.feedback_dir))
+        if not set(self.state['segments']) <= set(reader.segments()):
+            return False
+        return all(os.path.exists(os.path.join(self.feedback_dir, name)) for name in self.state['legacy'])
+
+    def __iter__(self):
+        if self.include_database and os.path.exists(self.db_path):
+            store = SQLiteFeedbackStore(self.db_path)
+            try:
+                self.source = 'database'
+                for row_id, record in store.rows_after(self.state['database']):
+                    self.state['database'] = row_id
+                    yield record
+            finally:
+                store.close()
+
+        reader = FeedbackLogReader(log_directory(self.feedback_dir))
+        self.source = 'log'
+        for segment in reader.segments():
+            for offset, record in reader.iter_segment_from(segment, self.state['segments'].get(segment, 0)):
+                self.state['segments'][segment] = offset
+                yield record
+
+        seen = set(self.state['legacy'])
+        self.source = 'legacy'
+        for filename, record in iter_legacy_files(self.feedback_dir):
+            if filename not in seen:
+                self.state['legacy'].append(filename)
+                yield record
@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for production
+Usage: gunicorn -c backend/gunicorn.conf.py server:app
+
+The app (tokenizer, text tools, configuration) is pre-loaded once in the
+master. The inference backend is loaded by each worker after the fork,
+because the TensorFlow/ONNX/TFLite runtimes start thread pools that do not
+survive fork(). Only FINANSWER_BACKEND=tflite memory-maps its weights from the
+.tflite file, so workers share one copy in the page cache. TensorFlow and ONNX
+Runtime copy the weights into each worker's heap, where N workers cost N times
+the model's memory. Those backends therefore default to a single worker that
+uses every core and gets its concurrency from request threads.
+"""
+
+import multiprocessing
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+# Extra processes only pay off when they share the model pages
+SHARED_WEIGHT_BACKENDS = ('tflite',)
+backend = os.environ.get('FINANSWER_BACKEND', 'tensorflow')
+workers = int(os.environ.get('FINANSWER_WORKERS', '2' if backend in SHARED_WEIGHT_BACKENDS else '1'))
+worker_class = 'gthread'
+threads = int(os.environ.get('FINANSWER_WORKER_THREADS', '8'))  # concurrent requests feeding each worker's micro-batcher
+timeout = int(os.environ.get('FINANSWER_WORKER_TIMEOUT', '120'))
+preload_app = True
+
+# Split the cores between workers so their intra-op pools do not oversubscribe the CPU
+inference_threads = int(os.environ.get('FINANSWER_INFERENCE_THREADS', '0')) or max(1, multiprocessing.cpu_count() // workers)
+os.environ['FINANSWER_INFERENCE_THREADS'] = str(inference_threads)
+os.environ.setdefault('OMP_NUM_THREADS', str(inference_threads))
+os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(inference_threads))
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+os.environ['FINANSWER_DEFER_MODEL_LOAD'] = '1'
+
+
+def when_ready(server):
+    if workers > 1 and backend not in SHARED_WEIGHT_BACKENDS:
+        server.log.warning(
+            f"{workers} workers with FINANSWER_BACKEND={backend}: each worker holds its own copy of the "
+            "model; use FINANSWER_BACKEND=tflite to share one memory-mapped copy"
+        )
+
+
+def post_worker_init(worker):
+    """Load and warm up the inference backend inside each worker"""
+    import sys
+    sys.modules['server'].load_inference_backend()
+
+
+def worker_exit(server, worker):
+    """Drain the feedback write-behind queue before the worker goes away"""
+    import sys
+    sys.modules['server'].feedback_writer.close()
@@ -0,0 +1,306 @@
+"""
+Pluggable inference backends for the sentiment classifier
+Every backend exposes ``predict(input_ids, attention_mask)`` taking padded
+int32 arrays and returning class probabilities as a NumPy array, plus
+``warmup()`` and ``info()``. Runtimes are imported lazily so the ONNX and
+TFLite backends do not load TensorFlow unless they fall back to it.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+
+def parse_buckets(value, default=DEFAULT_LENGTH_BUCKETS, max_length=None):
+    """Parse a comma-separated list of sequence-length buckets
+
+    With ``max_length`` the list always ends with a bucket that fits the
+    longest tokenized input, so no valid request falls outside every bucket.
+    """
+    buckets = tuple(default) if not value else tuple(sorted(int(part) for part in value.split(',') if part.strip()))
+    if max_length and (not buckets or buckets[-1] < max_length):
+        buckets += (max_length,)
+    return buckets
+
+
+def next_power_of_two(n):
+    """Smallest power of two that is >= n"""
+    return 1 << max(0, (n - 1).bit_length())
+
+
+class CompiledClassifier:
+    """TF classifier whose forward pass is compiled per sequence-length bucket
+
+    Inputs are padded up to the nearest bucket so every call hits an already
+    traced graph. With XLA the batch dimension is also padded to a power of
+    two, since XLA specializes on every concrete shape.
+    """
+
+    def __init__(self, model, length_buckets=DEFAULT_LENGTH_BUCKETS, compile=True,
+                 jit_compile=False, pad_id=0):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = model
+        self.length_buckets = tuple(sorted(length_buckets))
+        self.compile = compile
+        self.jit_compile = jit_compile
+        self.pad_id = pad_id
+        self.compile_times_ms = {}
+        self._functions = {}
+
+        if compile:
+            tf = self._tf
+            for length in self.length_buckets:
+                spec = tf.TensorSpec(shape=(None, length), dtype=tf.int32)
+                self._functions[length] = tf.function(
+                    self._forward,
+                    input_signature=[spec, spec],
+                    jit_compile=jit_compile
+                )
+
+    def _forward(self, input_ids, attention_mask):
+        """Forward pass returning softmax probabilities"""
+        outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, training=False)
+        return self._tf.nn.softmax(outputs.logits, axis=-1)
+
+    def bucket_for(self, length):
+        """Smallest configured bucket that fits ``length`` tokens, or None"""
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return bucket
+        return None
+
+    def predict(self, input_ids, attention_mask):
+        """Pad to the matching bucket and run the compiled graph"""
+        batch_size, width = input_ids.shape
+        bucket = self.bucket_for(width) if self.compile else None
+        if bucket is None:
+            # Uncompiled, or wider than every bucket: run eagerly at the input's own width
+            return self._forward(input_ids, attention_mask).numpy()
+
+        padded_batch = next_power_of_two(batch_size) if self.jit_compile else batch_size
+        if bucket != width or padded_batch != batch_size:
+            pad = ((0, padded_batch - batch_size), (0, bucket - width))
+            input_ids = np.pad(input_ids, pad, constant_values=self.pad_id)
+            attention_mask = np.pad(attention_mask, pad, constant_values=0)
+
+        probabilities = self._functions[bucket](
+            self._tf.constant(input_ids, dtype=self._tf.int32),
+            self._tf.constant(attention_mask, dtype=self._tf.int32)
+        )
+        return probabilities.numpy()[:batch_size]
+
+    def warmup(self, batch_sizes=(1,)):
+        """Trace and run every bucket once so no request pays compile cost"""
+        if not self.compile:
+            return self.compile_times_ms
+        for length in self.length_buckets:
+            started = time.perf_counter()
+            for batch_size in batch_sizes:
+                input_ids = np.full((batch_size, length), self.pad_id, dtype=np.int32)
+                attention_mask = np.ones((batch_size, length), dtype=np.int32)
+                self.predict(input_ids, attention_mask)
+            self.compile_times_ms[length] = (time.perf_counter() - started) * 1000.0
+        return self.compile_times_ms
+
+    def info(self):
+        """Describe the compiled graph for /metrics"""
+        return {
+            'backend': 'tensorflow',
+            'compiled': self.compile,
+            'xla': self.jit_compile,
+            'length_buckets': list(self.length_buckets),
+            'compile_times_ms': {str(k): v for k, v in self.compile_times_ms.items()}
+        }
+
+
+class TFLiteClassifier:
+    """Serve a (quantized) TFLite export produced by tools/export_quantized.py
+
+    The interpreter resizes its inputs to each batch shape; calls are
+    serialized because a TFLite interpreter is not thread-safe.
+    """
+
+    def __init__(self, tflite_path, num_threads=None):
+        self.tflite_path = tflite_path
+        self.interpreter = _tflite_interpreter_class()(model_path=tflite_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._lock = threading.Lock()
+        self._inputs = {detail['name']: detail for detail in self.interpreter.get_input_details()}
+        self._output = self.interpreter.get_output_details()[0]
+        self._shape = None
+
+    def _input_index(self, name):
+        """Find an input tensor whose name contains ``name``"""
+        for input_name, detail in self._inputs.items():
+            if name in input_name:
+                return detail['index']
+        raise KeyError(f"TFLite model has no input named {name}")
+
+    def predict(self, input_ids, attention_mask):
+        """Run the interpreter over one padded batch"""
+        with self._lock:
+            ids_index = self._input_index('input_ids')
+            mask_index = self._input_index('attention_mask')
+            if self._shape != input_ids.shape:
+                self.interpreter.resize_tensor_input(ids_index, input_ids.shape)
+                self.interpreter.resize_tensor_input(mask_index, attention_mask.shape)
+                self.interpreter.allocate_tensors()
+                self._shape = input_ids.shape
+            self.interpreter.set_tensor(ids_index, input_ids.astype(np.int32))
+            self.interpreter.set_tensor(mask_index, attention_mask.astype(np.int32))
+            self.interpreter.invoke()
+            return np.array(self.interpreter.get_tensor(self._output['index']))
+
+    def warmup(self, batch_sizes=(1,)):
+        """TFLite needs no tracing; kept for interface parity"""
+        return {}
+
+    def info(self):
+        """Describe the served artifact for /metrics"""
+        return {
+            'backend': 'tflite',
+            'model_file': self.tflite_path
+        }
+
+
+class OnnxClassifier:
+    """Serve an ONNX export produced by tools/export_onnx.py with ONNX Runtime"""
+
+    def __init__(self, onnx_path, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.onnx_path = onnx_path
+        self.intra_op_threads = intra_op_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self._input_names = [node.name for node in self.session.get_inputs()]
+
+    def predict(self, input_ids, attention_mask):
+        """Run the ONNX graph over one padded batch"""
+        feeds = {}
+        for name in self._input_names:
+            feeds[name] = (input_ids if 'input_ids' in name else attention_mask).astype(np.int32)
+        return self.session.run(None, feeds)[0]
+
+    def warmup(self, batch_sizes=(1,)):
+        """Run one tiny batch so ORT finishes its lazy initialization"""
+        started = time.perf_counter()
+        for batch_size in batch_sizes:
+            ids = np.ones((batch_size, 8), dtype=np.int32)
+            self.predict(ids, ids)
+        return {'onnx': (time.perf_counter() - started) * 1000.0}
+
+    def info(self):
+        """Describe the served artifact for /metrics"""
+        return {
+            'backend': 'onnx',
+            'model_file': self.onnx_path,
+            'intra_op_threads': self.intra_op_threads
+        }
+
+
+class CascadeClassifier:
+    """Answer with a small student model, falling back to the teacher when unsure
+
+    Rows whose top student probability is below ``min_confidence`` are run
+    again through the teacher (trimmed to their own width) and take its
+    probabilities. Both models must share the tokenizer.
+    """
+
+    def __init__(self, student, teacher, min_confidence=0.8, metrics=None):
+        self.student = student
+        self.teacher = teacher
+        self.min_confidence = min_confidence
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self.student_answers = 0
+        self.teacher_fallbacks = 0
+
+    def predict(self, input_ids, attention_mask):
+        """Student pass over the batch, teacher pass over its low-confidence rows"""
+        probabilities = np.array(self.student.predict(input_ids, attention_mask), dtype=np.float32)
+        fallback = np.flatnonzero(probabilities.max(axis=1) < self.min_confidence)
+        if len(fallback):
+            width = max(1, int(attention_mask[fallback].sum(axis=1).max()))
+            probabilities[fallback] = self.teacher.predict(
+                input_ids[fallback, :width], attention_mask[fallback, :width]
+            )
+        with self._lock:
+            self.student_answers += len(probabilities) - len(fallback)
+            self.teacher_fallbacks += len(fallback)
+        if self.metrics:
+            self.metrics.increment('inference.student_answers', len(probabilities) - len(fallback))
+            self.metrics.increment('inference.teacher_fallbacks', len(fallback))
+        return probabilities
+
+    def warmup(self, batch_sizes=(1,)):
+        """Warm up both models"""
+        times = {f'student:{key}': value for key, value in self.student.warmup(batch_sizes).items()}
+        times.update({f'teacher:{key}': value for key, value in self.teacher.warmup(batch_sizes).items()})
+        return times
+
+    def info(self):
+        """Both models plus the share of rows the teacher had to answer"""
+        with self._lock:
+            answered = self.student_answers + self.teacher_fallbacks
+            fallback_rate = self.teacher_fallbacks / answered if answered else 0.0
+        return {
+            'backend': 'cascade',
+            'min_confidence': self.min_confidence,
+            'fallback_rate': fallback_rate,
+            'student': self.student.info(),
+            'teacher': self.teacher.info()
+        }
+
+
+def _tflite_interpreter_class():
+    """Prefer the standalone LiteRT/tflite runtimes over full TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+
+
+BACKENDS = ('tensorflow', 'onnx', 'tflite')
+
+
+def load_backend(name, model_path, pad_id=0, onnx_path=None, tflite_path=None,
+                 num_threads=0, length_buckets=DEFAULT_LENGTH_BUCKETS,
+                 compile=True, jit_compile=False):
+    """Create the inference backend selected by configuration"""
+    if name == 'tensorflow':
+        import tensorflow as tf
+        from transformers import TFDistilBertForSequenceClassification
+
+        if num_threads:
+            # Must happen before the TF runtime starts its thread pools
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+
+        model = TFDistilBertForSequenceClassification.from_pretrained(model_path)
+        return CompiledClassifier(model, length_buckets=length_buckets, compile=compile,
+                                  jit_compile=jit_compile, pad_id=pad_id)
+    if name == 'onnx':
+        return OnnxClassifier(onnx_path or os.path.join(model_path, 'model.onnx'),
+                              intra_op_threads=num_threads)
+    if name == 'tflite':
+        return TFLiteClassifier(tflite_path or os.path.join(model_path, 'model.tflite'),
+                                num_threads=num_threads or None)
+    raise ValueError(f"Unknown inference backend: {name} (choose from {', '.join(BACKENDS)})")
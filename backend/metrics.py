@@ -0,0 +1,72 @@
+"""
+In-process metrics for the Finanswer sentiment server
+Counters, gauges and rolling latency/size distributions exposed via /metrics
+"""
+
+import threading
+from collections import deque
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and rolling observations"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._observations = {}
+
+    def increment(self, name, value=1):
+        """Increase a monotonically growing counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Record the current value of a gauge"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """Record one sample of a distribution (latency, batch size, ...)"""
+        with self._lock:
+            series = self._observations.get(name)
+            if series is None:
+                series = {
+                    'count': 0,
+                    'sum': 0.0,
+                    'max': value,
+                    'recent': deque(maxlen=self.window)
+                }
+                self._observations[name] = series
+            series['count'] += 1
+            series['sum'] += value
+            series['max'] = max(series['max'], value)
+            series['recent'].append(value)
+
+    def snapshot(self):
+        """Return a JSON-serializable view of all metrics"""
+        with self._lock:
+            observations = {}
+            for name, series in self._observations.items():
+                recent = sorted(series['recent'])
+                observations[name] = {
+                    'count': series['count'],
+                    'mean': series['sum'] / series['count'],
+                    'max': series['max'],
+                    'p50': _percentile(recent, 0.50),
+                    'p99': _percentile(recent, 0.99)
+                }
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'observations': observations
+            }
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
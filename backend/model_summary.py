@@ -0,0 +1,89 @@
+"""
+Model-driven extractive summaries
+Instead of keyword counts, candidate sentences are scored by the classifier
+itself and the ones most aligned with the document-level label are picked.
+All candidates of a request (or of a whole batch of documents) go through one
+length-bucketed forward pass; per-sentence scores are cached so sentences
+that recur across articles (boilerplate, quotes, wire copy) are scored once.
+"""
+
+import time
+
+import numpy as np
+
+SUMMARY_MODES = ('keyword', 'model')
+# summary_info fields that describe the call that picked the sentences, not the summary
+REQUEST_INFO_FIELDS = ('documents', 'candidates', 'sentences_scored', 'sentences_cached', 'latency_ms')
+
+
+def cached_summary_info(info):
+    """summary_info to store with a cached result: per-request counts and timing dropped"""
+    stored = {key: value for key, value in info.items() if key not in REQUEST_INFO_FIELDS}
+    stored['cached'] = True
+    return stored
+
+
+class ModelSummarizer:
+    """Pick summary sentences by the model's probability for the document label
+
+    ``score_fn`` takes a list of sentences and returns their class
+    probabilities; ``cache`` is a ResultCache used for per-sentence scores.
+    """
+
+    def __init__(self, score_fn, max_sentences=32, cache=None, metrics=None):
+        self.score_fn = score_fn
+        self.max_sentences = max_sentences
+        self.cache = cache
+        self.metrics = metrics
+
+    def select(self, features_list, label_ids, k=1):
+        """Return (sentences, info) per document, sentences in document order"""
+        started = time.perf_counter()
+        candidates = [features.sentences[:self.max_sentences] for features in features_list]
+
+        # Look up every distinct candidate, then score the misses in one pass
+        probabilities = {}
+        keys = {}
+        for sentence in {sentence for sentences in candidates for sentence in sentences}:
+            if self.cache:
+                keys[sentence] = self.cache.make_key(sentence, 'sentence')
+                cached = self.cache.get(keys[sentence])
+                if cached is not None:
+                    probabilities[sentence] = np.asarray(cached)
+                    continue
+            probabilities[sentence] = None
+
+        missing = [sentence for sentence, scores in probabilities.items() if scores is None]
+        if missing:
+            for sentence, scores in zip(missing, self.score_fn(missing)):
+                probabilities[sentence] = np.asarray(scores)
+                if self.cache:
+                    self.cache.put(keys[sentence], [float(score) for score in scores])
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if self.metrics:
+            self.metrics.observe('summary.model_ms', elapsed_ms)
+            self.metrics.increment('summary.sentences_scored', len(missing))
+            self.metrics.increment('summary.sentences_cached', len(probabilities) - len(missing))
+
+        # The forward pass is shared, so the info describes the whole call
+        info = {
+            'mode': 'model',
+            'documents': len(features_list),
+            'candidates': sum(len(sentences) for sentences in candidates),
+            'sentences_scored': len(missing),
+            'sentences_cached': len(probabilities) - len(missing),
+            'latency_ms': elapsed_ms
+        }
+        results = []
+        for sentences, label_id in zip(candidates, label_ids):
+            if not sentences:
+                results.append(([], info))
+                continue
+            alignment = np.array([probabilities[sentence][label_id] for sentence in sentences])
+            if k < len(sentences):
+                chosen = np.argpartition(-alignment, k - 1)[:k]
+            else:
+                chosen = np.arange(len(sentences))
+            results.append(([sentences[i] for i in sorted(chosen)], info))
+        return results
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache for sentiment analysis results
+In-memory LRU with TTL, plus an optional SQLite tier that survives restarts.
+Keys include a fingerprint of the model directory, so results computed by a
+different model are never served.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Files at or below this size are hashed by content, larger ones by size/mtime
+_CONTENT_HASH_LIMIT = 1024 * 1024
+
+
+def model_fingerprint(*paths):
+    """Hash model directories/files so any change to them changes the version"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.isfile(path):
+            _hash_file(digest, path, os.path.basename(path))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for filename in sorted(files):
+                filepath = os.path.join(root, filename)
+                _hash_file(digest, filepath, os.path.relpath(filepath, path))
+    return digest.hexdigest()[:16]
+
+
+def _hash_file(digest, filepath, name):
+    """Feed one file's name and content (or size/mtime if large) to a digest"""
+    stat = os.stat(filepath)
+    digest.update(name.encode('utf-8'))
+    if stat.st_size <= _CONTENT_HASH_LIMIT:
+        with open(filepath, 'rb') as f:
+            digest.update(f.read())
+    else:
+        digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies share a cache entry"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class ResultCache:
+    """LRU + TTL cache of analysis results keyed by normalized text hash"""
+
+    def __init__(self, model_version, max_entries=10000, ttl_seconds=3600,
+                 disk_path=None, max_disk_entries=100000):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._disk_writes = 0
+
+        if disk_path:
+            self._open_disk_tier()
+
+    def _open_disk_tier(self):
+        """Open the SQLite tier and drop rows produced by other model versions"""
+        directory = os.path.dirname(self.disk_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=30)
+        self._db_pid = os.getpid()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, model_version TEXT NOT NULL, "
+            "created REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results(created)")
+        self._db.execute("DELETE FROM results WHERE model_version != ?", (self.model_version,))
+        self._db.commit()
+
+    def _disk(self):
+        """SQLite connection for this process (connections must not cross a fork)"""
+        if self.disk_path and self._db_pid != os.getpid():
+            self._open_disk_tier()
+        return self._db
+
+    def make_key(self, text, variant=''):
+        """Hash normalized text together with the model version"""
+        digest = hashlib.sha256()
+        digest.update(self.model_version.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(variant.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(normalize_text(text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return a cached result or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            db = self._disk()
+            if db is not None:
+                row = db.execute(
+                    "SELECT created, value FROM results WHERE key = ? AND model_version = ?",
+                    (key, self.model_version)
+                ).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    value = json.loads(row[1])
+                    self._store_memory(key, row[0], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable result"""
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, value)
+            db = self._disk()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, model_version, created, value) VALUES (?, ?, ?, ?)",
+                    (key, self.model_version, now, json.dumps(value, ensure_ascii=False))
+                )
+                self._disk_writes += 1
+                if self._disk_writes % 1000 == 0:
+                    self._prune_disk(db, now)
+                db.commit()
+
+    def _store_memory(self, key, created, value):
+        """Insert into the LRU, evicting the least recently used entries"""
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self, db, now):
+        """Drop expired rows and keep the disk tier within its size limit"""
+        db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+        db.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def stats(self):
+        """Hit/miss counters and sizes for /metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model_version': self.model_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_tier': bool(self.disk_path),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,134 @@
+"""
+Request-coalescing inference scheduler
+Queues texts from concurrent requests and runs them through the model in
+batches bounded by a maximum batch size and a maximum wait time
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue cannot accept more work"""
+
+
+class SchedulerTimeoutError(RuntimeError):
+    """Raised when a queued item has no result within the caller's timeout"""
+
+
+class MicroBatchScheduler:
+    """Group incoming items into batches and fan results back to callers
+
+    ``batch_fn`` receives a list of items and must return a list of results
+    in the same order. The worker thread is started lazily so the scheduler
+    can be created before a pre-forking server spawns its workers.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=10,
+                 max_queue_size=1024, metrics=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.metrics = metrics
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def config(self):
+        """Return the scheduler configuration"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'max_queue_size': self.max_queue_size
+        }
+
+    def queue_depth(self):
+        """Number of items waiting for a batch"""
+        return self._queue.qsize()
+
+    def submit(self, item, timeout=None):
+        """Queue one item and block until its result is ready"""
+        try:
+            return self.submit_async(item).result(timeout=timeout)
+        except FutureTimeoutError:
+            # The backlog is too deep to answer in time: the caller should back off
+            if self.metrics:
+                self.metrics.increment('scheduler.timeouts')
+            raise SchedulerTimeoutError(f"No result within {timeout} seconds") from None
+
+    def submit_async(self, item):
+        """Queue one item and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            if self.metrics:
+                self.metrics.increment('scheduler.rejected')
+            raise QueueFullError("Inference queue is full")
+        if self.metrics:
+            self.metrics.set_gauge('scheduler.queue_depth', self._queue.qsize())
+        return future
+
+    def _ensure_started(self):
+        """Start the worker thread once per process"""
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                # A forked child inherits the parent's queue but not its thread
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._worker = threading.Thread(target=self._run, name="micro-batch-scheduler", daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def _collect_batch(self):
+        """Block for the first item, then gather more until full or timed out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop: collect a batch, run it, resolve the futures"""
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            items = [item for item, _, _ in batch]
+
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                if self.metrics:
+                    self.metrics.increment('scheduler.batch_errors')
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+            if self.metrics:
+                finished = time.monotonic()
+                self.metrics.increment('scheduler.batches')
+                self.metrics.increment('scheduler.items', len(batch))
+                self.metrics.observe('scheduler.batch_size', len(batch))
+                self.metrics.observe('scheduler.batch_latency_ms', (finished - started) * 1000.0)
+                for _, _, enqueued in batch:
+                    self.metrics.observe('scheduler.queue_wait_ms', (started - enqueued) * 1000.0)
+                self.metrics.set_gauge('scheduler.queue_depth', self._queue.qsize())
@@ -0,0 +1,116 @@
+"""
+Vectorized sentence scoring
+Sentences of one or many documents are indexed once into a sparse
+sentence×term presence matrix (COO row/column arrays). Scoring a set of term
+weights is then a single NumPy gather + bincount, and top-k selection uses a
+partial sort instead of sorting every sentence.
+"""
+
+import re
+
+import numpy as np
+
+SEPARATOR = '\n'
+
+
+class SentenceMatrix:
+    """Sparse presence matrix over the sentences of several documents
+
+    Columns are either substrings (matched against the lowercased sentence)
+    or compiled patterns (searched in the original sentence); neither may
+    match across a newline. A column can be indexed for every document or
+    only for one, so per-document terms such as key phrases do not have to be
+    searched across the whole batch.
+    """
+
+    def __init__(self, documents):
+        self.sentences = [sentence for sentences in documents for sentence in sentences]
+        self.doc_bounds = np.cumsum([0] + [len(sentences) for sentences in documents])
+        self.row_docs = np.repeat(np.arange(len(documents)), np.diff(self.doc_bounds))
+        self.columns = {}
+
+        # Sentences joined with a separator that terms and patterns never match,
+        # so one search covers every sentence and an offset identifies its sentence
+        lowers = [sentence.lower() for sentence in self.sentences]
+        self._text = SEPARATOR.join(self.sentences)
+        self._lower = SEPARATOR.join(lowers)
+        self._starts = self._offsets([len(sentence) for sentence in self.sentences])
+        self._lower_starts = self._offsets([len(sentence) for sentence in lowers])
+        self._row_parts = []
+        self._col_parts = []
+        self._indexed = set()
+        self._coo = None
+
+    @staticmethod
+    def _offsets(lengths):
+        """Start offset of each sentence in the joined text"""
+        return np.cumsum([0] + [length + 1 for length in lengths[:-1]]) if lengths else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def add_column(self, term, doc=None):
+        """Index which sentences contain term, for all documents or just one"""
+        column = self.columns.setdefault(term, len(self.columns))
+        if (term, None) in self._indexed or (term, doc) in self._indexed or not self.sentences:
+            return column
+        self._indexed.add((term, doc))
+
+        if isinstance(term, str):
+            pattern, text, starts = re.compile(re.escape(term)), self._lower, self._lower_starts
+        else:
+            pattern, text, starts = term, self._text, self._starts
+
+        if doc is None:
+            begin, end = 0, len(text)
+        else:
+            first, last = self.doc_bounds[doc], self.doc_bounds[doc + 1]
+            if first == last:
+                return column
+            begin = int(starts[first])
+            end = int(starts[last]) - 1 if last < len(starts) else len(text)
+
+        offsets = [match.start() for match in pattern.finditer(text, begin, end)]
+        if offsets:
+            rows = np.unique(np.searchsorted(starts, offsets, side='right') - 1)
+            self._row_parts.append(rows)
+            self._col_parts.append(np.full(len(rows), column))
+            self._coo = None
+        return column
+
+    def _matrix(self):
+        """De-duplicated (row, column) pairs of the matrix"""
+        if self._coo is None:
+            if self._row_parts:
+                rows = np.concatenate(self._row_parts)
+                cols = np.concatenate(self._col_parts)
+                keys = np.unique(rows * max(len(self.columns), 1) + cols)
+                self._coo = (keys // max(len(self.columns), 1), keys % max(len(self.columns), 1))
+            else:
+                self._coo = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        return self._coo
+
+    def scores(self, weights):
+        """Score every sentence; weights has shape (documents, columns)"""
+        rows, cols = self._matrix()
+        weights = np.asarray(weights, dtype=np.float64)
+        return np.bincount(rows, weights=weights[self.row_docs[rows], cols], minlength=len(self.sentences))
+
+    def top_k(self, scores, doc, k=1):
+        """Row indices of a document's k best sentences, best first
+
+        Ties are broken by the sentence text in descending order, matching a
+        full ``sort(reverse=True)`` over (score, sentence) pairs.
+        """
+        first, last = int(self.doc_bounds[doc]), int(self.doc_bounds[doc + 1])
+        doc_scores = scores[first:last]
+        if k <= 0 or not len(doc_scores):
+            return []
+        if k < len(doc_scores):
+            # Partial selection: the kth best score, then everything at or above it
+            threshold = doc_scores[np.argpartition(-doc_scores, k - 1)[k - 1]]
+            candidates = np.flatnonzero(doc_scores >= threshold)
+        else:
+            candidates = np.arange(len(doc_scores))
+        ranked = sorted(candidates, key=lambda i: (doc_scores[i], self.sentences[first + i]), reverse=True)
+        return [first + int(i) for i in ranked[:k]]
@@ -1,19 +1,138 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import tensorflow as tf
-from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification
+import atexit
 import numpy as np
 import os
-import re
-from collections import Counter
+import time
+
+from bucketing import bucket_by_length, pad_batch
+from chunking import AGGREGATION_METHODS, aggregate_chunk_scores, select_windows, split_into_windows
+from feedback_stats import FeedbackStatistics
+from feedback_queue import FeedbackWriter
+from feedback_store import find_feedback, open_feedback_store
+from inference import CascadeClassifier, load_backend, parse_buckets
+from metrics import Metrics
+from model_summary import SUMMARY_MODES, ModelSummarizer, cached_summary_info
+from result_cache import ResultCache, model_fingerprint
+from scheduler import MicroBatchScheduler, QueueFullError, SchedulerTimeoutError
+from text_analytics import analyze_text, generate_investment_advice, generate_summary, rank_sentences
+from token_cache import tokenizer_fingerprint
+from tokenization import CachedTokenizer, load_tokenizer
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Chrome extension
 
-# Load the model and tokenizer
-model_path = "../models/finbert"  # Path to the model directory
-tokenizer = DistilBertTokenizer.from_pretrained(model_path)
-model = TFDistilBertForSequenceClassification.from_pretrained(model_path)
+# Model configuration
+model_path = os.environ.get('FINANSWER_MODEL_PATH', "../models/finbert")  # Path to the model directory
+INFERENCE_BACKEND = os.environ.get('FINANSWER_BACKEND', 'tensorflow')  # tensorflow, onnx or tflite
+TFLITE_MODEL_PATH = os.environ.get('FINANSWER_TFLITE_MODEL', "../models/finbert_tflite/model.tflite")
+ONNX_MODEL_PATH = os.environ.get('FINANSWER_ONNX_MODEL', "../models/finbert_onnx/model.onnx")
+INFERENCE_THREADS = int(os.environ.get('FINANSWER_INFERENCE_THREADS', os.environ.get('FINANSWER_TFLITE_THREADS', '0')))
+
+# Distilled student model served in front of the main model (empty disables it)
+STUDENT_MODEL_PATH = os.environ.get('FINANSWER_STUDENT_MODEL_PATH', '')
+STUDENT_MIN_CONFIDENCE = float(os.environ.get('FINANSWER_STUDENT_MIN_CONFIDENCE', '0.8'))
+
+# Compiled inference configuration
+COMPILE_MODEL = os.environ.get('FINANSWER_COMPILE', '1') == '1'
+XLA_COMPILE = os.environ.get('FINANSWER_XLA', '0') == '1'
+LENGTH_BUCKETS = parse_buckets(os.environ.get('FINANSWER_LENGTH_BUCKETS', ''), max_length=512)
+WARMUP_BATCH_SIZES = parse_buckets(os.environ.get('FINANSWER_WARMUP_BATCH_SIZES', '1'))
+
+# Micro-batching configuration
+BATCH_MAX_SIZE = int(os.environ.get('FINANSWER_BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('FINANSWER_BATCH_MAX_WAIT_MS', '10'))
+BATCH_MAX_QUEUE = int(os.environ.get('FINANSWER_BATCH_MAX_QUEUE', '1024'))
+INFERENCE_TIMEOUT = float(os.environ.get('FINANSWER_INFERENCE_TIMEOUT', '30'))
+RETRY_AFTER_SECONDS = int(os.environ.get('FINANSWER_RETRY_AFTER', '1'))
+PAD_MULTIPLE = int(os.environ.get('FINANSWER_PAD_MULTIPLE', '8'))
+BATCH_MAX_TOKENS = int(os.environ.get('FINANSWER_BATCH_MAX_TOKENS', '16384'))
+
+# Bulk endpoint configuration
+BULK_MAX_ITEMS = int(os.environ.get('FINANSWER_BULK_MAX_ITEMS', '1000'))
+BULK_SUB_BATCH_SIZE = int(os.environ.get('FINANSWER_BULK_SUB_BATCH_SIZE', '64'))
+
+# Long-document configuration
+LONG_DOC_WINDOW = int(os.environ.get('FINANSWER_LONG_DOC_WINDOW', '510'))
+LONG_DOC_STRIDE = int(os.environ.get('FINANSWER_LONG_DOC_STRIDE', '128'))
+LONG_DOC_MAX_CHUNKS = int(os.environ.get('FINANSWER_LONG_DOC_MAX_CHUNKS', '16'))
+
+# Result cache configuration (size 0 disables the cache)
+CACHE_MAX_ENTRIES = int(os.environ.get('FINANSWER_CACHE_SIZE', '10000'))
+CACHE_TTL_SECONDS = float(os.environ.get('FINANSWER_CACHE_TTL', '3600'))
+CACHE_DB_PATH = os.environ.get('FINANSWER_CACHE_DB', '')
+
+# Summary configuration: 'keyword' ranks sentences by term counts, 'model' scores them with the classifier
+SUMMARY_MODE = os.environ.get('FINANSWER_SUMMARY_MODE', 'keyword')
+MODEL_SUMMARY_MAX_SENTENCES = int(os.environ.get('FINANSWER_MODEL_SUMMARY_MAX_SENTENCES', '32'))
+MODEL_SUMMARY_TOP_K = int(os.environ.get('FINANSWER_MODEL_SUMMARY_TOP_K', '1'))
+SENTENCE_CACHE_SIZE = int(os.environ.get('FINANSWER_SENTENCE_CACHE_SIZE', '4096'))
+
+# Feedback storage configuration ('log' segments or a 'sqlite' database)
+FEEDBACK_DIR = os.environ.get('FINANSWER_FEEDBACK_DIR', 'feedback_data')
+FEEDBACK_BACKEND = os.environ.get('FINANSWER_FEEDBACK_BACKEND', 'log')
+FEEDBACK_DB_PATH = os.environ.get('FINANSWER_FEEDBACK_DB', '')
+FEEDBACK_SEGMENT_BYTES = int(os.environ.get('FINANSWER_FEEDBACK_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+FEEDBACK_FSYNC_EVERY = int(os.environ.get('FINANSWER_FEEDBACK_FSYNC_EVERY', '32'))
+FEEDBACK_FSYNC_INTERVAL = float(os.environ.get('FINANSWER_FEEDBACK_FSYNC_INTERVAL', '1.0'))
+FEEDBACK_QUEUE_SIZE = int(os.environ.get('FINANSWER_FEEDBACK_QUEUE_SIZE', '10000'))
+FEEDBACK_BATCH_SIZE = int(os.environ.get('FINANSWER_FEEDBACK_BATCH_SIZE', '256'))
+FEEDBACK_BATCH_WAIT_MS = float(os.environ.get('FINANSWER_FEEDBACK_BATCH_WAIT_MS', '50'))
+FEEDBACK_STATS_FLUSH_INTERVAL = float(os.environ.get('FINANSWER_FEEDBACK_STATS_FLUSH_INTERVAL', '5.0'))
+
+# Tokenizer configuration (memo size 0 disables the token-id cache)
+FAST_TOKENIZER = os.environ.get('FINANSWER_FAST_TOKENIZER', '1') == '1'
+TOKEN_CACHE_SIZE = int(os.environ.get('FINANSWER_TOKEN_CACHE_SIZE', '0'))
+
+# Set by gunicorn.conf.py: each worker loads the backend itself after forking
+DEFER_MODEL_LOAD = os.environ.get('FINANSWER_DEFER_MODEL_LOAD', '0') == '1'
+
+metrics = Metrics()
+
+# Load the tokenizer and the selected inference backend
+tokenizer = CachedTokenizer(load_tokenizer(model_path, fast=FAST_TOKENIZER), TOKEN_CACHE_SIZE, metrics)
+classifier = None
+
+if STUDENT_MODEL_PATH and tokenizer_fingerprint(STUDENT_MODEL_PATH) != tokenizer_fingerprint(model_path):
+    raise ValueError(f"Student model {STUDENT_MODEL_PATH} does not share the tokenizer of {model_path}")
+
+def load_inference_backend():
+    """Load and warm up the inference backend in the current process"""
+    global classifier
+    options = dict(
+        pad_id=tokenizer.pad_token_id,
+        num_threads=INFERENCE_THREADS,
+        length_buckets=LENGTH_BUCKETS,
+        compile=COMPILE_MODEL,
+        jit_compile=XLA_COMPILE
+    )
+    classifier = load_backend(
+        INFERENCE_BACKEND, model_path, onnx_path=ONNX_MODEL_PATH, tflite_path=TFLITE_MODEL_PATH, **options
+    )
+    if STUDENT_MODEL_PATH:
+        # ONNX/TFLite students are read from model.onnx / model.tflite in the student directory
+        student = load_backend(INFERENCE_BACKEND, STUDENT_MODEL_PATH, **options)
+        classifier = CascadeClassifier(student, classifier, STUDENT_MIN_CONFIDENCE, metrics)
+    print(f"🔥 Warming up {INFERENCE_BACKEND} backend (pid {os.getpid()})...")
+    for bucket, elapsed in classifier.warmup(WARMUP_BATCH_SIZES).items():
+        print(f"   - {bucket}: {elapsed:.0f} ms")
+    return classifier
+
+if not DEFER_MODEL_LOAD:
+    load_inference_backend()
+
+# Cache entries are tied to the exact weights being served
+artifact_paths = {'onnx': [ONNX_MODEL_PATH], 'tflite': [TFLITE_MODEL_PATH]}.get(INFERENCE_BACKEND, [])
+model_version = model_fingerprint(model_path, *artifact_paths)
+if STUDENT_MODEL_PATH:
+    # Answers depend on the student and the fallback threshold as well
+    model_version = f"{model_version}-{model_fingerprint(STUDENT_MODEL_PATH)}@{STUDENT_MIN_CONFIDENCE}"
+result_cache = ResultCache(
+    model_version,
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    disk_path=CACHE_DB_PATH or None
+) if CACHE_MAX_ENTRIES > 0 else None
 
 # Label mapping
 label_map = {
@@ -22,253 +141,313 @@ label_map = {
     2: "LABEL_2"   # Positive
 }
 
-# Financial keywords for analysis
-FINANCIAL_KEYWORDS = {
-    'positive': ['growth', 'profit', 'gain', 'increase', 'rise', 'surge', 'jump', 'boost', 'recovery', 'success'],
-    'negative': ['loss', 'decline', 'fall', 'drop', 'crash', 'plunge', 'decrease', 'risk', 'concern', 'worry'],
-    'neutral': ['report', 'quarter', 'annual', 'forecast', 'expectation', 'analysis', 'data', 'figure', 'result']
-}
+def predict_batch(texts):
+    """Run one padded forward pass over a batch of texts"""
+    # Tokenize the whole batch without padding; each length bucket is padded separately
+    encoded = tokenizer.encode(texts, max_length=512)
+    return list(predict_bucketed(encoded, BATCH_MAX_SIZE))
 
-def extract_key_phrases(text):
-    """Extract key financial phrases from text"""
-    # Clean text
-    text = re.sub(r'[^\w\s]', ' ', text.lower())
-    words = text.split()
-    
-    # Find financial terms
-    financial_terms = []
-    for word in words:
-        if any(term in word for term in ['earn', 'revenue', 'profit', 'stock', 'market', 'price', 'share', 'dividend']):
-            financial_terms.append(word)
-    
-    # Get most common terms
-    if financial_terms:
-        counter = Counter(financial_terms)
-        return [term for term, count in counter.most_common(3)]
-    
-    return ['market', 'financial', 'analysis']
+scheduler = MicroBatchScheduler(
+    predict_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_queue_size=BATCH_MAX_QUEUE,
+    metrics=metrics
+)
 
-def generate_summary(text, sentiment, confidence):
-    """Generate a smart summary based on sentiment and content"""
-    # Clean and split text into sentences
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
-    
-    if not sentences:
-        return "Unable to extract meaningful content for summary."
-    
-    # Extract key phrases and entities
-    key_phrases = extract_key_phrases(text)
-    
-    # Find the most relevant sentence based on sentiment
-    relevant_sentence = find_most_relevant_sentence(sentences, sentiment, key_phrases)
-    
-    # Extract company names, numbers, and key metrics
-    companies = extract_companies(text)
-    numbers = extract_numbers(text)
-    
-    # Generate context-aware summary
-    if sentiment == "LABEL_2":  # Positive
-        if confidence > 0.8:
-            summary = f"📈 Strong positive sentiment: {relevant_sentence}"
-            if companies:
-                summary += f" {companies[0]} shows promising performance"
-            if numbers:
-                summary += f" with {numbers[0]} growth"
-            summary += ". The analysis suggests optimistic market conditions."
-        else:
-            summary = f"📊 Moderately positive outlook: {relevant_sentence}"
-            summary += ". Consider monitoring for stronger confirmation signals."
-    
-    elif sentiment == "LABEL_0":  # Negative
-        if confidence > 0.8:
-            summary = f"📉 Strong negative sentiment: {relevant_sentence}"
-            if companies:
-                summary += f" {companies[0]} faces challenges"
-            if numbers:
-                summary += f" with {numbers[0]} decline"
-            summary += ". The analysis suggests potential risks ahead."
-        else:
-            summary = f"⚠️ Moderately negative outlook: {relevant_sentence}"
-            summary += ". Exercise caution and monitor developments."
-    
-    else:  # Neutral
-        summary = f"📊 Balanced analysis: {relevant_sentence}"
-        if companies:
-            summary += f" {companies[0]} presents mixed signals"
-        summary += ". The article requires careful consideration."
-    
-    return summary
+def score_sentences(sentences):
+    """Classify summary candidate sentences in length-bucketed batches"""
+    encoded = tokenizer.encode(sentences, max_length=512)
+    return predict_bucketed(encoded, BULK_SUB_BATCH_SIZE)
 
-def find_most_relevant_sentence(sentences, sentiment, key_phrases):
-    """Find the most relevant sentence based on sentiment and key phrases"""
-    if not sentences:
-        return "The article discusses market developments."
-    
-    # Score sentences based on relevance
-    sentence_scores = []
-    for sentence in sentences:
-        score = 0
-        sentence_lower = sentence.lower()
-        
-        # Score based on key phrases
-        for phrase in key_phrases:
-            if phrase.lower() in sentence_lower:
-                score += 2
-        
-        # Score based on sentiment indicators
-        if sentiment == "LABEL_2":  # Positive
-            positive_words = ['growth', 'profit', 'gain', 'increase', 'rise', 'surge', 'success', 'positive']
-            score += sum(1 for word in positive_words if word in sentence_lower)
-        elif sentiment == "LABEL_0":  # Negative
-            negative_words = ['loss', 'decline', 'fall', 'drop', 'crash', 'risk', 'concern', 'negative']
-            score += sum(1 for word in negative_words if word in sentence_lower)
-        
-        # Prefer sentences with numbers (metrics)
-        if re.search(r'\d+%|\d+\.\d+', sentence):
-            score += 1
-        
-        sentence_scores.append((score, sentence))
-    
-    # Return the highest scoring sentence, or first sentence if no clear winner
-    sentence_scores.sort(reverse=True)
-    return sentence_scores[0][1] if sentence_scores[0][0] > 0 else sentences[0]
-
-def extract_companies(text):
-    """Extract company names from text"""
-    # Common company patterns
-    company_patterns = [
-        r'\b[A-Z][a-z]+ (Inc|Corp|Ltd|LLC|Company|Co)\b',
-        r'\b[A-Z]{2,}\b',  # All caps words (like AAPL, GOOGL)
-        r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'  # Two word companies
-    ]
-    
-    companies = []
-    for pattern in company_patterns:
-        matches = re.findall(pattern, text)
-        companies.extend(matches)
-    
-    # Remove duplicates and common false positives
-    companies = list(set(companies))
-    false_positives = ['The', 'This', 'That', 'They', 'When', 'What', 'Where', 'Why', 'How']
-    companies = [c for c in companies if c not in false_positives]
-    
-    return companies[:3]  # Return top 3 companies
-
-def extract_numbers(text):
-    """Extract significant numbers from text"""
-    # Find percentages, currency amounts, and other metrics
-    number_patterns = [
-        r'\d+\.?\d*%',  # Percentages
-        r'\$\d+\.?\d*[MBK]?',  # Currency amounts
-        r'\d+\.?\d*[MBK]',  # Numbers with M/B/K suffixes
-    ]
-    
-    numbers = []
-    for pattern in number_patterns:
-        matches = re.findall(pattern, text)
-        numbers.extend(matches)
-    
-    return numbers[:2]  # Return top 2 numbers
-
-def generate_investment_advice(scores, sentiment, confidence, text):
-    """Generate investment advice based on sentiment analysis"""
-    # Extract market context
-    has_earnings = 'earnings' in text.lower() or 'revenue' in text.lower()
-    has_stock = 'stock' in text.lower() or 'share' in text.lower()
-    has_market = 'market' in text.lower() or 'trading' in text.lower()
-    
-    advice = ""
-    
-    if confidence < 0.6:
-        advice = "⚠️ Low confidence analysis. Consider gathering additional information from multiple sources before making investment decisions."
-    
-    elif sentiment == "LABEL_2":  # Positive
-        if scores['positive'] > 0.85:
-            advice = "🚀 Strong bullish signals detected. Consider increasing exposure to related assets while maintaining proper risk management and stop-loss orders."
-        elif scores['positive'] > 0.7:
-            advice = "📈 Positive market sentiment suggests favorable conditions. Monitor for technical confirmation and consider gradual position building."
-        else:
-            advice = "📊 Moderately positive outlook. Maintain current positions and watch for stronger confirmation signals."
-    
-    elif sentiment == "LABEL_0":  # Negative
-        if scores['negative'] > 0.85:
-            advice = "🔻 Strong bearish signals detected. Consider defensive positions, hedging strategies, or reducing exposure to related assets."
-        elif scores['negative'] > 0.7:
-            advice = "📉 Negative sentiment suggests caution. Review portfolio risk exposure and consider protective measures."
-        else:
-            advice = "⚠️ Moderately negative outlook. Exercise caution and avoid aggressive positions until sentiment improves."
-    
-    else:  # Neutral
-        advice = "⚖️ Neutral sentiment indicates mixed signals. Focus on fundamental analysis, technical indicators, and wait for clearer directional signals."
-    
-    # Add context-specific advice
-    if has_earnings:
-        advice += " Pay attention to upcoming earnings reports and analyst expectations."
-    if has_stock:
-        advice += " Monitor stock-specific news and technical levels."
-    if has_market:
-        advice += " Consider broader market trends and sector performance."
-    
-    return advice
+# Per-sentence scores are only valid for the weights that produced them
+sentence_cache = ResultCache(
+    model_version,
+    max_entries=SENTENCE_CACHE_SIZE,
+    ttl_seconds=CACHE_TTL_SECONDS
+) if SENTENCE_CACHE_SIZE > 0 else None
+
+# Feedback store: append-only log (per-process segments) or SQLite in WAL mode
+feedback_store = open_feedback_store(
+    FEEDBACK_BACKEND,
+    FEEDBACK_DIR,
+    db_path=FEEDBACK_DB_PATH or None,
+    segment_max_bytes=FEEDBACK_SEGMENT_BYTES,
+    sync_every=FEEDBACK_FSYNC_EVERY,
+    sync_interval=FEEDBACK_FSYNC_INTERVAL
+)
+atexit.register(feedback_store.close)
+
+# Feedback counters live in memory; each worker snapshots them to feedback_data/stats/
+feedback_statistics = FeedbackStatistics(
+    os.path.join(FEEDBACK_DIR, 'stats'),
+    legacy_file=os.path.join(FEEDBACK_DIR, 'statistics.json'),
+    flush_interval=FEEDBACK_STATS_FLUSH_INTERVAL
+)
+atexit.register(feedback_statistics.close)
+
+summarizer = ModelSummarizer(
+    score_sentences,
+    max_sentences=MODEL_SUMMARY_MAX_SENTENCES,
+    cache=sentence_cache,
+    metrics=metrics
+)
+
+def build_analysis_result(text, scores, features=None, relevant_sentence=None):
+    """Turn class probabilities into the /analyze response payload"""
+    # Get predicted label and confidence
+    predicted_label_id = np.argmax(scores)
+    confidence = float(scores[predicted_label_id])
+    predicted_label = label_map[predicted_label_id]
+    
+    # Generate summary and investment advice from a single analytics pass
+    if features is None:
+        features = analyze_text(text)
+    summary = generate_summary(text, predicted_label, confidence, features, relevant_sentence)
+    investment_advice = generate_investment_advice(
+        {
+            'negative': float(scores[0]),
+            'neutral': float(scores[1]),
+            'positive': float(scores[2])
+        },
+        predicted_label,
+        confidence,
+        text,
+        features
+    )
+    
+    result = {
+        'label': predicted_label,
+        'confidence': confidence,
+        'scores': {
+            'negative': float(scores[0]),
+            'neutral': float(scores[1]),
+            'positive': float(scores[2])
+        },
+        'summary': summary,
+        'investment_advice': investment_advice
+    }
+    
+    return result
+
+def build_analysis_results(texts, probabilities, summary_mode='keyword'):
+    """Build payloads for many texts, choosing all their summary sentences at once"""
+    features_list = [analyze_text(text) for text in texts]
+    label_ids = [int(np.argmax(scores)) for scores in probabilities]
+    
+    if summary_mode == 'model':
+        # One bucketed forward pass over every document's candidate sentences
+        selections = summarizer.select(features_list, label_ids, MODEL_SUMMARY_TOP_K)
+    else:
+        # One sentence×term matrix over every document's sentences
+        rank_sentences(features_list, [label_map[label_id] for label_id in label_ids])
+        selections = [(None, None)] * len(texts)
+    
+    results = []
+    for text, scores, features, (sentences, info) in zip(texts, probabilities, features_list, selections):
+        relevant_sentence = '. '.join(sentences) if sentences else None
+        result = build_analysis_result(text, scores, features, relevant_sentence)
+        if info is not None:
+            result['summary_info'] = info
+        results.append(result)
+    return results
+
+def cacheable_result(result):
+    """Copy of a result for the result cache, without the timing of the request that built it"""
+    if 'summary_info' not in result:
+        return result
+    return dict(result, summary_info=cached_summary_info(result['summary_info']))
+
+def handle_analyze(data):
+    """Validate an /analyze payload and return (response, status)"""
+    text = data.get('text', '') if isinstance(data, dict) else ''
+    
+    if not text:
+        return {'error': 'No text provided'}, 400
+    
+    long_document = bool(data.get('long_document', False))
+    aggregation = data.get('aggregation', 'mean')
+    return_chunks = bool(data.get('return_chunks', False))
+    summary_mode = data.get('summary_mode', SUMMARY_MODE)
+    if long_document and aggregation not in AGGREGATION_METHODS:
+        return {'error': f'Unknown aggregation method: {aggregation}'}, 400
+    if summary_mode not in SUMMARY_MODES:
+        return {'error': f'Unknown summary mode: {summary_mode}'}, 400
+    
+    # Serve repeated articles from the result cache
+    variant = f"long:{aggregation}:{int(return_chunks)}" if long_document else ''
+    if summary_mode == 'model':
+        variant += ':summary:model'
+    cache_key = result_cache.make_key(text, variant) if result_cache else None
+    if cache_key:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
+    
+    if long_document:
+        result = analyze_long_document(text, aggregation, return_chunks, summary_mode)
+    else:
+        # Queue the text for the next micro-batch and wait for its scores
+        scores = scheduler.submit(text, timeout=INFERENCE_TIMEOUT)
+        result = build_analysis_results([text], [scores], summary_mode)[0]
+    
+    if cache_key:
+        result_cache.put(cache_key, cacheable_result(result))
+    
+    return result, 200
+
+def busy_response():
+    """503 telling the client when to retry"""
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, 503
 
 @app.route('/analyze', methods=['POST'])
 def analyze_sentiment():
     try:
-        data = request.get_json()
-        text = data.get('text', '')
-        
-        if not text:
-            return jsonify({'error': 'No text provided'}), 400
-        
-        # Tokenize the text
-        inputs = tokenizer(
-            text,
-            truncation=True,
-            padding=True,
-            max_length=512,
-            return_tensors="tf"
-        )
-        
-        # Get model predictions
-        outputs = model(inputs)
-        logits = outputs.logits
-        
-        # Convert to probabilities
-        probabilities = tf.nn.softmax(logits, axis=-1)
-        scores = probabilities.numpy()[0]
-        
-        # Get predicted label and confidence
-        predicted_label_id = np.argmax(scores)
-        confidence = float(scores[predicted_label_id])
-        predicted_label = label_map[predicted_label_id]
+        payload, status = handle_analyze(request.get_json())
+        return jsonify(payload), status
         
-        # Generate summary and investment advice
-        summary = generate_summary(text, predicted_label, confidence)
-        investment_advice = generate_investment_advice(
+    except (QueueFullError, SchedulerTimeoutError):
+        # A full queue and a result that did not arrive in time are both overload
+        return busy_response()
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def predict_encoded(encoded):
+    """Run the model over pre-tokenized sequences, padding to the batch maximum"""
+    input_ids, attention_mask = pad_batch(encoded, tokenizer.pad_token_id, PAD_MULTIPLE)
+    metrics.observe('padding.efficiency', float(attention_mask.sum()) / attention_mask.size)
+    
+    started = time.perf_counter()
+    probabilities = classifier.predict(input_ids, attention_mask)
+    metrics.observe('inference.forward_ms', (time.perf_counter() - started) * 1000.0)
+    return probabilities
+
+def predict_bucketed(encoded, max_batch_size):
+    """Run length-bucketed sub-batches and return probabilities in input order"""
+    probabilities = np.zeros((len(encoded), len(label_map)), dtype=np.float32)
+    lengths = [len(ids) for ids in encoded]
+    for batch in bucket_by_length(lengths, max_batch_size, BATCH_MAX_TOKENS):
+        probabilities[batch] = predict_encoded([encoded[i] for i in batch])
+    return probabilities
+
+def analyze_long_document(text, aggregation='mean', return_chunks=False, summary_mode='keyword'):
+    """Score a full document as overlapping windows run in one batch"""
+    # Tokenize the whole text without truncation or special tokens
+    content_ids = tokenizer.encode([text], truncation=False, add_special_tokens=False)[0]
+    all_windows = split_into_windows(content_ids, LONG_DOC_WINDOW, LONG_DOC_STRIDE)
+    # Above the cap, score windows spread over the whole document rather than its start
+    selected = select_windows(len(all_windows), LONG_DOC_MAX_CHUNKS)
+    windows = [all_windows[index] for index in selected]
+    encoded = [[tokenizer.cls_token_id] + window + [tokenizer.sep_token_id] for window in windows]
+    
+    probabilities = predict_bucketed(encoded, BULK_SUB_BATCH_SIZE)
+    lengths = [len(window) for window in windows]
+    scores = aggregate_chunk_scores(probabilities, lengths, aggregation)
+    
+    metrics.increment('long_document.requests')
+    metrics.observe('long_document.chunks', len(windows))
+    if len(windows) < len(all_windows):
+        metrics.increment('long_document.truncated')
+    
+    result = build_analysis_results([text], [scores], summary_mode)[0]
+    result['chunk_count'] = len(windows)
+    result['total_chunks'] = len(all_windows)
+    result['truncated'] = len(windows) < len(all_windows)
+    result['aggregation'] = aggregation
+    if return_chunks:
+        result['chunks'] = [
             {
-                'negative': float(scores[0]),
-                'neutral': float(scores[1]),
-                'positive': float(scores[2])
-            },
-            predicted_label,
-            confidence,
-            text
-        )
+                'index': index,
+                'tokens': length,
+                'scores': {
+                    'negative': float(chunk_scores[0]),
+                    'neutral': float(chunk_scores[1]),
+                    'positive': float(chunk_scores[2])
+                }
+            }
+            for index, length, chunk_scores in zip(selected, lengths, probabilities)
+        ]
+    return result
+
+def handle_analyze_batch(data):
+    """Analyze many texts in one request using length-sorted sub-batches"""
+    items = data.get('items') if isinstance(data, dict) else None
+    if items is None and isinstance(data, dict) and 'texts' in data:
+        items = [{'id': i, 'text': text} for i, text in enumerate(data['texts'])]
+    
+    if not isinstance(items, list) or not items:
+        return {'error': 'No items provided'}, 400
+    if len(items) > BULK_MAX_ITEMS:
+        return {'error': f'Too many items (max {BULK_MAX_ITEMS})'}, 413
+    
+    summary_mode = data.get('summary_mode', SUMMARY_MODE)
+    if summary_mode not in SUMMARY_MODES:
+        return {'error': f'Unknown summary mode: {summary_mode}'}, 400
+    variant = 'summary:model' if summary_mode == 'model' else ''
+    
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        item_id = item.get('id', index) if isinstance(item, dict) else index
+        text = item.get('text') if isinstance(item, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            results[index] = {'id': item_id, 'error': 'No text provided'}
+            continue
         
-        result = {
-            'label': predicted_label,
-            'confidence': confidence,
-            'scores': {
-                'negative': float(scores[0]),
-                'neutral': float(scores[1]),
-                'positive': float(scores[2])
-            },
-            'summary': summary,
-            'investment_advice': investment_advice
-        }
+        cached = result_cache.get(result_cache.make_key(text, variant)) if result_cache else None
+        if cached is not None:
+            results[index] = dict(cached, id=item_id)
+        else:
+            valid.append((index, item_id, text))
+    
+    if valid:
+        # Tokenize every text with a single call, without padding
+        encoded = tokenizer.encode([text for _, _, text in valid], max_length=512)
         
-        return jsonify(result)
+        # Bucket by length so each sub-batch pads to similar lengths
+        lengths = [len(ids) for ids in encoded]
+        for chunk in bucket_by_length(lengths, BULK_SUB_BATCH_SIZE, BATCH_MAX_TOKENS):
+            try:
+                probabilities = predict_encoded([encoded[i] for i in chunk])
+            except Exception as e:
+                print(f"Batch inference error: {str(e)}")
+                for i in chunk:
+                    index, item_id, _ = valid[i]
+                    results[index] = {'id': item_id, 'error': 'Inference failed'}
+                continue
+            
+            # Summary sentences for the whole sub-batch are chosen together
+            try:
+                analyses = build_analysis_results([valid[i][2] for i in chunk], probabilities, summary_mode)
+            except Exception as e:
+                print(f"Batch analysis error: {str(e)}")
+                analyses = [None] * len(chunk)
+            
+            for i, scores, result in zip(chunk, probabilities, analyses):
+                index, item_id, text = valid[i]
+                try:
+                    if result is None:
+                        result = build_analysis_result(text, scores)
+                    if result_cache:
+                        result_cache.put(result_cache.make_key(text, variant), cacheable_result(result))
+                    results[index] = dict(result, id=item_id)
+                except Exception as e:
+                    print(f"Error analyzing item {item_id}: {str(e)}")
+                    results[index] = {'id': item_id, 'error': 'Analysis failed'}
+    
+    metrics.increment('bulk.requests')
+    metrics.increment('bulk.items', len(items))
+    errors = sum(1 for result in results if 'error' in result)
+    return {'results': results, 'count': len(results), 'errors': errors}, 200
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    try:
+        payload, status = handle_analyze_batch(request.get_json())
+        return jsonify(payload), status
         
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -278,53 +457,86 @@ def analyze_sentiment():
 def health_check():
     return jsonify({'status': 'healthy', 'model_loaded': True})
 
+def metrics_payload():
+    """Scheduler configuration and runtime metrics"""
+    metrics.set_gauge('scheduler.queue_depth', scheduler.queue_depth())
+    return {
+        'model_version': model_version,
+        'inference': classifier.info() if classifier else None,
+        'pid': os.getpid(),
+        'scheduler': scheduler.config(),
+        'cache': result_cache.stats() if result_cache else None,
+        'sentence_cache': sentence_cache.stats() if sentence_cache else None,
+        'feedback_writer': dict(feedback_writer.config(), queue_depth=feedback_writer.queue_depth()),
+        'metrics': metrics.snapshot()
+    }
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose scheduler configuration and runtime metrics"""
+    return jsonify(metrics_payload())
+
+def handle_feedback(feedback_data):
+    """Validate and queue one feedback submission, return (response, status)"""
+    if not isinstance(feedback_data, dict):
+        return {"error": "Invalid feedback payload"}, 400
+    
+    # 验证必要字段
+    required_fields = ['text', 'predicted_sentiment', 'user_feedback', 'timestamp']
+    for field in required_fields:
+        if field not in feedback_data:
+            return {"error": f"Missing required field: {field}"}, 400
+    
+    # 分配ID后交给后台线程批量写入，请求不等待磁盘
+    feedback_id = generate_feedback_id()
+    feedback_data['feedback_id'] = feedback_id
+    update_feedback_statistics(feedback_data)
+    feedback_writer.submit(feedback_data)
+    
+    return {
+        "status": "success", 
+        "message": "Feedback received successfully",
+        "feedback_id": feedback_id
+    }, 200
+
+def handle_feedback_lookup(feedback_id):
+    """Find a stored (or still queued) feedback record by id, return (response, status)"""
+    record = feedback_writer.pending(feedback_id)
+    if record is not None:
+        return {"status": "queued", "feedback": record}, 200
+    record = find_feedback(FEEDBACK_DIR, feedback_id, db_path=FEEDBACK_DB_PATH or None)
+    if record is None:
+        return {"error": "Feedback not found"}, 404
+    return {"status": "stored", "feedback": record}, 200
+
+@app.route('/feedback/statistics', methods=['GET'])
+def get_feedback_statistics():
+    """Feedback counters merged across workers"""
+    hours = request.args.get('hours', 24, type=int)
+    return jsonify(feedback_statistics.statistics(hours))
+
+@app.route('/feedback/<feedback_id>', methods=['GET'])
+def get_feedback(feedback_id):
+    """Look up one feedback submission by the id /feedback returned"""
+    payload, status = handle_feedback_lookup(feedback_id)
+    return jsonify(payload), status
+
 @app.route('/feedback', methods=['POST'])
 def submit_feedback():
     """Handle user feedback for model improvement"""
     try:
-        feedback_data = request.get_json()
-        
-        # 验证必要字段
-        required_fields = ['text', 'predicted_sentiment', 'user_feedback', 'timestamp']
-        for field in required_fields:
-            if field not in feedback_data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
-        # 保存反馈数据到文件（简单实现，生产环境应该用数据库）
-        save_feedback_to_file(feedback_data)
-        
-        # 分析反馈数据用于模型改进
-        analyze_feedback_for_improvement(feedback_data)
-        
-        return jsonify({
-            "status": "success", 
-            "message": "Feedback received successfully",
-            "feedback_id": generate_feedback_id()
-        })
+        payload, status = handle_feedback(request.get_json())
+        return jsonify(payload), status
         
     except Exception as e:
         print(f"Error processing feedback: {e}")
         return jsonify({"error": "Failed to process feedback"}), 500
 
-def save_feedback_to_file(feedback_data):
-    """保存反馈数据到文件"""
-    import json
-    from datetime import datetime
-    
-    # 创建反馈数据目录
-    feedback_dir = "feedback_data"
-    if not os.path.exists(feedback_dir):
-        os.makedirs(feedback_dir)
-    
-    # 生成文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{feedback_dir}/feedback_{timestamp}.json"
-    
-    # 保存数据
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(feedback_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"Feedback saved to {filename}")
+def on_feedback_written(records, locations):
+    """后台写入线程每写完一批调用：打印日志并分析反馈"""
+    print(f"Feedback saved to {FEEDBACK_BACKEND} store: {len(records)} record(s), last at {locations[-1]}")
+    for feedback_data in records:
+        analyze_feedback_for_improvement(feedback_data)
 
 def analyze_feedback_for_improvement(feedback_data):
     """分析反馈数据，识别模型改进机会"""
@@ -345,64 +557,28 @@ def analyze_feedback_for_improvement(feedback_data):
         # 如果置信度高但用户反馈错误，这是重要的改进信号
         if confidence > 0.8:
             print(f"   ⚠️ High confidence error - priority for model improvement")
-    
-    # 统计反馈数据
-    update_feedback_statistics(feedback_data)
 
 def update_feedback_statistics(feedback_data):
-    """更新反馈统计信息"""
-    import json
-    
-    stats_file = "feedback_data/statistics.json"
-    
-    try:
-        if os.path.exists(stats_file):
-            with open(stats_file, 'r') as f:
-                stats = json.load(f)
-        else:
-            stats = {
-                "total_feedback": 0,
-                "accurate_predictions": 0,
-                "inaccurate_predictions": 0,
-                "accuracy_rate": 0.0,
-                "high_confidence_errors": 0,
-                "sentiment_distribution": {"LABEL_0": 0, "LABEL_1": 0, "LABEL_2": 0}
-            }
-        
-        # 更新统计
-        stats["total_feedback"] += 1
-        
-        if feedback_data['user_feedback'] == 'accurate':
-            stats["accurate_predictions"] += 1
-        else:
-            stats["inaccurate_predictions"] += 1
-            
-            # 检查高置信度错误
-            confidence = feedback_data.get('predicted_confidence', 0)
-            if confidence > 0.8:
-                stats["high_confidence_errors"] += 1
-        
-        # 更新准确率
-        stats["accuracy_rate"] = stats["accurate_predictions"] / stats["total_feedback"]
-        
-        # 更新情感分布
-        sentiment = feedback_data['predicted_sentiment']
-        if sentiment in stats["sentiment_distribution"]:
-            stats["sentiment_distribution"][sentiment] += 1
-        
-        # 保存统计
-        with open(stats_file, 'w') as f:
-            json.dump(stats, f, indent=2)
-            
-        print(f"📊 Updated feedback statistics - Accuracy: {stats['accuracy_rate']:.2%}")
-        
-    except Exception as e:
-        print(f"Error updating statistics: {e}")
+    """更新反馈统计信息（内存计数，定期写快照）"""
+    feedback_statistics.record(feedback_data)
 
 def generate_feedback_id():
-    """生成反馈ID"""
+    """生成反馈ID（完整 UUID4，可用于 GET /feedback/<id> 查询）"""
     import uuid
-    return str(uuid.uuid4())[:8]
+    return str(uuid.uuid4())
+
+# /feedback only enqueues; a background thread writes batches to the store.
+# Registered after the store so the queue is drained before the store closes.
+feedback_writer = FeedbackWriter(
+    feedback_store,
+    max_queue_size=FEEDBACK_QUEUE_SIZE,
+    max_batch_size=FEEDBACK_BATCH_SIZE,
+    max_wait_ms=FEEDBACK_BATCH_WAIT_MS,
+    on_written=on_feedback_written,
+    metrics=metrics,
+    fallback_dir=FEEDBACK_DIR
+)
+atexit.register(feedback_writer.close)
 
 if __name__ == '__main__':
     print("Starting Finanswer Sentiment Analysis Server...")
@@ -13,7 +13,20 @@ fi
 pip install -r requirements.txt
 
 echo "✅ Dependencies installed successfully!"
-echo "🔧 Starting Flask server..."
+
+# Production: multi-worker gunicorn (see gunicorn.conf.py); development: Flask dev server
+if [ "$1" = "--production" ]; then
+    echo "🏭 Starting production server (${FINANSWER_BACKEND:-tensorflow} backend, see gunicorn.conf.py for workers)..."
+    exec gunicorn -c gunicorn.conf.py server:app
+fi
+
+# Async: uvicorn event loop with bounded inference pool (see asgi_server.py)
+if [ "$1" = "--asgi" ]; then
+    echo "⚡ Starting async server..."
+    exec uvicorn asgi_server:app --host 0.0.0.0 --port "${PORT:-5001}"
+fi
+
+echo "🔧 Starting Flask development server..."
 
 # Start the server
 python server.py 
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+Single-pass text analytics for summaries and investment advice
+The article is lowercased and tokenized once; every keyword list used by the
+summary and advice templates is compiled into one Aho–Corasick automaton, so
+each distinct word is scanned once for all of them. The derived features
+(sentences, key phrases, entities, numbers, context flags) are identical to
+what the original per-feature helpers produced.
+"""
+
+import re
+from collections import Counter, deque
+
+import numpy as np
+
+from sentence_scoring import SentenceMatrix
+
+# Words containing one of these are candidate key phrases
+KEY_PHRASE_TERMS = ['earn', 'revenue', 'profit', 'stock', 'market', 'price', 'share', 'dividend']
+DEFAULT_KEY_PHRASES = ['market', 'financial', 'analysis']
+
+# Sentiment indicators used to pick the most relevant sentence
+SENTIMENT_WORDS = {
+    'LABEL_2': ['growth', 'profit', 'gain', 'increase', 'rise', 'surge', 'success', 'positive'],
+    'LABEL_0': ['loss', 'decline', 'fall', 'drop', 'crash', 'risk', 'concern', 'negative']
+}
+
+# Terms that switch on the context-specific investment advice
+CONTEXT_TERMS = {
+    'has_earnings': ['earnings', 'revenue'],
+    'has_stock': ['stock', 'share'],
+    'has_market': ['market', 'trading']
+}
+
+# Same matches as a leading \b, but starting with [A-Z] lets the regex engine
+# skip ahead to capital letters instead of trying every position:
+# \b[A-Z] is [A-Z] not preceded by a word character
+COMPANY_PATTERNS = [
+    re.compile(r'[A-Z](?<!\w[A-Z])[a-z]+ (Inc|Corp|Ltd|LLC|Company|Co)\b'),
+    re.compile(r'[A-Z](?<!\w[A-Z])[A-Z]+\b'),  # All caps words (like AAPL, GOOGL)
+    re.compile(r'[A-Z](?<!\w[A-Z])[a-z]+ [A-Z][a-z]+\b')  # Two word companies
+]
+COMPANY_FALSE_POSITIVES = {'The', 'This', 'That', 'They', 'When', 'What', 'Where', 'Why', 'How'}
+
+NUMBER_PATTERNS = [
+    re.compile(r'\d+\.?\d*%'),  # Percentages
+    re.compile(r'\$\d+\.?\d*[MBK]?'),  # Currency amounts
+    re.compile(r'\d+\.?\d*[MBK]')  # Numbers with M/B/K suffixes
+]
+
+SENTENCE_SPLIT = re.compile(r'[.!?]+')
+# Sentences are split on '.', so of r'\d+%|\d+\.\d+' only the percentage can match
+METRIC_PATTERN = re.compile(r'\d+%')
+NON_WORD = re.compile(r'[^\w\s]')
+
+MIN_SENTENCE_LENGTH = 20
+
+
+class KeywordAutomaton:
+    """Aho–Corasick automaton reporting which keywords occur in a string"""
+
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(keywords))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [frozenset()]
+
+        outputs = [set()]
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            outputs[state].add(keyword)
+
+        # Breadth-first failure links; each state also reports its suffixes' keywords
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                outputs[child] |= outputs[self._fail[child]]
+        self._output = [frozenset(found) for found in outputs]
+
+    def find(self, text):
+        """Return the set of keywords contained in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+def _build_automaton():
+    keywords = list(KEY_PHRASE_TERMS)
+    for words in SENTIMENT_WORDS.values():
+        keywords.extend(words)
+    for words in CONTEXT_TERMS.values():
+        keywords.extend(words)
+    return KeywordAutomaton(keywords)
+
+
+AUTOMATON = _build_automaton()
+
+
+class TextFeatures:
+    """Everything the summary and advice templates need from one article"""
+
+    def __init__(self, text):
+        lower = text.lower()
+
+        # One tokenization of the whole article; the automaton scans each distinct word once
+        word_counts = Counter(NON_WORD.sub(' ', lower).split())
+        found = set()
+        financial_terms = {}
+        for word, count in word_counts.items():
+            hits = AUTOMATON.find(word)
+            if hits:
+                found |= hits
+                if not hits.isdisjoint(KEY_PHRASE_TERMS):
+                    financial_terms[word] = count
+        self.terms = frozenset(found)
+
+        if financial_terms:
+            # Counter keeps first-occurrence order, so ties rank as in the full word list
+            self.key_phrases = [term for term, count in Counter(financial_terms).most_common(3)]
+        else:
+            self.key_phrases = list(DEFAULT_KEY_PHRASES)
+
+        self.flags = {
+            flag: any(term in found for term in terms) for flag, terms in CONTEXT_TERMS.items()
+        }
+
+        self.sentences = [s.strip() for s in SENTENCE_SPLIT.split(text) if len(s.strip()) > MIN_SENTENCE_LENGTH]
+        self._top = {}
+
+        companies = []
+        for pattern in COMPANY_PATTERNS:
+            companies.extend(pattern.findall(text))
+        companies = list(set(companies))
+        self.companies = [c for c in companies if c not in COMPANY_FALSE_POSITIVES][:3]
+
+        numbers = []
+        for pattern in NUMBER_PATTERNS:
+            numbers.extend(pattern.findall(text))
+            if len(numbers) >= 2:
+                break
+        self.numbers = numbers[:2]
+
+    @property
+    def has_earnings(self):
+        return self.flags['has_earnings']
+
+    @property
+    def has_stock(self):
+        return self.flags['has_stock']
+
+    @property
+    def has_market(self):
+        return self.flags['has_market']
+
+    def top_sentences(self, sentiment, k=1):
+        """Up to k best scoring sentences for a label, or the first if none scores"""
+        if (sentiment, k) not in self._top:
+            rank_sentences([self], [sentiment], k)
+        return self._top[(sentiment, k)]
+
+    def relevant_sentence(self, sentiment):
+        """Highest scoring sentence for a label, or the first if none scores"""
+        if not self.sentences:
+            return "The article discusses market developments."
+        return self.top_sentences(sentiment, 1)[0]
+
+
+def rank_sentences(features_list, sentiments, k=1):
+    """Rank the sentences of many documents with one sentence×term matrix
+
+    A sentence scores 2 per key phrase it contains, 1 per sentiment indicator
+    of its document's label and 1 if it mentions a percentage. Results are
+    stored on each TextFeatures, so later ``relevant_sentence`` calls are free.
+    """
+    matrix = SentenceMatrix([features.sentences for features in features_list])
+
+    # Indicators and the metric pattern are shared; key phrases are per document
+    matrix.add_column(METRIC_PATTERN)
+    for sentiment in set(sentiments):
+        for word in SENTIMENT_WORDS.get(sentiment, ()):
+            matrix.add_column(word)
+    for doc, features in enumerate(features_list):
+        for phrase in features.key_phrases:
+            matrix.add_column(phrase.lower(), doc)
+
+    weights = np.zeros((len(features_list), len(matrix.columns)))
+    weights[:, matrix.columns[METRIC_PATTERN]] = 1
+    for doc, (features, sentiment) in enumerate(zip(features_list, sentiments)):
+        for word in SENTIMENT_WORDS.get(sentiment, ()):
+            weights[doc, matrix.columns[word]] += 1
+        for phrase in features.key_phrases:
+            weights[doc, matrix.columns[phrase.lower()]] += 2
+
+    scores = matrix.scores(weights)
+    for doc, (features, sentiment) in enumerate(zip(features_list, sentiments)):
+        rows = [row for row in matrix.top_k(scores, doc, k) if scores[row] > 0]
+        if rows:
+            top = [matrix.sentences[row] for row in rows]
+        else:
+            top = features.sentences[:1]
+        features._top[(sentiment, k)] = top
+    return [features._top[(sentiment, k)] for features, sentiment in zip(features_list, sentiments)]
+
+
+def analyze_text(text):
+    """Compute all derived text features in one pass"""
+    return TextFeatures(text)
+
+
+def generate_summary(text, sentiment, confidence, features=None, relevant_sentence=None):
+    """Generate a smart summary based on sentiment and content"""
+    # Sentences, key phrases and entities all come from one analytics pass
+    if features is None:
+        features = analyze_text(text)
+
+    if not features.sentences:
+        return "Unable to extract meaningful content for summary."
+
+    # Find the most relevant sentence based on sentiment, unless one was chosen by the model
+    if relevant_sentence is None:
+        relevant_sentence = features.relevant_sentence(sentiment)
+
+    # Company names, numbers, and key metrics
+    companies = features.companies
+    numbers = features.numbers
+
+    # Generate context-aware summary
+    if sentiment == "LABEL_2":  # Positive
+        if confidence > 0.8:
+            summary = f"📈 Strong positive sentiment: {relevant_sentence}"
+            if companies:
+                summary += f" {companies[0]} shows promising performance"
+            if numbers:
+                summary += f" with {numbers[0]} growth"
+            summary += ". The analysis suggests optimistic market conditions."
+        else:
+            summary = f"📊 Moderately positive outlook: {relevant_sentence}"
+            summary += ". Consider monitoring for stronger confirmation signals."
+
+    elif sentiment == "LABEL_0":  # Negative
+        if confidence > 0.8:
+            summary = f"📉 Strong negative sentiment: {relevant_sentence}"
+            if companies:
+                summary += f" {companies[0]} faces challenges"
+            if numbers:
+                summary += f" with {numbers[0]} decline"
+            summary += ". The analysis suggests potential risks ahead."
+        else:
+            summary = f"⚠️ Moderately negative outlook: {relevant_sentence}"
+            summary += ". Exercise caution and monitor developments."
+
+    else:  # Neutral
+        summary = f"📊 Balanced analysis: {relevant_sentence}"
+        if companies:
+            summary += f" {companies[0]} presents mixed signals"
+        summary += ". The article requires careful consideration."
+
+    return summary
+
+
+def generate_investment_advice(scores, sentiment, confidence, text, features=None):
+    """Generate investment advice based on sentiment analysis"""
+    # Extract market context
+    if features is None:
+        features = analyze_text(text)
+    has_earnings = features.has_earnings
+    has_stock = features.has_stock
+    has_market = features.has_market
+
+    advice = ""
+
+    if confidence < 0.6:
+        advice = "⚠️ Low confidence analysis. Consider gathering additional information from multiple sources before making investment decisions."
+
+    elif sentiment == "LABEL_2":  # Positive
+        if scores['positive'] > 0.85:
+            advice = "🚀 Strong bullish signals detected. Consider increasing exposure to related assets while maintaining proper risk management and stop-loss orders."
+        elif scores['positive'] > 0.7:
+            advice = "📈 Positive market sentiment suggests favorable conditions. Monitor for technical confirmation and consider gradual position building."
+        else:
+            advice = "📊 Moderately positive outlook. Maintain current positions and watch for stronger confirmation signals."
+
+    elif sentiment == "LABEL_0":  # Negative
+        if scores['negative'] > 0.85:
+            advice = "🔻 Strong bearish signals detected. Consider defensive positions, hedging strategies, or reducing exposure to related assets."
+        elif scores['negative'] > 0.7:
+            advice = "📉 Negative sentiment suggests caution. Review portfolio risk exposure and consider protective measures."
+        else:
+            advice = "⚠️ Moderately negative outlook. Exercise caution and avoid aggressive positions until sentiment improves."
+
+    else:  # Neutral
+        advice = "⚖️ Neutral sentiment indicates mixed signals. Focus on fundamental analysis, technical indicators, and wait for clearer directional signals."
+
+    # Add context-specific advice
+    if has_earnings:
+        advice += " Pay attention to upcoming earnings reports and analyst expectations."
+    if has_stock:
+        advice += " Monitor stock-specific news and technical levels."
+    if has_market:
+        advice += " Consider broader market trends and sector performance."
+
+    return advice
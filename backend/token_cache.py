@@ -0,0 +1,194 @@
+"""
+Pre-tokenized training data cache
+Labeled examples are tokenized once and written as immutable shards of
+NumPy arrays under <root>/<tokenizer fingerprint>/. Each shard stores the
+concatenated token ids, per-example offsets, labels, a stable text hash and
+optionally a row of float targets per example (e.g. teacher logits);
+readers memory-map the shards, so opening the cache costs the same whatever
+its size. New examples are appended as new shards, and the manifest keeps
+the position of the feedback reader that produced them so the next run
+continues from there.
+"""
+
+import copy
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from result_cache import model_fingerprint
+
+MANIFEST_FILENAME = 'manifest.json'
+TOKENIZER_FILES = ('vocab.txt', 'tokenizer.json', 'tokenizer_config.json', 'special_tokens_map.json')
+
+
+def tokenizer_fingerprint(model_path, max_length=512):
+    """Cache key: the tokenizer files plus the truncation length"""
+    paths = [os.path.join(model_path, name) for name in TOKENIZER_FILES
+             if os.path.exists(os.path.join(model_path, name))]
+    return f"{model_fingerprint(*paths)}-{max_length}"
+
+
+def text_hash(text):
+    """Stable 64-bit hash of a text (same value in every process and run)"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _batches(examples, batch_size):
+    texts, labels = [], []
+    for text, label in examples:
+        texts.append(text)
+        labels.append(label)
+        if len(texts) >= batch_size:
+            yield texts, labels
+            texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def _encode(encode_fn, texts):
+    ids = [np.asarray(row, dtype=np.int32) for row in encode_fn(texts)]
+    return ids, [text_hash(text) for text in texts]
+
+
+def in_validation_split(hashes, validation_percent):
+    """Deterministic split: an example's side never changes as the corpus grows"""
+    return np.asarray(hashes, dtype=np.uint64) % np.uint64(100) < np.uint64(validation_percent)
+
+
+class TokenShard:
+    """One memory-mapped shard"""
+
+    def __init__(self, path):
+        self.tokens = np.load(path + '.tokens.npy', mmap_mode='r')
+        self.offsets = np.load(path + '.offsets.npy', mmap_mode='r')
+        self.labels = np.load(path + '.labels.npy', mmap_mode='r')
+        self.hashes = np.load(path + '.hashes.npy', mmap_mode='r')
+        targets = path + '.targets.npy'
+        self.targets = np.load(targets, mmap_mode='r') if os.path.exists(targets) else None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def ids(self, index):
+        """Token ids of one example (a view into the mapped file)"""
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+
+class TokenShardCache:
+    """Append-only set of token shards plus a manifest"""
+
+    def __init__(self, root, fingerprint, shard_size=50000):
+        self.directory = os.path.join(root, fingerprint)
+        self.fingerprint = fingerprint
+        self.shard_size = shard_size
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_FILENAME)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'fingerprint': self.fingerprint, 'shards': [], 'position': None}
+
+    def _save_manifest(self):
+        """Atomic replace; shard files are only visible once listed here"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, MANIFEST_FILENAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def position(self):
+        """Reader state saved with the last committed shard"""
+        return copy.deepcopy(self.manifest['position'])
+
+    def __len__(self):
+        return sum(shard['count'] for shard in self.manifest['shards'])
+
+    def reset(self):
+        """Forget every shard, e.g. when the saved position no longer applies"""
+        self.manifest = {'fingerprint': self.fingerprint, 'shards': [], 'position': None}
+        self._save_manifest()
+
+    def shards(self):
+        """Open every committed shard (memory-mapped)"""
+        return [TokenShard(os.path.join(self.directory, shard['name'])) for shard in self.manifest['shards']]
+
+    def extend(self, examples, encode_fn, position=None, batch_size=1024, workers=None, target_fn=None):
+        """Tokenize (text, label) pairs and append them as new shards
+
+        ``encode_fn`` maps a list of texts to lists of token ids; batches are
+        encoded on ``workers`` threads (fast tokenizers release the GIL) while
+        the next batch is read. ``position`` is a state dict advanced by
+        whatever produces ``examples`` (e.g. a FeedbackCursor); a snapshot is
+        committed with every shard, so an interrupted run resumes after the
+        last complete shard. Shards are cut at batch boundaries. ``target_fn``
+        maps a batch of token id arrays to a (batch, k) float array stored
+        with the shard. Returns the number of examples added.
+        """
+        workers = workers or os.cpu_count() or 1
+        pending = ([], [], [], [])
+        in_flight = deque()
+        added = 0
+
+        def collect():
+            nonlocal pending, added
+            future, labels, snapshot = in_flight.popleft()
+            ids, hashes = future.result()
+            pending[0].extend(ids)
+            pending[1].extend(labels)
+            pending[2].extend(hashes)
+            if target_fn is not None:
+                pending[3].append(np.asarray(target_fn(ids), dtype=np.float32))
+            if len(pending[1]) >= self.shard_size:
+                self._write_shard(*pending, snapshot)
+                added += len(pending[1])
+                pending = ([], [], [], [])
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for texts, labels in _batches(examples, batch_size):
+                snapshot = copy.deepcopy(position)
+                in_flight.append((pool.submit(_encode, encode_fn, texts), labels, snapshot))
+                # Bounded read-ahead: at most two batches per worker in memory
+                if len(in_flight) > 2 * workers:
+                    collect()
+            while in_flight:
+                collect()
+
+        if pending[1]:
+            self._write_shard(*pending, position)
+            added += len(pending[1])
+        elif position is not None and position != self.manifest['position']:
+            # Records were read but none became an example: still remember how far we got
+            self.manifest['position'] = copy.deepcopy(position)
+            self._save_manifest()
+        return added
+
+    def _write_shard(self, ids, labels, hashes, targets, position):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"shard-{len(self.manifest['shards']):05d}"
+        path = os.path.join(self.directory, name)
+        tokens = np.concatenate(ids)
+        # BERT vocabularies fit in 16 bits, which halves the size of the shard
+        if not len(tokens) or tokens.max() < 2 ** 16:
+            tokens = tokens.astype(np.uint16)
+        np.save(path + '.tokens.npy', tokens)
+        np.save(path + '.offsets.npy', np.concatenate([[0], np.cumsum([len(x) for x in ids])]).astype(np.int64))
+        np.save(path + '.labels.npy', np.asarray(labels, dtype=np.int8))
+        np.save(path + '.hashes.npy', np.asarray(hashes, dtype=np.uint64))
+        if targets:
+            np.save(path + '.targets.npy', np.concatenate(targets))
+        elif os.path.exists(path + '.targets.npy'):
+            os.remove(path + '.targets.npy')  # left over from an uncommitted shard
+
+        self.manifest['shards'].append({'name': name, 'count': len(labels), 'tokens': int(len(tokens))})
+        self.manifest['position'] = copy.deepcopy(position)
+        self._save_manifest()
@@ -0,0 +1,84 @@
+"""
+Tokenizer loading and token-id memoization
+The fast (Rust) tokenizer is built from models/finbert/vocab.txt; repeated
+texts can skip tokenization entirely via an LRU memo of their token ids.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def load_tokenizer(model_path, fast=True):
+    """Load the fast tokenizer, falling back to the pure-Python one"""
+    if fast:
+        try:
+            from transformers import DistilBertTokenizerFast
+            return DistilBertTokenizerFast.from_pretrained(model_path)
+        except ImportError:
+            print("⚠️ Fast tokenizer unavailable (install `tokenizers`), using the Python tokenizer")
+    from transformers import DistilBertTokenizer
+    return DistilBertTokenizer.from_pretrained(model_path)
+
+
+class CachedTokenizer:
+    """Batch tokenizer with an optional LRU memo of token ids per text
+
+    Attribute access (``pad_token_id``, ``cls_token_id``, ...) is forwarded
+    to the wrapped tokenizer.
+    """
+
+    def __init__(self, tokenizer, max_entries=0, metrics=None):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.tokenizer, name)
+
+    def encode(self, texts, max_length=512, truncation=True, add_special_tokens=True):
+        """Return a list of token id lists, tokenizing only uncached texts"""
+        options = (max_length if truncation else None, add_special_tokens)
+        results = [None] * len(texts)
+        missing = []
+
+        if self.max_entries:
+            with self._lock:
+                for index, text in enumerate(texts):
+                    ids = self._memo.get((options, text))
+                    if ids is None:
+                        missing.append(index)
+                    else:
+                        self._memo.move_to_end((options, text))
+                        results[index] = ids
+            if self.metrics:
+                self.metrics.increment('tokenizer.cache_hits', len(texts) - len(missing))
+                self.metrics.increment('tokenizer.cache_misses', len(missing))
+        else:
+            missing = list(range(len(texts)))
+
+        if missing:
+            started = time.perf_counter()
+            encoded = self.tokenizer(
+                [texts[i] for i in missing],
+                truncation=truncation,
+                max_length=max_length if truncation else None,
+                add_special_tokens=add_special_tokens
+            )['input_ids']
+            if self.metrics:
+                self.metrics.observe('tokenizer.encode_ms', (time.perf_counter() - started) * 1000.0)
+                self.metrics.increment('tokenizer.texts', len(missing))
+
+            for index, ids in zip(missing, encoded):
+                results[index] = ids
+            if self.max_entries:
+                with self._lock:
+                    for index, ids in zip(missing, encoded):
+                        self._memo[(options, texts[index])] = ids
+                        self._memo.move_to_end((options, texts[index]))
+                    while len(self._memo) > self.max_entries:
+                        self._memo.popitem(last=False)
+
+        return results
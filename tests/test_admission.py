@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the bounded executor used by the ASGI server
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from admission import BoundedExecutor, Overloaded
+
+
+def test_runs_blocking_function():
+    """Results of the blocking function are returned to the coroutine"""
+    pool = BoundedExecutor(max_workers=2, max_pending=2)
+    assert asyncio.run(pool.run(lambda a, b: a + b, 2, 3)) == 5
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_rejects_when_full():
+    """Requests beyond max_pending are refused without queueing"""
+    pool = BoundedExecutor(max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await pool.run(release.wait)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(scenario()) == [True, True]
+    assert pool.rejected == 1
+    assert pool.pending == 0
+    pool.shutdown()
+
+
+def test_timeout_keeps_slot_until_task_finishes():
+    """A timed-out task still occupies its slot until its thread is done"""
+    pool = BoundedExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(release.wait, timeout=0.05)
+        assert pool.pending == 1
+        with pytest.raises(Overloaded):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
+    pool.shutdown()
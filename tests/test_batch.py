@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the bulk /analyze/batch endpoint
+"""
+
+import requests
+
+def test_batch_endpoint():
+    """Test bulk analysis with per-item results and errors"""
+
+    items = [
+        {"id": "earnings", "text": "Apple Inc. reported record quarterly earnings with revenue growth of 15%."},
+        {"id": "empty", "text": ""},
+        {"id": "selloff", "text": "Stocks plunged as investors worried about rising interest rates and weak demand."},
+        {"id": "fed", "text": "The Federal Reserve left rates unchanged, in line with analyst expectations."}
+    ]
+
+    print("📦 Testing Bulk Sentiment Analysis")
+    print("=" * 50)
+
+    # Check if server is running
+    try:
+        health_response = requests.get('http://localhost:5001/health', timeout=5)
+        if health_response.status_code != 200:
+            print("❌ Server is not responding properly")
+            return
+    except requests.exceptions.RequestException:
+        print("❌ Server is not running. Please start the server first:")
+        print("   python server.py")
+        return
+
+    response = requests.post(
+        'http://localhost:5001/analyze/batch',
+        json={'items': items},
+        timeout=30
+    )
+    assert response.status_code == 200, f"HTTP {response.status_code}"
+
+    result = response.json()
+    assert result['count'] == len(items)
+    assert result['errors'] == 1
+
+    by_id = {item['id']: item for item in result['results']}
+    assert 'error' in by_id['empty']
+    for item_id in ('earnings', 'selloff', 'fed'):
+        analysis = by_id[item_id]
+        assert analysis['label'] in ('LABEL_0', 'LABEL_1', 'LABEL_2')
+        assert set(analysis['scores']) == {'negative', 'neutral', 'positive'}
+        print(f"{item_id}: {analysis['label']} ({analysis['confidence'] * 100:.1f}%)")
+
+    print("✅ Bulk testing completed!")
+
+if __name__ == "__main__":
+    test_batch_endpoint()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for length bucketing and dynamic padding
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from bucketing import bucket_by_length, pad_batch, round_up
+from inference import DEFAULT_LENGTH_BUCKETS, CompiledClassifier, parse_buckets
+
+
+def test_round_up():
+    """Lengths round up to the requested multiple"""
+    assert round_up(1, 8) == 8
+    assert round_up(16, 8) == 16
+    assert round_up(17, 16) == 32
+    assert round_up(5, 1) == 5
+
+
+def test_pad_batch_pads_to_rounded_batch_maximum():
+    """Each batch is padded only to its own longest sequence"""
+    input_ids, attention_mask = pad_batch([[101, 5, 102], [101, 5, 6, 7, 8, 102]], pad_id=0, multiple=8)
+    assert input_ids.shape == (2, 8)
+    assert input_ids[0].tolist() == [101, 5, 102, 0, 0, 0, 0, 0]
+    assert attention_mask.sum(axis=1).tolist() == [3, 6]
+
+
+def test_pad_batch_respects_max_length():
+    """Rounding never pads beyond the model's maximum length"""
+    input_ids, _ = pad_batch([list(range(510))], multiple=16, max_length=512)
+    assert input_ids.shape == (1, 512)
+
+
+def test_bucket_by_length_groups_similar_lengths():
+    """Batches are length-sorted and honour size and token limits"""
+    lengths = [100, 5, 7, 98, 6, 101]
+    batches = bucket_by_length(lengths, max_batch_size=3)
+    assert batches == [[1, 4, 2], [3, 0, 5]]
+
+    limited = bucket_by_length(lengths, max_batch_size=3, max_tokens=200)
+    assert all(len(batch) * max(lengths[i] for i in batch) <= 200 or len(batch) == 1 for batch in limited)
+    assert sorted(i for batch in limited for i in batch) == list(range(len(lengths)))
+
+
+def test_length_buckets_always_cover_max_length():
+    """A bucket list that stops short of the tokenizer limit gets the limit appended"""
+    assert parse_buckets('32,16', max_length=512) == (16, 32, 512)
+    assert parse_buckets('', max_length=512) == DEFAULT_LENGTH_BUCKETS
+    assert parse_buckets('1,4') == (1, 4)
+
+
+def test_compiled_classifier_handles_inputs_wider_than_every_bucket():
+    """Inputs beyond the largest bucket run eagerly instead of failing to pad"""
+    tf = pytest.importorskip("tensorflow")
+
+    class MeanModel:
+        def __call__(self, input_ids, attention_mask, training=False):
+            length = tf.reduce_sum(tf.cast(attention_mask, tf.float32), axis=1)
+            logits = tf.stack([length, tf.zeros_like(length)], axis=1)
+            return type('Output', (), {'logits': logits})()
+
+    classifier = CompiledClassifier(MeanModel(), length_buckets=(16, 32))
+    input_ids = np.ones((2, 40), dtype=np.int32)
+    attention_mask = np.ones((2, 40), dtype=np.int32)
+    assert classifier.predict(input_ids, attention_mask).shape == (2, 2)
+    assert classifier.predict(input_ids[:, :20], attention_mask[:, :20]).shape == (2, 2)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Unit tests for long-document windowing and score aggregation
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from chunking import aggregate_chunk_scores, select_windows, split_into_windows
+
+
+def test_short_text_is_a_single_window():
+    """Texts that fit in one window are not split"""
+    assert split_into_windows(list(range(10)), window_size=510, stride=128) == [list(range(10))]
+
+
+def test_windows_overlap_and_cover_every_token():
+    """Consecutive windows share ``stride`` tokens and reach the end"""
+    tokens = list(range(25))
+    windows = split_into_windows(tokens, window_size=10, stride=3)
+    assert all(len(window) <= 10 for window in windows)
+    for previous, current in zip(windows, windows[1:]):
+        assert previous[-3:] == current[:3]
+    assert windows[-1][-1] == 24
+    assert sorted(set(token for window in windows for token in window)) == tokens
+
+
+def test_select_windows_spreads_over_the_document():
+    """Above the cap, windows are picked evenly from first to last"""
+    assert select_windows(5, 16) == [0, 1, 2, 3, 4]
+    selected = select_windows(100, 16)
+    assert len(selected) == 16 and len(set(selected)) == 16
+    assert selected[0] == 0 and selected[-1] == 99
+    assert max(b - a for a, b in zip(selected, selected[1:])) <= 7
+    assert select_windows(10, 1) == [0]
+
+
+def test_aggregation_methods():
+    """mean, weighted and max_confidence aggregate as documented"""
+    probabilities = [[0.6, 0.3, 0.1], [0.1, 0.1, 0.8]]
+    lengths = [300, 100]
+
+    np.testing.assert_allclose(aggregate_chunk_scores(probabilities, lengths, 'mean'), [0.35, 0.2, 0.45])
+    np.testing.assert_allclose(aggregate_chunk_scores(probabilities, lengths, 'weighted'), [0.475, 0.25, 0.275])
+    np.testing.assert_allclose(aggregate_chunk_scores(probabilities, lengths, 'max_confidence'), [0.1, 0.1, 0.8])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Unit tests for knowledge distillation and the student/teacher serving cascade
+"""
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from inference import CascadeClassifier
+from metrics import Metrics
+from token_cache import TOKENIZER_FILES, tokenizer_fingerprint
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'finbert')
+
+
+class FixedClassifier:
+    """Returns preset probabilities and records the shapes it was called with"""
+
+    def __init__(self, probabilities):
+        self.probabilities = np.array(probabilities, dtype=np.float32)
+        self.calls = []
+
+    def predict(self, input_ids, attention_mask):
+        self.calls.append(input_ids.shape)
+        return self.probabilities[:len(input_ids)]
+
+    def warmup(self, batch_sizes=(1,)):
+        return {1: 0.0}
+
+    def info(self):
+        return {'backend': 'fixed'}
+
+
+def test_cascade_falls_back_for_unsure_rows():
+    """Only rows below the confidence threshold are sent to the teacher, trimmed to their width"""
+    student = FixedClassifier([[0.9, 0.05, 0.05], [0.4, 0.3, 0.3], [0.1, 0.1, 0.8], [0.5, 0.5, 0.0]])
+    teacher = FixedClassifier([[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    metrics = Metrics()
+    cascade = CascadeClassifier(student, teacher, min_confidence=0.8, metrics=metrics)
+
+    input_ids = np.ones((4, 16), dtype=np.int32)
+    attention_mask = np.zeros((4, 16), dtype=np.int32)
+    for row, length in enumerate([16, 5, 9, 7]):
+        attention_mask[row, :length] = 1
+    probabilities = cascade.predict(input_ids, attention_mask)
+
+    assert teacher.calls == [(2, 7)]
+    np.testing.assert_allclose(probabilities[[0, 2]], student.probabilities[[0, 2]])
+    np.testing.assert_allclose(probabilities[[1, 3]], teacher.probabilities)
+    assert cascade.info()['fallback_rate'] == 0.5
+    assert metrics.snapshot()['counters']['inference.teacher_fallbacks'] == 2
+
+
+def tiny_teacher(path):
+    transformers = pytest.importorskip("transformers")
+    config = transformers.DistilBertConfig(dim=16, hidden_dim=32, n_layers=4, n_heads=2, num_labels=3)
+    model = transformers.TFDistilBertForSequenceClassification(config)
+    model(model.dummy_inputs)
+    model.save_pretrained(path)
+    for name in TOKENIZER_FILES:
+        if os.path.exists(os.path.join(MODEL_PATH, name)):
+            shutil.copy(os.path.join(MODEL_PATH, name), path)
+
+
+def test_distillation_loss():
+    """The loss is smallest when the student matches the teacher's softened distribution"""
+    tf = pytest.importorskip("tensorflow")
+    pytest.importorskip("transformers")
+    from distill_model import distillation_loss
+
+    loss = distillation_loss(2.0)
+    teacher = tf.constant([[2.0, 0.0, -1.0]])
+    matched = float(loss(teacher, teacher)[0])
+    assert matched < float(loss(teacher, tf.constant([[0.0, 2.0, -1.0]]))[0])
+    # Cross entropy of a distribution with itself is its entropy, scaled by T^2
+    soft = tf.nn.softmax(teacher / 2.0).numpy()[0]
+    assert matched == pytest.approx(-4.0 * float((soft * np.log(soft)).sum()), rel=1e-5)
+
+
+def test_distill_end_to_end(tmp_path):
+    """Soft labels are cached, the student is initialized from teacher layers, trained, saved and compared"""
+    pytest.importorskip("tensorflow")
+    pytest.importorskip("transformers")
+    from distill_model import ModelDistiller
+    from feedback_log import FeedbackLog, log_directory
+
+    teacher_dir = str(tmp_path / 'teacher')
+    tiny_teacher(teacher_dir)
+    feedback_dir = str(tmp_path / 'feedback')
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(40):
+        log.append({'text': f"Quarterly revenue changed by {i}% year over year",
+                    'predicted_sentiment': 'LABEL_1', 'user_feedback': 'accurate' if i % 4 else 'inaccurate'})
+    log.close()
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text(''.join(f"Analysts expect margins to move {i} points\n" for i in range(30)) + "short\n")
+
+    distiller = ModelDistiller(teacher_dir, feedback_dir, str(tmp_path / 'student'), batch_size=8)
+    distiller.load_teacher()
+    caches = distiller.prepare_soft_labels([str(corpus)])
+    assert [len(cache) for cache in caches] == [40, 30]
+    shard = caches[1].shards()[0]
+    np.testing.assert_allclose(shard.targets[0], distiller.teacher_logits([shard.ids(0)])[0], atol=1e-5)
+
+    # Nothing new: the feedback cache is reused and the finished corpus is not re-tokenized
+    calls = []
+    encode = distiller._encode
+    distiller._encode = lambda texts: calls.append(len(texts)) or encode(texts)
+    assert [len(cache) for cache in distiller.prepare_soft_labels([str(corpus)])] == [40, 30]
+    assert calls == []
+
+    student = distiller.build_student(layers=2)
+    assert len(student.distilbert.transformer.layer) == 2
+    np.testing.assert_array_equal(student.distilbert.transformer.layer[1].get_weights()[0],
+                                  distiller.teacher.distilbert.transformer.layer[3].get_weights()[0])
+
+    assert distiller.train(caches, epochs=1, learning_rate=1e-3)
+    distiller.save_student()
+    # The server refuses a student whose tokenizer files differ from the teacher's
+    assert tokenizer_fingerprint(str(tmp_path / 'student')) == tokenizer_fingerprint(teacher_dir)
+    texts, labels = distiller.evaluation_set(limit=50)
+    assert texts and labels is not None
+    report = distiller.comparison_report(texts, labels, min_confidence=0.5, latency_samples=5)
+    assert set(report['models']) == {'teacher', 'student', 'student+fallback@0.5'}
+    assert report['models']['teacher']['agreement_with_teacher'] == 1.0
+    assert report['models']['student']['parameters'] < report['models']['teacher']['parameters']
+    assert os.path.exists(os.path.join(str(tmp_path / 'student'), 'distillation_report.json'))
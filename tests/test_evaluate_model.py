@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batched model evaluation harness
+"""
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+transformers = pytest.importorskip("transformers")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from evaluate_model import ModelEvaluator, classification_metrics, format_comparison, iter_labeled_file
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'finbert')
+
+
+def test_metrics_match_sklearn():
+    """Accuracy, per-class precision/recall and the confusion matrix agree with sklearn"""
+    metrics_module = pytest.importorskip("sklearn.metrics")
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 3, size=1000)
+    probabilities = rng.dirichlet([1, 1, 1], size=1000)
+    predictions = probabilities.argmax(axis=1)
+
+    metrics = classification_metrics(labels, probabilities)
+    assert metrics['accuracy'] == pytest.approx(metrics_module.accuracy_score(labels, predictions))
+    assert metrics['precision'] == pytest.approx(list(metrics_module.precision_score(labels, predictions, average=None)))
+    assert metrics['recall'] == pytest.approx(list(metrics_module.recall_score(labels, predictions, average=None)))
+    assert metrics['confusion_matrix'] == metrics_module.confusion_matrix(labels, predictions).tolist()
+
+
+def test_expected_calibration_error():
+    """ECE is the support-weighted gap between confidence and accuracy per bin"""
+    probabilities = np.array([[0.9, 0.05, 0.05]] * 10 + [[0.2, 0.6, 0.2]] * 10)
+    labels = np.array([0] * 9 + [1] + [1] * 3 + [0] * 7)
+    metrics = classification_metrics(labels, probabilities)
+    # 0.9 bin: accuracy 0.9, confidence 0.9; 0.6 bin: accuracy 0.3, confidence 0.6
+    assert metrics['ece'] == pytest.approx(0.5 * 0.0 + 0.5 * 0.3)
+    # A class that is never predicted gets precision 0, not NaN
+    assert metrics['precision'][2] == 0.0
+
+
+def test_labeled_file_formats(tmp_path):
+    """CSV and JSONL inputs accept numeric, LABEL_n and named labels"""
+    csv_path = tmp_path / 'set.csv'
+    csv_path.write_text('text,label\nShares fell,0\nGuidance raised,LABEL_2\n,1\n')
+    assert list(iter_labeled_file(str(csv_path))) == [('Shares fell', 0), ('Guidance raised', 2)]
+    jsonl_path = tmp_path / 'set.jsonl'
+    jsonl_path.write_text('{"text": "Flat quarter", "label": "neutral"}\n\n')
+    assert list(iter_labeled_file(str(jsonl_path))) == [('Flat quarter', 1)]
+
+
+def test_bucketed_predictions_match_single_texts(tmp_path):
+    """Length bucketing returns probabilities in input order, equal to one-by-one inference"""
+    model_dir = str(tmp_path / 'model')
+    config = transformers.DistilBertConfig(dim=16, hidden_dim=32, n_layers=1, n_heads=2, num_labels=3)
+    model = transformers.TFDistilBertForSequenceClassification(config)
+    model(model.dummy_inputs)
+    model.save_pretrained(model_dir)
+    for name in ('vocab.txt', 'tokenizer_config.json', 'special_tokens_map.json'):
+        shutil.copy(os.path.join(MODEL_PATH, name), model_dir)
+
+    evaluator = ModelEvaluator(model_dir, batch_size=3)
+    texts = ["Revenue grew " + "strongly " * (i % 5) + str(i) for i in range(10)]
+    batched = evaluator.predict(texts)
+    single = np.concatenate([evaluator.predict([text]) for text in texts])
+    np.testing.assert_allclose(batched, single, atol=1e-5)
+
+    metrics = evaluator.evaluate(zip(texts, [i % 3 for i in range(10)]))
+    assert metrics['examples'] == 10
+    assert sum(map(sum, metrics['confusion_matrix'])) == 10
+    table = format_comparison({'a': metrics, 'b': metrics})
+    assert 'accuracy' in table and 'confusion matrix (b' in table
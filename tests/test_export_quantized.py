@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the quantized export's calibration/evaluation split
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+pytest.importorskip("tensorflow")
+pytest.importorskip("transformers")
+
+from export_quantized import MIN_EVALUATION_TEXTS, QuantizedExporter
+from feedback_log import FeedbackLog, log_directory
+
+
+def test_evaluation_texts_are_held_out(tmp_path):
+    """Calibration and evaluation texts never overlap"""
+    feedback_dir = str(tmp_path)
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(300):
+        log.append({'text': f"Segment margin moved {i} basis points", 'user_feedback': 'accurate'})
+    log.close()
+
+    calibration, evaluation = QuantizedExporter(feedback_dir=feedback_dir).load_texts()
+    assert len(evaluation) >= MIN_EVALUATION_TEXTS
+    assert not set(calibration) & set(evaluation)
+
+
+def test_report_refuses_a_tiny_evaluation_set(tmp_path):
+    """Without feedback only a sample text or two is held out, which is too few to report on"""
+    exporter = QuantizedExporter(feedback_dir=str(tmp_path / 'missing'), output_dir=str(tmp_path / 'out'))
+    _, evaluation = exporter.load_texts()
+    assert len(evaluation) < MIN_EVALUATION_TEXTS
+    for texts in (evaluation, []):
+        with pytest.raises(ValueError):
+            exporter.accuracy_delta_report('model.tflite', texts, 'dynamic')
+    assert not os.path.exists(str(tmp_path / 'out'))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the append-only feedback log and the migration tool
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from feedback_log import FeedbackLog, FeedbackLogReader, log_directory
+from feedback_store import iter_feedback
+from migrate_feedback import FeedbackMigrator
+
+
+def make_record(i):
+    return {
+        'text': f"Feedback text number {i} — café ünïcode",
+        'predicted_sentiment': 'LABEL_2',
+        'user_feedback': 'accurate' if i % 2 else 'inaccurate',
+        'timestamp': f"2025-07-08T22:{i % 60:02d}:00Z"
+    }
+
+
+def test_append_and_stream_in_order(tmp_path):
+    """Records come back in append order across rotated segments"""
+    log = FeedbackLog(str(tmp_path), segment_max_bytes=400, sync_every=4)
+    locations = [log.append(make_record(i)) for i in range(25)]
+    log.close()
+
+    reader = FeedbackLogReader(str(tmp_path))
+    assert len(reader.segments()) > 1
+    assert list(reader) == [make_record(i) for i in range(25)]
+    assert reader.count() == 25
+    for i, (segment, number) in enumerate(locations):
+        assert reader.read(segment, number) == make_record(i)
+
+
+def test_reader_skips_torn_tail(tmp_path):
+    """A partially written final line (crash mid-append) is ignored"""
+    log = FeedbackLog(str(tmp_path))
+    log.append(make_record(1))
+    log.close()
+    segment = FeedbackLogReader(str(tmp_path)).segments()[0]
+    with open(os.path.join(str(tmp_path), segment + '.jsonl'), 'ab') as f:
+        f.write(b'{"text": "half a rec')
+    assert list(FeedbackLogReader(str(tmp_path))) == [make_record(1)]
+
+
+def test_find_by_id_uses_incremental_index(tmp_path):
+    """Lookups index only new records and forget segments that were moved away"""
+    directory = str(tmp_path)
+    log = FeedbackLog(directory, segment_max_bytes=400)
+    records = [dict(make_record(i), feedback_id=f"id-{i}") for i in range(20)]
+    log.append_many(records[:10])
+    reader = FeedbackLogReader(directory)
+    assert reader.find('id-3') == records[3]
+    assert reader.find('missing') is None
+
+    log.append_many(records[10:])
+    log.close()
+    assert reader.find('id-15') == records[15]
+    index = sqlite3.connect(os.path.join(directory, 'ids.sqlite'))
+    assert index.execute("SELECT COUNT(*) FROM ids").fetchone()[0] == 20
+
+    oldest = reader.segments()[0]
+    os.remove(os.path.join(directory, oldest + '.jsonl'))
+    assert reader.find('id-0') is None
+    assert index.execute("SELECT COUNT(*) FROM ids WHERE segment = ?", (oldest,)).fetchone()[0] == 0
+    index.close()
+
+
+def test_migration_moves_legacy_files_into_log(tmp_path):
+    """Old per-file feedback is appended once and archived"""
+    feedback_dir = str(tmp_path)
+    for i in range(3):
+        with open(os.path.join(feedback_dir, f"feedback_20250708_22000{i}.json"), 'w', encoding='utf-8') as f:
+            json.dump(make_record(i), f, ensure_ascii=False, indent=2)
+    with open(os.path.join(feedback_dir, 'statistics.json'), 'w') as f:
+        json.dump({'total_feedback': 3}, f)
+
+    # Unmigrated files are already visible to readers
+    assert list(iter_feedback(feedback_dir)) == [make_record(i) for i in range(3)]
+
+    assert FeedbackMigrator(feedback_dir).migrate() == 3
+    assert FeedbackMigrator(feedback_dir).migrate() == 0
+    assert sorted(os.listdir(os.path.join(feedback_dir, 'legacy'))) == [
+        f"feedback_20250708_22000{i}.json" for i in range(3)
+    ]
+    assert FeedbackLogReader(log_directory(feedback_dir)).count() == 3
+    assert list(iter_feedback(feedback_dir)) == [make_record(i) for i in range(3)]
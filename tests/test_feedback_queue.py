@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the write-behind feedback writer
+"""
+
+import os
+import sys
+import threading
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from feedback_log import FeedbackLogReader, log_directory
+from feedback_queue import FeedbackWriter
+from feedback_store import find_feedback, iter_feedback, open_feedback_store
+
+
+def make_record(i):
+    return {'feedback_id': str(uuid.uuid4()), 'text': f"text {i}", 'user_feedback': 'accurate'}
+
+
+class BlockingStore:
+    """Store whose writes wait until released, to fill the queue"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.batches = []
+
+    def append_many(self, records):
+        if threading.current_thread().name == 'feedback-writer':
+            self.entered.set()
+            self.release.wait(5)
+        self.batches.append(list(records))
+        return list(range(len(records)))
+
+    def sync(self):
+        pass
+
+
+def test_records_are_batched_and_found_by_id(tmp_path):
+    """Queued records land in the log in order and are visible by id before and after"""
+    feedback_dir = str(tmp_path)
+    store = open_feedback_store('log', feedback_dir)
+    written = []
+    writer = FeedbackWriter(store, max_batch_size=16, max_wait_ms=20,
+                            on_written=lambda records, locations: written.append(len(records)))
+    records = [make_record(i) for i in range(50)]
+    for record in records:
+        writer.submit(record)
+    writer.close()
+    store.close()
+
+    assert list(FeedbackLogReader(log_directory(feedback_dir))) == records
+    assert sum(written) == 50 and max(written) <= 16
+    assert writer.pending(records[10]['feedback_id']) is None
+    assert find_feedback(feedback_dir, records[10]['feedback_id']) == records[10]
+    assert find_feedback(feedback_dir, str(uuid.uuid4())) is None
+
+
+def test_full_queue_spills_and_close_drains():
+    """Overflow is written synchronously; nothing accepted is lost"""
+    store = BlockingStore()
+    writer = FeedbackWriter(store, max_queue_size=2, max_batch_size=1, max_wait_ms=0)
+    records = [make_record(i) for i in range(6)]
+    writer.submit(records[0])
+    assert store.entered.wait(5)
+    for record in records[1:]:
+        writer.submit(record)
+
+    # One record is held by the blocked writer, two are queued, the rest spilled
+    spilled = [record for batch in store.batches for record in batch]
+    assert len(spilled) == 3
+    assert writer.pending(records[1]['feedback_id']) is not None
+
+    store.release.set()
+    writer.close()
+    assert sorted(r['text'] for batch in store.batches for r in batch) == sorted(r['text'] for r in records)
+    assert all(writer.pending(r['feedback_id']) is None for r in records)
+
+
+def test_sqlite_lookup_by_feedback_id(tmp_path):
+    """The SQLite backend indexes feedback_id for lookups"""
+    store = open_feedback_store('sqlite', str(tmp_path))
+    records = [make_record(i) for i in range(5)]
+    store.append_many(records)
+    store.close()
+    assert find_feedback(str(tmp_path), records[3]['feedback_id']) == records[3]
+
+
+class FailingStore:
+    def append_many(self, records):
+        raise OSError("disk full")
+
+    def sync(self):
+        pass
+
+
+def test_failed_batches_fall_back_to_legacy_files(tmp_path):
+    """A batch the store keeps rejecting is saved where every feedback reader finds it"""
+    feedback_dir = str(tmp_path)
+    writer = FeedbackWriter(FailingStore(), max_wait_ms=0, fallback_dir=feedback_dir)
+    records = [make_record(i) for i in range(3)]
+    for record in records:
+        writer.submit(record)
+    writer.close()
+
+    assert find_feedback(feedback_dir, records[1]['feedback_id']) == records[1]
+    assert sorted(r['text'] for r in iter_feedback(feedback_dir)) == sorted(r['text'] for r in records)
+    assert all(writer.pending(r['feedback_id']) is None for r in records)
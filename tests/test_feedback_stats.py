@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-memory feedback counters and their snapshots
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from feedback_stats import SNAPSHOT_SUFFIX, FeedbackCounters, FeedbackStatistics, statistics_payload
+
+
+def make_feedback(i):
+    return {
+        'predicted_sentiment': ['LABEL_0', 'LABEL_1', 'LABEL_2'][i % 3],
+        'predicted_confidence': 0.9 if i % 4 == 0 else 0.6,
+        'user_feedback': 'accurate' if i % 2 else 'inaccurate'
+    }
+
+
+def test_concurrent_records_are_not_lost():
+    """Threads recording at once add up exactly"""
+    counters = FeedbackCounters()
+
+    def worker():
+        for i in range(1000):
+            counters.record(make_feedback(i), now=0)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = statistics_payload(counters.totals(), hours=1, now=0)
+    assert stats['total_feedback'] == 8000
+    assert stats['accurate_predictions'] == stats['inaccurate_predictions'] == 4000
+    assert stats['high_confidence_errors'] == 2000
+    assert stats['sentiment_distribution'] == {'LABEL_0': 2672, 'LABEL_1': 2664, 'LABEL_2': 2664}
+    assert stats['hourly'] == {'1970-01-01T00': {'total': 8000, 'accurate': 4000, 'inaccurate': 4000}}
+
+
+def test_snapshots_merge_across_workers(tmp_path):
+    """Each instance sees the others' flushed snapshots plus its own live counts"""
+    directory = str(tmp_path / 'stats')
+    first = FeedbackStatistics(directory, flush_interval=0)
+    second = FeedbackStatistics(directory, flush_interval=0)
+    for i in range(3):
+        first.record(make_feedback(i))
+    second.record(make_feedback(1))
+
+    assert first.statistics()['total_feedback'] == 3
+    first.flush()
+    assert second.statistics()['total_feedback'] == 4
+    assert second.statistics()['accurate_predictions'] == 2
+
+
+def test_exited_workers_fold_into_base_with_legacy_seed(tmp_path):
+    """Old statistics.json and snapshots of dead processes end up in the base exactly once"""
+    legacy = tmp_path / 'statistics.json'
+    legacy.write_text(json.dumps({
+        'total_feedback': 10, 'accurate_predictions': 7, 'inaccurate_predictions': 3,
+        'high_confidence_errors': 1, 'sentiment_distribution': {'LABEL_0': 2, 'LABEL_1': 3, 'LABEL_2': 5}
+    }))
+    directory = tmp_path / 'stats'
+    directory.mkdir()
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    (directory / f"{1:020d}-{dead.pid}{SNAPSHOT_SUFFIX}").write_text(json.dumps({'counts': {'total_feedback': 5, 'accurate_predictions': 5}}))
+
+    stats = FeedbackStatistics(str(directory), legacy_file=str(legacy), flush_interval=0)
+    stats.record(make_feedback(0))
+    stats.flush()
+    stats.flush()
+
+    assert not any(name.startswith(f"{1:020d}") for name in os.listdir(directory))
+    totals = stats.statistics()
+    assert totals['total_feedback'] == 16
+    assert totals['accurate_predictions'] == 12
+    assert totals['sentiment_distribution']['LABEL_0'] == 3
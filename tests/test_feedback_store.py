@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the SQLite feedback store
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from feedback_log import FeedbackLog, FeedbackLogReader, log_directory
+from feedback_store import SQLiteFeedbackStore, database_path, iter_feedback, open_feedback_store
+from migrate_feedback import FeedbackMigrator
+
+
+def make_record(i, days_ago=0):
+    timestamp = datetime.now(timezone.utc) - timedelta(days=days_ago, minutes=i)
+    return {
+        'text': f"Feedback text number {i}",
+        'predicted_sentiment': ['LABEL_0', 'LABEL_1', 'LABEL_2'][i % 3],
+        'predicted_confidence': 0.5 + (i % 5) * 0.1,
+        'user_feedback': 'accurate' if i % 2 else 'inaccurate',
+        'timestamp': timestamp.isoformat().replace('+00:00', 'Z')
+    }
+
+
+def test_append_get_and_query(tmp_path):
+    """Rows round-trip and filters run on the indexed columns"""
+    store = open_feedback_store('sqlite', str(tmp_path))
+    records = [make_record(i) for i in range(30)]
+    ids = store.append_many(records[:29]) + [store.append(records[29])]
+    assert store.get(ids[7]) == records[7]
+    assert list(store) == records
+    assert store.count(user_feedback='inaccurate') == 15
+    assert list(store.query(predicted_sentiment='LABEL_1', batch_size=4)) == records[1::3]
+    plan = ' '.join(str(row) for row in store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT record FROM feedback WHERE user_feedback = ? AND timestamp >= ?",
+        ('inaccurate', 0)
+    ))
+    assert 'idx_feedback_user_feedback' in plan
+    store.close()
+
+
+def test_high_confidence_errors_and_statistics(tmp_path):
+    """Recent confident mistakes and aggregates come from SQL"""
+    store = SQLiteFeedbackStore(database_path(str(tmp_path)))
+    recent = [make_record(i) for i in range(10)]
+    old = [make_record(i, days_ago=30) for i in range(10)]
+    store.append_many(recent + old)
+
+    expected = [r for r in recent if r['user_feedback'] == 'inaccurate' and r['predicted_confidence'] > 0.8]
+    assert expected and store.high_confidence_errors(days=7) == expected
+
+    stats = store.statistics()
+    assert stats['total_feedback'] == 20
+    assert stats['accurate_predictions'] == 10
+    assert stats['accuracy_rate'] == 0.5
+    assert stats['sentiment_distribution'] == {'LABEL_0': 8, 'LABEL_1': 6, 'LABEL_2': 6}
+    store.close()
+
+
+def test_migration_to_sqlite_reads_every_source(tmp_path):
+    """Log segments are imported into the database and readers still see everything"""
+    feedback_dir = str(tmp_path)
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(4):
+        log.append(make_record(i))
+    log.close()
+    store = open_feedback_store('sqlite', feedback_dir)
+    store.append(make_record(4))
+    store.close()
+    before = sorted(r['text'] for r in iter_feedback(feedback_dir))
+    assert len(before) == 5
+
+    assert FeedbackMigrator(feedback_dir, backend='sqlite').migrate() == 4
+    assert FeedbackLogReader(log_directory(feedback_dir)).count() == 0
+    assert FeedbackMigrator(feedback_dir, backend='sqlite').total() == 5
+    assert sorted(r['text'] for r in iter_feedback(feedback_dir)) == before
+
+
+def test_migration_skips_segments_of_running_writers(tmp_path):
+    """The newest segment of a live writer process stays in place until it exits"""
+    feedback_dir = str(tmp_path)
+    directory = log_directory(feedback_dir)
+    os.makedirs(directory)
+    parent = os.getppid()  # alive while the tests run
+    for name, records in ((f"{1:020d}-{parent}", 1), (f"{2:020d}-{parent}", 2), (f"{3:020d}-999999999", 3)):
+        with open(os.path.join(directory, name + '.jsonl'), 'w', encoding='utf-8') as f:
+            for i in range(records):
+                f.write(json.dumps(make_record(i)) + '\n')
+
+    migrator = FeedbackMigrator(feedback_dir, backend='sqlite')
+    assert migrator.migrate() == 1 + 3
+    assert migrator.skipped_segments == [f"{2:020d}-{parent}"]
+    assert FeedbackLogReader(directory).segments() == [f"{2:020d}-{parent}"]
+    assert len(list(iter_feedback(feedback_dir))) == 6
+
+
+def test_repeated_migration_does_not_duplicate_rows(tmp_path):
+    """Records already imported (same feedback_id) are ignored on a rerun"""
+    feedback_dir = str(tmp_path)
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(5):
+        log.append(dict(make_record(i), feedback_id=f"id-{i}"))
+    log.close()
+
+    assert FeedbackMigrator(feedback_dir, keep_files=True, backend='sqlite').migrate() == 5
+    assert FeedbackMigrator(feedback_dir, keep_files=True, backend='sqlite').migrate() == 0
+    assert FeedbackMigrator(feedback_dir, backend='sqlite').total() == 5
+
+    store = SQLiteFeedbackStore(database_path(feedback_dir))
+    first = store.find('id-3')
+    assert store.append_many([dict(first, text='changed'), make_record(9)])[0] == store.append(first)
+    assert store.find('id-3') == first
+    assert store.count() == 6
+    store.close()
+
+
+def test_unique_index_removes_existing_duplicates(tmp_path):
+    """A database written before the unique index keeps the oldest row of each feedback_id"""
+    import sqlite3
+
+    path = database_path(str(tmp_path))
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE feedback (id INTEGER PRIMARY KEY AUTOINCREMENT, feedback_id TEXT, "
+               "timestamp REAL NOT NULL, predicted_sentiment TEXT, user_feedback TEXT, confidence REAL, "
+               "record TEXT NOT NULL)")
+    db.execute("CREATE INDEX idx_feedback_feedback_id ON feedback(feedback_id)")
+    for feedback_id, text in (('a', 'first'), ('a', 'again'), (None, 'anonymous'), (None, 'anonymous')):
+        db.execute("INSERT INTO feedback (feedback_id, timestamp, record) VALUES (?, 0, ?)",
+                   (feedback_id, json.dumps({'feedback_id': feedback_id, 'text': text})))
+    db.commit()
+    db.close()
+
+    store = SQLiteFeedbackStore(path)
+    assert store.count() == 3
+    assert store.find('a')['text'] == 'first'
+    store.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the TensorFlow fine-tuning loop (tiny randomly initialized model)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+from fine_tune import FineTuner
+
+
+class Interrupted(Exception):
+    pass
+
+
+def tiny_model():
+    config = transformers.DistilBertConfig(vocab_size=50, dim=16, hidden_dim=32, n_layers=1, n_heads=2, num_labels=3)
+    return transformers.TFDistilBertForSequenceClassification(config)
+
+
+def dataset():
+    rng = np.random.default_rng(0)
+    ids = rng.integers(5, 50, size=(64, 12)).astype(np.int32)
+    labels = (ids[:, 0] % 3).astype(np.int32)
+    return tf.data.Dataset.from_tensor_slices(
+        ({'input_ids': ids, 'attention_mask': np.ones_like(ids)}, labels)
+    ).batch(8)
+
+
+class InterruptedDataset:
+    """Raises after a number of batches, like a killed training run"""
+
+    def __init__(self, batches):
+        self.batches = batches
+
+    def skip(self, count):
+        return dataset().skip(count)
+
+    def __iter__(self):
+        for index, batch in enumerate(dataset()):
+            if index == self.batches:
+                raise Interrupted()
+            yield batch
+
+
+def test_gradient_accumulation_steps(tmp_path):
+    """The optimizer steps once per N batches, plus once for a partial window"""
+    trainer = FineTuner(tiny_model(), str(tmp_path), epochs=2, learning_rate=1e-2,
+                        accumulation_steps=3, log_steps=0, patience=5)
+    history = trainer.fit(dataset(), dataset(), 8)
+    assert [entry['epoch'] for entry in history] == [1, 2]
+    assert int(trainer.optimizer.iterations) == 2 * 3
+    assert history[-1]['loss'] < np.log(3)
+
+
+def test_resume_after_interruption(tmp_path):
+    """A rerun restores the last checkpoint and finishes the interrupted epoch"""
+    trainer = FineTuner(tiny_model(), str(tmp_path), epochs=1, learning_rate=1e-2,
+                        log_steps=0, checkpoint_steps=2)
+    with pytest.raises(Interrupted):
+        trainer.fit(InterruptedDataset(5), dataset(), 8)
+
+    resumed = FineTuner(tiny_model(), str(tmp_path), epochs=1, learning_rate=1e-2,
+                        log_steps=0, checkpoint_steps=2)
+    history = resumed.fit(lambda epoch: dataset(), dataset(), 8)
+    assert len(history) == 1
+    # Checkpoint at step 4, then the 4 remaining batches of the epoch
+    assert int(resumed.optimizer.iterations) == 8
+
+    # A finished run leaves no checkpoint behind: the next run trains from scratch
+    assert not os.path.exists(os.path.join(str(tmp_path), 'checkpoints'))
+    rerun = FineTuner(tiny_model(), str(tmp_path), epochs=1, learning_rate=1e-2, log_steps=0)
+    assert len(rerun.fit(dataset(), dataset(), 8)) == 1
+    assert int(rerun.optimizer.iterations) == 8
+
+
+def test_checkpoint_of_another_run_is_discarded(tmp_path, capsys):
+    """An interrupted run is not resumed once the training data has changed"""
+    trainer = FineTuner(tiny_model(), str(tmp_path), epochs=1, learning_rate=1e-2,
+                        log_steps=0, checkpoint_steps=2, run_key='feedback-v1')
+    with pytest.raises(Interrupted):
+        trainer.fit(InterruptedDataset(5), dataset(), 8)
+    capsys.readouterr()
+
+    restarted = FineTuner(tiny_model(), str(tmp_path), epochs=1, learning_rate=1e-2,
+                          log_steps=0, checkpoint_steps=2, run_key='feedback-v2')
+    restarted.fit(dataset(), dataset(), 8)
+    output = capsys.readouterr().out
+    assert '从检查点继续' not in output
+    assert int(restarted.optimizer.iterations) == 8
+
+
+def test_early_stopping(tmp_path):
+    """Training stops once validation loss has not improved for `patience` epochs"""
+    trainer = FineTuner(tiny_model(), str(tmp_path), epochs=10, learning_rate=0.0,
+                        warmup_steps=0, log_steps=0, patience=1)
+    history = trainer.fit(dataset(), dataset(), 8)
+    assert len(history) == 2
+
+
+def test_batch_count_matches_bucketed_dataset(tmp_path):
+    """Every length bucket ends with its own partial batch, and batch_count counts them"""
+    from fine_tune import batch_count, shard_dataset, split_sizes
+    from token_cache import TokenShardCache
+
+    rng = np.random.default_rng(1)
+    examples = [(f"example {i}", i % 3) for i in range(150)]
+    lengths = {text: int(rng.choice([5, 20, 40, 100, 300])) for text, _ in examples}
+    cache = TokenShardCache(str(tmp_path), 'fp', shard_size=64)
+    cache.extend(iter(examples), lambda texts: [[7] * lengths[text] for text in texts], batch_size=16, workers=1)
+
+    shards = cache.shards()
+    for validation in (False, True):
+        for max_length in (512, 64):
+            batches = list(shard_dataset(shards, 0, validation, batch_size=8, max_length=max_length))
+            assert batch_count(shards, validation, batch_size=8, max_length=max_length) == len(batches)
+    assert batch_count(shards, False, batch_size=8) > -(-split_sizes(shards)[0] // 8)
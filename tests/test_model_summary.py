@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for model-driven summary sentence selection
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from metrics import Metrics
+from model_summary import REQUEST_INFO_FIELDS, ModelSummarizer, cached_summary_info
+from result_cache import ResultCache
+from text_analytics import analyze_text
+
+# Fake classifier: probabilities are looked up by a marker word in the sentence
+PROBABILITIES = {
+    'alpha': [0.8, 0.1, 0.1],
+    'bravo': [0.1, 0.1, 0.8],
+    'charlie': [0.2, 0.6, 0.2],
+    'delta': [0.05, 0.05, 0.9],
+}
+
+
+class FakeScorer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sentences):
+        self.calls.append(list(sentences))
+        return np.array([PROBABILITIES[sentence.split()[0]] for sentence in sentences])
+
+
+def article(*markers):
+    return ' '.join(f"{marker} is a sentence long enough to count." for marker in markers)
+
+
+def test_selects_sentences_aligned_with_label():
+    """The sentence with the highest probability for the label wins"""
+    summarizer = ModelSummarizer(FakeScorer())
+    features = analyze_text(article('alpha', 'bravo', 'charlie'))
+    (negative, _), = summarizer.select([features], [0])
+    (positive, info), = summarizer.select([features], [2])
+    assert negative == ["alpha is a sentence long enough to count"]
+    assert positive == ["bravo is a sentence long enough to count"]
+    assert info['mode'] == 'model' and info['candidates'] == 3
+
+
+def test_top_k_keeps_document_order():
+    """Several sentences are returned in the order they appear"""
+    summarizer = ModelSummarizer(FakeScorer())
+    features = analyze_text(article('delta', 'alpha', 'bravo'))
+    (sentences, _), = summarizer.select([features], [2], k=2)
+    assert [sentence.split()[0] for sentence in sentences] == ['delta', 'bravo']
+
+
+def test_batch_uses_one_forward_pass_and_cache():
+    """All documents share one scoring call; repeated sentences hit the cache"""
+    scorer = FakeScorer()
+    metrics = Metrics()
+    summarizer = ModelSummarizer(scorer, cache=ResultCache('v1', max_entries=100), metrics=metrics)
+    documents = [analyze_text(article('alpha', 'bravo')), analyze_text(article('bravo', 'charlie')), analyze_text("")]
+
+    results = summarizer.select(documents, [0, 1, 2])
+    assert len(scorer.calls) == 1
+    assert sorted(sentence.split()[0] for sentence in scorer.calls[0]) == ['alpha', 'bravo', 'charlie']
+    assert [sentences for sentences, _ in results][2] == []
+
+    _, info = summarizer.select([analyze_text(article('charlie', 'delta'))], [1])[0]
+    assert info['sentences_cached'] == 1 and info['sentences_scored'] == 1
+    assert scorer.calls[1] == ["delta is a sentence long enough to count"]
+    assert metrics.snapshot()['counters']['summary.sentences_scored'] == 4
+
+
+def test_sentence_cap_limits_candidates():
+    """Only the first max_sentences sentences are scored"""
+    scorer = FakeScorer()
+    summarizer = ModelSummarizer(scorer, max_sentences=2)
+    (sentences, info), = summarizer.select([analyze_text(article('alpha', 'charlie', 'delta'))], [2])
+    assert info['candidates'] == 2
+    assert sentences == ["charlie is a sentence long enough to count"]
+
+
+def test_cached_info_drops_request_timing():
+    """A result served from the cache does not repeat the latency of the request that built it"""
+    summarizer = ModelSummarizer(FakeScorer())
+    _, info = summarizer.select([analyze_text(article('alpha', 'bravo'))], [0])[0]
+    stored = cached_summary_info(info)
+    assert stored == {'mode': 'model', 'cached': True}
+    assert not set(REQUEST_INFO_FIELDS) & set(stored)
+    assert 'latency_ms' in info
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the content-addressed result cache
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from result_cache import ResultCache, model_fingerprint
+
+
+def test_lru_eviction_and_counters():
+    """Least recently used entries are evicted and hits/misses counted"""
+    cache = ResultCache("v1", max_entries=2)
+    keys = [cache.make_key(text) for text in ("a", "b", "c")]
+
+    cache.put(keys[0], {'label': 'LABEL_0'})
+    cache.put(keys[1], {'label': 'LABEL_1'})
+    assert cache.get(keys[0]) == {'label': 'LABEL_0'}
+    cache.put(keys[2], {'label': 'LABEL_2'})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == {'label': 'LABEL_2'}
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 1
+
+
+def test_keys_normalize_whitespace_and_include_model_version():
+    """Whitespace variants share a key, model versions do not"""
+    cache = ResultCache("v1")
+    assert cache.make_key("Stocks  rise\n today ") == cache.make_key("Stocks rise today")
+    assert cache.make_key("Stocks rise") != ResultCache("v2").make_key("Stocks rise")
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL are not served"""
+    cache = ResultCache("v1", ttl_seconds=0.05)
+    key = cache.make_key("text")
+    cache.put(key, {'label': 'LABEL_1'})
+    time.sleep(0.1)
+    assert cache.get(key) is None
+
+
+def test_disk_tier_survives_restart_and_model_change(tmp_path):
+    """SQLite rows are reused by the same model and purged for a new one"""
+    db_path = str(tmp_path / "cache.db")
+    cache = ResultCache("v1", disk_path=db_path)
+    key = cache.make_key("Profits surge")
+    cache.put(key, {'label': 'LABEL_2'})
+
+    restarted = ResultCache("v1", disk_path=db_path)
+    assert restarted.get(key) == {'label': 'LABEL_2'}
+    assert restarted.stats()['disk_hits'] == 1
+
+    ResultCache("v2", disk_path=db_path)
+    reopened = ResultCache("v1", disk_path=db_path)
+    assert reopened.get(key) is None
+
+
+def test_model_fingerprint_changes_with_files(tmp_path):
+    """Editing a model file changes the fingerprint"""
+    config = tmp_path / "config.json"
+    config.write_text('{"n_layers": 6}')
+    before = model_fingerprint(str(tmp_path))
+    config.write_text('{"n_layers": 4}')
+    assert model_fingerprint(str(tmp_path)) != before
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the micro-batching inference scheduler
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from metrics import Metrics
+from scheduler import MicroBatchScheduler, QueueFullError, SchedulerTimeoutError
+
+
+def test_concurrent_requests_are_coalesced():
+    """Concurrent submissions should share forward passes"""
+    batch_sizes = []
+
+    def batch_fn(items):
+        batch_sizes.append(len(items))
+        time.sleep(0.01)
+        return [item * 2 for item in items]
+
+    metrics = Metrics()
+    scheduler = MicroBatchScheduler(batch_fn, max_batch_size=8, max_wait_ms=20, metrics=metrics)
+    results = {}
+
+    def worker(i):
+        results[i] = scheduler.submit(i, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: i * 2 for i in range(32)}
+    assert max(batch_sizes) <= 8
+    assert len(batch_sizes) < 32
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['scheduler.items'] == 32
+    assert 'scheduler.queue_wait_ms' in snapshot['observations']
+
+
+def test_batch_errors_reach_every_caller():
+    """An exception in the batch function should fail each waiting request"""
+    def batch_fn(items):
+        raise ValueError("boom")
+
+    scheduler = MicroBatchScheduler(batch_fn, max_batch_size=4, max_wait_ms=1)
+    try:
+        scheduler.submit("text", timeout=5)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_full_queue_is_rejected():
+    """Submissions beyond the queue bound should raise QueueFullError"""
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(5)
+        return items
+
+    scheduler = MicroBatchScheduler(batch_fn, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+    first = scheduler.submit_async(1)
+    time.sleep(0.05)  # let the worker pick up the first item
+    second = scheduler.submit_async(2)
+    try:
+        scheduler.submit_async(3)
+        assert False, "expected QueueFullError"
+    except QueueFullError:
+        pass
+    finally:
+        release.set()
+    assert first.result(timeout=5) == 1
+    assert second.result(timeout=5) == 2
+
+
+def test_timeout_is_reported_as_overload():
+    """A result that does not arrive in time raises SchedulerTimeoutError and is counted"""
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(5)
+        return items
+
+    metrics = Metrics()
+    scheduler = MicroBatchScheduler(batch_fn, max_batch_size=1, max_wait_ms=0, metrics=metrics)
+    try:
+        scheduler.submit(1, timeout=0.05)
+        assert False, "expected SchedulerTimeoutError"
+    except SchedulerTimeoutError:
+        pass
+    finally:
+        release.set()
+    assert metrics.snapshot()['counters']['scheduler.timeouts'] == 1
+    assert scheduler.submit(2, timeout=5) == 2
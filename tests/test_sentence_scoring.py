@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the vectorized sentence scorer
+"""
+
+import os
+import re
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from benchmark_text_analytics import LABELS, build_page
+from sentence_scoring import SentenceMatrix
+from text_analytics import analyze_text, rank_sentences
+
+DOCS = [
+    ["Profit rose 5% on strong growth", "Growth slowed", "No match here at all"],
+    [],
+    ["Losses widened as risk grew", "PROFIT warnings\nspread across the sector", "Profit margins hit 12%"],
+]
+
+
+def brute_force_scores(documents, weights_by_doc):
+    """Reference scores computed sentence by sentence"""
+    scores = []
+    for sentences, weights in zip(documents, weights_by_doc):
+        for sentence in sentences:
+            score = 0.0
+            for term, weight in weights.items():
+                matched = term.search(sentence) if hasattr(term, 'search') else term in sentence.lower()
+                score += weight if matched else 0.0
+            scores.append(score)
+    return np.array(scores)
+
+
+def test_scores_match_brute_force():
+    """Shared and per-document columns score like a per-sentence loop"""
+    percent = re.compile(r'\d+%')
+    matrix = SentenceMatrix(DOCS)
+    for term in ('profit', 'growth', percent):
+        matrix.add_column(term)
+    matrix.add_column('risk', doc=2)
+
+    weights_by_doc = [{'profit': 2.0, 'growth': 1.0, percent: 1.0}, {}, {'profit': 1.0, 'risk': 3.0, percent: 0.5}]
+    weights = np.zeros((len(DOCS), len(matrix.columns)))
+    for doc, doc_weights in enumerate(weights_by_doc):
+        for term, weight in doc_weights.items():
+            weights[doc, matrix.columns[term]] = weight
+
+    np.testing.assert_allclose(matrix.scores(weights), brute_force_scores(DOCS, weights_by_doc))
+
+
+def test_top_k_orders_by_score_then_sentence():
+    """Top-k ranks like sort(reverse=True) over (score, sentence)"""
+    matrix = SentenceMatrix([["b", "a", "c", "d"]])
+    scores = np.array([1.0, 1.0, 0.0, 2.0])
+    assert matrix.top_k(scores, 0, 1) == [3]
+    assert matrix.top_k(scores, 0, 3) == [3, 0, 1]
+    assert matrix.top_k(scores, 0, 10) == [3, 0, 1, 2]
+    assert matrix.top_k(scores, 0, 0) == []
+
+
+def test_empty_documents():
+    """Documents without sentences produce no rows and no selections"""
+    matrix = SentenceMatrix([[], []])
+    matrix.add_column('profit')
+    assert len(matrix.scores(np.ones((2, 1)))) == 0
+    assert matrix.top_k(np.zeros(0), 1, 3) == []
+
+
+def test_batch_ranking_matches_single_documents():
+    """Ranking many documents in one matrix gives each its own answer"""
+    texts = [build_page(4 * 1024, seed) for seed in range(6)] + ["Too short.", ""]
+    labels = [LABELS[i % len(LABELS)] for i in range(len(texts))]
+
+    batch = [analyze_text(text) for text in texts]
+    ranked = rank_sentences(batch, labels, k=3)
+
+    for text, label, top in zip(texts, labels, ranked):
+        single = analyze_text(text)
+        assert single.top_sentences(label, 3) == top
+        assert single.relevant_sentence(label) == (top[0] if top else "The article discusses market developments.")
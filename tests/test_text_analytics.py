@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Parity tests: single-pass text analytics must match the original helpers
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import benchmark_text_analytics as legacy
+from text_analytics import KeywordAutomaton, analyze_text, generate_investment_advice, generate_summary
+
+TEXTS = [
+    "",
+    "Short. Too short!",
+    "Apple Inc reported exceptional quarterly earnings with revenue growth of 15% year-over-year.",
+    "The S&P 500 dropped 3.2% — its worst session since March; AAPL fell $4.50 to $187.",
+    "Tesla's gross margin improved to 18.1%, beating estimates of 17.6%. Shares rose 5% in trading.",
+    "Café owners in Zürich cite “über-high” rents as profits decline. ΟΔΥΣΣΕΥΣ.ΑΣ said PROFITΣ. Shareholders worry!",
+    "Stocks stocks STOCKS. Markets rallied?! Market breadth improved... Dividend yields fell 2.5M points",
+    "The Federal Reserve left interest rates unchanged. The Federal Reserve left interest rates unchanged.",
+    "Microsoft Corp and Goldman Sachs said the company risk was positive, a $10B gain with 20% growth",
+    legacy.build_page(20 * 1024, seed=3),
+]
+
+SCORES = [
+    {'negative': 0.9, 'neutral': 0.05, 'positive': 0.05},
+    {'negative': 0.05, 'neutral': 0.2, 'positive': 0.75},
+]
+
+
+def test_automaton_reports_overlapping_keywords():
+    """Keywords that overlap or nest inside each other are all reported"""
+    automaton = KeywordAutomaton(['he', 'she', 'his', 'hers', 'earn', 'earnings', 'arn'])
+    assert automaton.find('ushers') == {'he', 'she', 'hers'}
+    assert automaton.find('earnings') == {'earn', 'earnings', 'arn'}
+    assert automaton.find('') == set()
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_features_match_original_helpers(text):
+    """Key phrases, entities, numbers and sentences are unchanged"""
+    features = analyze_text(text)
+    assert features.key_phrases == legacy.legacy_extract_key_phrases(text)
+    assert features.companies == legacy.legacy_extract_companies(text)
+    assert features.numbers == legacy.legacy_extract_numbers(text)
+
+    sentences = [s.strip() for s in text.replace('!', '.').replace('?', '.').split('.') if len(s.strip()) > 20]
+    assert features.sentences == sentences
+    for label in legacy.LABELS:
+        expected = legacy.legacy_find_most_relevant_sentence(sentences, label, features.key_phrases)
+        assert features.relevant_sentence(label) == expected
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_summary_and_advice_match_original(text):
+    """Summaries and investment advice are identical for every label"""
+    features = analyze_text(text)
+    for label in legacy.LABELS:
+        for confidence in legacy.CONFIDENCES:
+            assert generate_summary(text, label, confidence, features) == \
+                legacy.legacy_generate_summary(text, label, confidence)
+            for scores in SCORES:
+                assert generate_investment_advice(scores, label, confidence, text, features) == \
+                    legacy.legacy_generate_investment_advice(scores, label, confidence, text)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the pre-tokenized training data cache
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from feedback_log import FeedbackLog, log_directory
+from token_cache import TokenShardCache, in_validation_split, text_hash, tokenizer_fingerprint
+
+MODEL_PATH = os.path.join(ROOT, 'models', 'finbert')
+
+
+def encode(texts):
+    return [[101] + [ord(c) for c in text] + [102] for text in texts]
+
+
+def test_shards_round_trip(tmp_path):
+    """Examples come back from memory-mapped shards with their labels and hashes"""
+    examples = [(f"text number {i}" + "x" * (i % 7), i % 3) for i in range(25)]
+    cache = TokenShardCache(str(tmp_path), 'fp', shard_size=10)
+    position = {'read': 25}
+    assert cache.extend(iter(examples), encode, position=position, batch_size=5, workers=2) == 25
+
+    reopened = TokenShardCache(str(tmp_path), 'fp', shard_size=10)
+    shards = reopened.shards()
+    assert [len(shard) for shard in shards] == [10, 10, 5]
+    assert len(reopened) == 25
+    assert reopened.position == position
+
+    index = 0
+    for shard in shards:
+        assert list(shard.lengths()) == [len(shard.ids(i)) for i in range(len(shard))]
+        for i in range(len(shard)):
+            text, label = examples[index]
+            assert list(shard.ids(i)) == encode([text])[0]
+            assert shard.labels[i] == label
+            assert shard.hashes[i] == text_hash(text)
+            index += 1
+
+
+def test_extend_appends_new_shards_only(tmp_path):
+    """A second extend adds shards and leaves the committed ones untouched"""
+    cache = TokenShardCache(str(tmp_path), 'fp', shard_size=100)
+    cache.extend([("first batch", 0)] * 3, encode, position={'n': 3})
+    first = os.path.join(cache.directory, 'shard-00000.tokens.npy')
+    mtime = os.path.getmtime(first)
+
+    cache.extend([("second batch", 1)] * 2, encode, position={'n': 5})
+    assert [len(shard) for shard in cache.shards()] == [3, 2]
+    assert os.path.getmtime(first) == mtime
+    assert cache.position == {'n': 5}
+
+    # Nothing new: the position still moves, no empty shard is written
+    assert cache.extend([], encode, position={'n': 6}) == 0
+    assert len(cache.manifest['shards']) == 2
+    assert cache.position == {'n': 6}
+
+
+def test_fingerprint_tracks_tokenizer_files(tmp_path):
+    """Changing the vocabulary or max length selects a different cache directory"""
+    (tmp_path / 'vocab.txt').write_text("[PAD]\n[UNK]\nhello\n")
+    before = tokenizer_fingerprint(str(tmp_path))
+    assert tokenizer_fingerprint(str(tmp_path)) == before
+    assert tokenizer_fingerprint(str(tmp_path), max_length=128) != before
+    (tmp_path / 'vocab.txt').write_text("[PAD]\n[UNK]\nhello\nworld\n")
+    assert tokenizer_fingerprint(str(tmp_path)) != before
+
+
+def test_retrainer_counts_feedback_with_the_cache(tmp_path):
+    """Feedback counters are kept in the manifest and updated from the same read as the shards"""
+    pytest.importorskip("transformers")
+    from feedback_store import open_feedback_store
+    from retrain_with_feedback import FeedbackBasedRetrainer
+    from tokenization import load_tokenizer
+
+    feedback_dir = str(tmp_path / 'feedback')
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(10):
+        log.append({'text': f"Operating income rose {i}% on cost cuts", 'predicted_sentiment': 'LABEL_2',
+                    'predicted_confidence': 0.9, 'user_feedback': 'inaccurate' if i < 3 else 'accurate'})
+    # A record without a confidence must not break the counting
+    log.append({'text': "Dividend unchanged this quarter", 'predicted_sentiment': 'LABEL_1',
+                'predicted_confidence': None, 'user_feedback': 'inaccurate'})
+    log.close()
+    store = open_feedback_store('sqlite', feedback_dir)
+    store.append({'text': "Net loss widened sharply", 'predicted_sentiment': 'LABEL_0',
+                  'predicted_confidence': 0.95, 'user_feedback': 'inaccurate'})
+    store.close()
+
+    retrainer = FeedbackBasedRetrainer(MODEL_PATH, feedback_dir)
+    retrainer.tokenizer = load_tokenizer(MODEL_PATH)
+    cache = retrainer.prepare_training_data()
+    assert cache.position['counters']['total'] == 11  # the database row is counted by SQL
+    assert retrainer.load_feedback_data(cache)
+    expected = {'total': 12, 'accurate': 7, 'high_confidence_errors': 4,
+                'sentiments': {'LABEL_2': 10, 'LABEL_1': 1, 'LABEL_0': 1}}
+    assert retrainer.feedback_summary == expected
+
+    log = FeedbackLog(log_directory(feedback_dir))
+    log.append({'text': "Guidance was raised for the full year", 'predicted_sentiment': 'LABEL_2',
+                'user_feedback': 'accurate'})
+    log.close()
+    retrainer = FeedbackBasedRetrainer(MODEL_PATH, feedback_dir)
+    retrainer.tokenizer = load_tokenizer(MODEL_PATH)
+    assert retrainer.load_feedback_data(retrainer.prepare_training_data())
+    assert retrainer.feedback_summary['total'] == 13
+    assert retrainer.feedback_summary['accurate'] == 8
+    assert retrainer.feedback_summary['sentiments']['LABEL_2'] == 11
+
+
+def test_retrainer_tokenizes_only_new_feedback(tmp_path):
+    """Retraining data is read from the cache and extended with new feedback"""
+    pytest.importorskip("transformers")
+    from retrain_with_feedback import FeedbackBasedRetrainer
+    from tokenization import load_tokenizer
+
+    feedback_dir = str(tmp_path / 'feedback')
+    log = FeedbackLog(log_directory(feedback_dir))
+    for i in range(30):
+        log.append({
+            'text': f"Revenue grew {i}% while margins {'expanded' if i % 2 else 'narrowed'}",
+            'predicted_sentiment': ['LABEL_0', 'LABEL_1', 'LABEL_2'][i % 3],
+            'user_feedback': 'inaccurate' if i % 5 == 0 else 'accurate'
+        })
+    log.close()
+
+    retrainer = FeedbackBasedRetrainer(MODEL_PATH, feedback_dir)
+    retrainer.tokenizer = load_tokenizer(MODEL_PATH)
+    cache = retrainer.prepare_training_data()
+    assert len(cache) == 24
+
+    calls = []
+    tokenizer = retrainer.tokenizer
+    retrainer.tokenizer = lambda texts, **kwargs: calls.append(len(texts)) or tokenizer(texts, **kwargs)
+    assert len(retrainer.prepare_training_data()) == 24
+    assert calls == []
+
+    log = FeedbackLog(log_directory(feedback_dir))
+    log.append({'text': "Guidance was raised for the full year", 'predicted_sentiment': 'LABEL_2',
+                'user_feedback': 'accurate'})
+    log.close()
+    cache = retrainer.prepare_training_data()
+    assert calls == [1]
+    retrainer.tokenizer = tokenizer
+    assert len(cache) == 25
+
+    train, val = retrainer.create_dataset(cache, batch_size=4, shuffle_buffer=8, seed=0)
+    batches = list(train(0).as_numpy_iterator()) + list(val.as_numpy_iterator())
+    assert sum(len(labels) for _, labels in batches) == 25
+    # The learning rate schedule is sized from the batches an epoch really has
+    assert retrainer.train_batches == len(list(train(0)))
+    for features, labels in batches:
+        assert features['input_ids'].shape[1] % 8 == 0
+        assert len(labels) <= 4
+        assert (features['attention_mask'].sum(axis=1) > 0).all()
+        assert (features['input_ids'][features['attention_mask'] == 0] == retrainer.tokenizer.pad_token_id).all()
+
+    # An epoch's batch order is reproducible, so a resumed run skips exactly the trained batches
+    def order(epoch):
+        return [features['input_ids'].tolist() for features, _ in train(epoch).as_numpy_iterator()]
+    assert order(1) == order(1)
+
+    # Validation membership depends only on the text
+    first = sorted(tuple(ids[mask == 1]) for features, _ in val.as_numpy_iterator()
+                   for ids, mask in zip(features['input_ids'], features['attention_mask']))
+    second = sorted(tuple(ids[mask == 1]) for features, _ in val.as_numpy_iterator()
+                    for ids, mask in zip(features['input_ids'], features['attention_mask']))
+    assert first == second
+
+
+def test_validation_split_is_stable(tmp_path):
+    """The hash split keeps each example on its side and matches the requested share"""
+    hashes = [text_hash(f"headline {i}") for i in range(5000)]
+    split = in_validation_split(hashes, 20)
+    assert 0.17 < split.mean() < 0.23
+    assert (in_validation_split(hashes[:100], 20) == split[:100]).all()
+    assert not in_validation_split(hashes, 0).any()
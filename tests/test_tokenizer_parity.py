@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Parity tests: the fast tokenizer must produce the same ids as the Python one
+"""
+
+import os
+import sys
+
+import pytest
+
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from metrics import Metrics
+from tokenization import CachedTokenizer, load_tokenizer
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models', 'finbert')
+
+TEXTS = [
+    "Apple Inc. reported exceptional quarterly earnings with revenue growth of 15% year-over-year.",
+    "The S&P 500 dropped 3.2% — its worst session since March; AAPL fell $4.50 to $187.",
+    "Tesla's gross margin improved to 18.1%, beating estimates of 17.6%.",
+    "Café owners in Zürich cite “über-high” rents 😬 as profits decline.",
+    "   leading and trailing   whitespace\tand\ttabs\n",
+    "",
+    "Treasury Secretary Scott Bessent said tariff income could reach $300 billion. " * 60,
+]
+
+
+@pytest.fixture(scope="module")
+def tokenizers():
+    slow = transformers.DistilBertTokenizer.from_pretrained(MODEL_PATH)
+    fast = load_tokenizer(MODEL_PATH, fast=True)
+    assert fast.is_fast
+    return slow, fast
+
+
+def test_fast_tokenizer_matches_python_tokenizer(tokenizers):
+    """Truncated ids with special tokens are identical"""
+    slow, fast = tokenizers
+    expected = slow(TEXTS, truncation=True, max_length=512)['input_ids']
+    actual = fast(TEXTS, truncation=True, max_length=512)['input_ids']
+    assert actual == expected
+
+
+def test_fast_tokenizer_matches_without_special_tokens(tokenizers):
+    """Untruncated content ids used by long-document mode are identical"""
+    slow, fast = tokenizers
+    for text in TEXTS:
+        assert fast(text, add_special_tokens=False)['input_ids'] == slow(text, add_special_tokens=False)['input_ids']
+
+
+def test_cached_tokenizer_memoizes_ids(tokenizers):
+    """Repeated texts are served from the memo with identical ids"""
+    _, fast = tokenizers
+    metrics = Metrics()
+    cached = CachedTokenizer(fast, max_entries=16, metrics=metrics)
+
+    first = cached.encode(TEXTS[:3])
+    second = cached.encode(TEXTS[:3])
+    assert first == second == fast(TEXTS[:3], truncation=True, max_length=512)['input_ids']
+
+    counters = metrics.snapshot()['counters']
+    assert counters['tokenizer.cache_hits'] == 3
+    assert counters['tokenizer.cache_misses'] == 3
+    assert cached.pad_token_id == fast.pad_token_id
@@ -4,42 +4,261 @@
 用于分析用户反馈数据，识别模型改进机会
 """
 
+import argparse
 import json
 import os
+import re
+import sys
 import pandas as pd
 from collections import Counter
-import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from export_feedback import iter_record_frames
+from feedback_store import FeedbackCursor, SQLiteFeedbackStore, database_path, parse_timestamp
+
+# 报告只需要这些列；Parquet 按列读取，其余列不会加载
+ANALYSIS_COLUMNS = ['timestamp', 'predicted_sentiment', 'predicted_confidence', 'user_feedback', 'text']
+SENTIMENT_NAMES = {
+    'LABEL_0': 'Negative',
+    'LABEL_1': 'Neutral',
+    'LABEL_2': 'Positive'
+}
+COMMON_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'}
+HIGH_CONFIDENCE = 0.8
+EXAMPLES = 5
+RECENT_DAYS = 7
+CHECKPOINT_FILENAME = 'analysis_checkpoint.json'
+CHECKPOINT_VERSION = 2
+
+# ASCII 字节中 \w 以外的字符映射为空格，bytes.translate + split 比逐词正则快得多
+_ASCII_WORDS = bytes(c if chr(c).isalnum() or c == ord('_') else ord(' ') for c in range(128)) + b' ' * 128
+_WORD = re.compile(r'\w+')
+
+def count_words(texts, counter):
+    """把 texts 中的小写单词（\\b\\w+\\b）计数累加到 counter"""
+    joined = ' '.join(texts).lower()
+    if joined.isascii():
+        words = Counter(joined.encode('ascii').translate(_ASCII_WORDS).split())
+        counter.update({word.decode('ascii'): count for word, count in words.items()})
+    else:
+        counter.update(_WORD.findall(joined))
+
+def _value_counts(series):
+    """value_counts 结果转为 dict，缺失值记为 None（与逐条 Counter 一致）"""
+    return {(None if pd.isna(key) else key): int(count) for key, count in series.value_counts(dropna=False).items()}
 
 class FeedbackAnalyzer:
-    def __init__(self, feedback_dir="feedback_data"):
+    def __init__(self, feedback_dir="feedback_data", parquet_path=None, chunk_size=200000, checkpoint_path=None):
         self.feedback_dir = feedback_dir
-        self.feedback_files = []
-        self.feedback_data = []
-        
+        self.parquet_path = parquet_path
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+        self.summary = None
+    
+    def iter_frames(self, cursor=None):
+        """按块产生只含分析列的 DataFrame：读 Parquet 导出，或从游标位置流式读取存储"""
+        if self.parquet_path:
+            import pyarrow.parquet as pq
+            parquet = pq.ParquetFile(self.parquet_path)
+            for batch in parquet.iter_batches(batch_size=self.chunk_size, columns=ANALYSIS_COLUMNS):
+                yield batch.to_pandas()
+        else:
+            for frame in iter_record_frames(cursor or FeedbackCursor(self.feedback_dir), self.chunk_size):
+                yield frame[ANALYSIS_COLUMNS]
+    
     def load_feedback_data(self):
-        """加载所有反馈数据"""
-        if not os.path.exists(self.feedback_dir):
+        """一次遍历反馈，按块做向量化聚合；有检查点时只处理上次之后新增的反馈
+
+        feedback.db 中的反馈不逐条读取：计数和分布由 SQL 聚合回答，只流式读取错误预测的行；
+        检查点只覆盖日志分段和旧文件
+        """
+        if not self.parquet_path and not os.path.exists(self.feedback_dir):
             print(f"❌ 反馈数据目录不存在: {self.feedback_dir}")
             return
-            
-        # 获取所有反馈文件
-        for filename in os.listdir(self.feedback_dir):
-            if filename.endswith('.json') and filename.startswith('feedback_'):
-                filepath = os.path.join(self.feedback_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        data['filename'] = filename
-                        self.feedback_data.append(data)
-                except Exception as e:
-                    print(f"⚠️ 无法读取文件 {filename}: {e}")
-        
-        print(f"📊 加载了 {len(self.feedback_data)} 条反馈数据")
+        
+        summary, cursor = None, None
+        if self.checkpoint_path and not self.parquet_path:
+            summary, cursor = self._load_checkpoint()
+        if summary is None:
+            summary, cursor = self._empty_summary(), FeedbackCursor(self.feedback_dir, include_database=False)
+        
+        previous = summary['total']
+        now = datetime.now(timezone.utc)
+        since = pd.Timestamp(now - timedelta(days=RECENT_DAYS))
+        for frame in self.iter_frames(cursor):
+            self._aggregate(summary, frame, since)
+        
+        # 窗口外的时间戳以后也不会再回到窗口内
+        summary['recent_high_confidence_errors'] = [
+            t for t in summary['recent_high_confidence_errors'] if t >= since.timestamp()
+        ]
+        if self.checkpoint_path and not self.parquet_path:
+            self._save_checkpoint(summary, cursor)
+        
+        self.summary = summary
+        if not self.parquet_path and os.path.exists(database_path(self.feedback_dir)):
+            # 数据库中的行排在日志之前，与全量遍历的顺序一致
+            self.summary = self._combine(self._database_summary(since), summary)
+        
+        if previous:
+            print(f"📊 加载了 {self.summary['total']} 条反馈数据（新增 {summary['total'] - previous} 条）")
+        else:
+            print(f"📊 加载了 {self.summary['total']} 条反馈数据")
+    
+    def _database_summary(self, since):
+        """feedback.db 的统计：总数、准确数、情感分布和时间范围用 SQL 聚合，错误数走索引计数"""
+        summary = self._empty_summary()
+        store = SQLiteFeedbackStore(database_path(self.feedback_dir))
+        try:
+            stats = store.statistics(HIGH_CONFIDENCE)
+            summary['total'] = stats['total_feedback']
+            summary['accurate'] = stats['accurate_predictions']
+            summary['errors'] = store.count(user_feedback='inaccurate')
+            summary['high_confidence_errors'] = store.count(user_feedback='inaccurate', min_confidence=HIGH_CONFIDENCE)
+            summary['recent_high_confidence_errors'] = [
+                parse_timestamp(record.get('timestamp'), since.timestamp())
+                for record in store.high_confidence_errors(RECENT_DAYS, HIGH_CONFIDENCE)
+            ]
+            summary['sentiments'] = Counter(stats['sentiment_distribution'])
+            for key in ('first_timestamp', 'last_timestamp'):
+                if stats[key] is not None:
+                    summary[key] = pd.Timestamp(stats[key], unit='s', tz='UTC')
+            # 错误词频和示例需要文本：只读取错误预测的行
+            for frame in iter_record_frames(store.query(user_feedback='inaccurate'), self.chunk_size):
+                self._aggregate_errors(summary, frame[ANALYSIS_COLUMNS])
+        finally:
+            store.close()
+        return summary
+    
+    @staticmethod
+    def _combine(first, second):
+        """合并两份汇总，示例按 first、second 的顺序保留前几条"""
+        combined = FeedbackAnalyzer._empty_summary()
+        for part in (first, second):
+            for key in ('total', 'accurate', 'errors', 'high_confidence_errors'):
+                combined[key] += part[key]
+            for key in ('recent_high_confidence_errors', 'examples'):
+                combined[key].extend(part[key])
+            for key in ('sentiments', 'error_sentiments', 'error_words'):
+                combined[key].update(part[key])
+            if part['first_timestamp'] is not None:
+                if combined['first_timestamp'] is None or part['first_timestamp'] < combined['first_timestamp']:
+                    combined['first_timestamp'] = part['first_timestamp']
+                if combined['last_timestamp'] is None or part['last_timestamp'] > combined['last_timestamp']:
+                    combined['last_timestamp'] = part['last_timestamp']
+        combined['examples'] = combined['examples'][:EXAMPLES]
+        return combined
+    
+    def _load_checkpoint(self):
+        """读取检查点；不存在或已失效（数据被迁移、参数变化）时返回 (None, None)"""
+        if not os.path.exists(self.checkpoint_path):
+            return None, None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 无法读取检查点 {self.checkpoint_path}: {e}")
+            return None, None
+        
+        cursor = FeedbackCursor(self.feedback_dir, state=checkpoint.get('position'), include_database=False)
+        if (checkpoint.get('version') != CHECKPOINT_VERSION
+                or checkpoint.get('high_confidence') != HIGH_CONFIDENCE
+                or not cursor.is_valid()):
+            print("🔄 检查点已失效，重新全量分析")
+            return None, None
+        
+        stored = checkpoint['summary']
+        summary = dict(stored)
+        for key in ('sentiments', 'error_sentiments', 'error_words'):
+            summary[key] = Counter(dict((k, v) for k, v in stored[key]))
+        for key in ('first_timestamp', 'last_timestamp'):
+            summary[key] = pd.Timestamp(stored[key]) if stored[key] else None
+        return summary, cursor
+    
+    def _save_checkpoint(self, summary, cursor):
+        """原子写入检查点：读取位置 + 聚合结果"""
+        stored = dict(summary)
+        for key in ('sentiments', 'error_sentiments', 'error_words'):
+            # 键可能是 None，用键值对列表保存（同时保留计数顺序）
+            stored[key] = list(summary[key].items())
+        for key in ('first_timestamp', 'last_timestamp'):
+            stored[key] = summary[key].isoformat() if summary[key] is not None else None
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'high_confidence': HIGH_CONFIDENCE,
+            'updated': datetime.now(timezone.utc).isoformat(),
+            'position': cursor.state,
+            'summary': stored
+        }
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp, self.checkpoint_path)
+    
+    @staticmethod
+    def _empty_summary():
+        return {
+            'total': 0,
+            'accurate': 0,
+            'errors': 0,
+            'high_confidence_errors': 0,
+            'recent_high_confidence_errors': [],  # 最近窗口内高置信度错误的时间戳
+            'first_timestamp': None,
+            'last_timestamp': None,
+            'sentiments': Counter(),
+            'error_sentiments': Counter(),
+            'error_words': Counter(),
+            'examples': []
+        }
+    
+    @staticmethod
+    def _aggregate(summary, frame, since):
+        """把一块数据的各项统计累加到 summary"""
+        sentiment = frame['predicted_sentiment'].astype(object)
+        accurate = frame['user_feedback'].astype(object).eq('accurate').to_numpy()
+        errors = frame['user_feedback'].astype(object).eq('inaccurate').to_numpy()
+        high_confidence = errors & (frame['predicted_confidence'].fillna(0).to_numpy() > HIGH_CONFIDENCE)
+        timestamps = frame['timestamp']
+        
+        summary['total'] += len(frame)
+        summary['accurate'] += int(accurate.sum())
+        summary['errors'] += int(errors.sum())
+        summary['high_confidence_errors'] += int(high_confidence.sum())
+        recent = high_confidence & (timestamps >= since).to_numpy()
+        summary['recent_high_confidence_errors'].extend(t.timestamp() for t in timestamps[recent])
+        
+        if timestamps.notna().any():
+            first, last = timestamps.min(), timestamps.max()
+            if summary['first_timestamp'] is None or first < summary['first_timestamp']:
+                summary['first_timestamp'] = first
+            if summary['last_timestamp'] is None or last > summary['last_timestamp']:
+                summary['last_timestamp'] = last
+        
+        summary['sentiments'].update(_value_counts(sentiment))
+        FeedbackAnalyzer._aggregate_errors(summary, frame[errors])
+    
+    @staticmethod
+    def _aggregate_errors(summary, errors):
+        """错误预测行的情感分布、高置信度示例和词频"""
+        summary['error_sentiments'].update(_value_counts(errors['predicted_sentiment'].astype(object)))
+        
+        if len(summary['examples']) < EXAMPLES:
+            high_confidence = errors['predicted_confidence'].fillna(0) > HIGH_CONFIDENCE
+            examples = errors.loc[high_confidence, ['predicted_sentiment', 'predicted_confidence', 'text']]
+            for row in examples.head(EXAMPLES - len(summary['examples'])).itertuples(index=False):
+                summary['examples'].append(row._asdict())
+        
+        # 错误预测文本的词频：先按块计数，再按词表过滤常见词汇和短词
+        words = Counter()
+        count_words(errors['text'].dropna().astype(str).to_numpy(), words)
+        summary['error_words'].update({
+            word: count for word, count in words.items() if word not in COMMON_WORDS and len(word) > 3
+        })
     
     def generate_report(self):
         """生成反馈分析报告"""
-        if not self.feedback_data:
+        if not self.summary or not self.summary['total']:
             print("❌ 没有反馈数据可分析")
             return
             
@@ -70,8 +289,8 @@ class FeedbackAnalyzer:
         print("\n📊 基础统计信息:")
         print("-" * 30)
         
-        total = len(self.feedback_data)
-        accurate = sum(1 for f in self.feedback_data if f.get('user_feedback') == 'accurate')
+        total = self.summary['total']
+        accurate = self.summary['accurate']
         inaccurate = total - accurate
         accuracy_rate = accurate / total if total > 0 else 0
         
@@ -81,35 +300,23 @@ class FeedbackAnalyzer:
         print(f"准确率: {accuracy_rate:.2%}")
         
         # 时间分布
-        if self.feedback_data:
-            timestamps = [f.get('timestamp') for f in self.feedback_data if f.get('timestamp')]
-            if timestamps:
-                try:
-                    dates = [datetime.fromisoformat(ts.replace('Z', '+00:00')) for ts in timestamps]
-                    date_range = f"{min(dates).strftime('%Y-%m-%d')} 到 {max(dates).strftime('%Y-%m-%d')}"
-                    print(f"数据时间范围: {date_range}")
-                except:
-                    pass
+        if self.summary['first_timestamp'] is not None:
+            date_range = f"{self.summary['first_timestamp'].strftime('%Y-%m-%d')} 到 {self.summary['last_timestamp'].strftime('%Y-%m-%d')}"
+            print(f"数据时间范围: {date_range}")
     
     def _error_pattern_analysis(self):
         """错误模式分析"""
         print("\n🚨 错误模式分析:")
         print("-" * 30)
         
-        errors = [f for f in self.feedback_data if f.get('user_feedback') == 'inaccurate']
-        if not errors:
+        if not self.summary['errors']:
             print("✅ 没有发现错误预测")
             return
             
         # 按情感标签分析错误
-        error_by_sentiment = Counter(f.get('predicted_sentiment') for f in errors)
         print("错误预测的情感分布:")
-        for sentiment, count in error_by_sentiment.most_common():
-            sentiment_name = {
-                'LABEL_0': 'Negative',
-                'LABEL_1': 'Neutral', 
-                'LABEL_2': 'Positive'
-            }.get(sentiment, sentiment)
+        for sentiment, count in self.summary['error_sentiments'].most_common():
+            sentiment_name = SENTIMENT_NAMES.get(sentiment, sentiment)
             print(f"  {sentiment_name}: {count} 次")
     
     def _high_confidence_error_analysis(self):
@@ -117,40 +324,30 @@ class FeedbackAnalyzer:
         print("\n⚠️ 高置信度错误分析:")
         print("-" * 30)
         
-        high_conf_errors = [
-            f for f in self.feedback_data 
-            if f.get('user_feedback') == 'inaccurate' and f.get('predicted_confidence', 0) > 0.8
-        ]
-        
-        if not high_conf_errors:
+        if not self.summary['high_confidence_errors']:
             print("✅ 没有高置信度错误")
             return
             
-        print(f"发现 {len(high_conf_errors)} 个高置信度错误:")
+        print(f"发现 {self.summary['high_confidence_errors']} 个高置信度错误:")
         
-        for error in high_conf_errors[:5]:  # 显示前5个
-            sentiment = error.get('predicted_sentiment', 'Unknown')
-            confidence = error.get('predicted_confidence', 0)
-            text_preview = error.get('text', '')[:100] + '...' if len(error.get('text', '')) > 100 else error.get('text', '')
+        for error in self.summary['examples']:  # 显示前5个
+            sentiment = error['predicted_sentiment'] or 'Unknown'
+            confidence = error['predicted_confidence']
+            text = error['text'] or ''
+            text_preview = text[:100] + '...' if len(text) > 100 else text
             
             print(f"  - {sentiment} (置信度: {confidence:.2%}): {text_preview}")
+        
+        print(f"最近 {RECENT_DAYS} 天的高置信度错误: {len(self.summary['recent_high_confidence_errors'])} 个")
     
     def _sentiment_distribution_analysis(self):
         """情感分布分析"""
         print("\n📊 情感分布分析:")
         print("-" * 30)
         
-        sentiment_counts = Counter(f.get('predicted_sentiment') for f in self.feedback_data)
-        total = len(self.feedback_data)
-        
-        sentiment_names = {
-            'LABEL_0': 'Negative',
-            'LABEL_1': 'Neutral',
-            'LABEL_2': 'Positive'
-        }
-        
-        for sentiment, count in sentiment_counts.most_common():
-            name = sentiment_names.get(sentiment, sentiment)
+        total = self.summary['total']
+        for sentiment, count in self.summary['sentiments'].most_common():
+            name = SENTIMENT_NAMES.get(sentiment, sentiment)
             percentage = count / total * 100
             print(f"{name}: {count} 次 ({percentage:.1f}%)")
     
@@ -160,21 +357,11 @@ class FeedbackAnalyzer:
         print("-" * 30)
         
         # 分析错误预测的文本特征
-        errors = [f for f in self.feedback_data if f.get('user_feedback') == 'inaccurate']
-        if not errors:
+        if not self.summary['errors']:
             return
             
-        # 提取常见词汇
-        all_error_texts = ' '.join([f.get('text', '').lower() for f in errors])
-        words = re.findall(r'\b\w+\b', all_error_texts)
-        
-        # 过滤常见词汇
-        common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them'}
-        filtered_words = [word for word in words if word not in common_words and len(word) > 3]
-        
-        word_counts = Counter(filtered_words)
         print("错误预测中最常见的词汇:")
-        for word, count in word_counts.most_common(10):
+        for word, count in self.summary['error_words'].most_common(10):
             print(f"  {word}: {count} 次")
     
     def _model_improvement_suggestions(self):
@@ -185,8 +372,8 @@ class FeedbackAnalyzer:
         suggestions = []
         
         # 分析错误率
-        total = len(self.feedback_data)
-        errors = len([f for f in self.feedback_data if f.get('user_feedback') == 'inaccurate'])
+        total = self.summary['total']
+        errors = self.summary['errors']
         error_rate = errors / total if total > 0 else 0
         
         if error_rate > 0.3:
@@ -197,16 +384,13 @@ class FeedbackAnalyzer:
             suggestions.append("🟢 错误率较低 (<20%)，模型表现良好")
         
         # 分析高置信度错误
-        high_conf_errors = len([
-            f for f in self.feedback_data 
-            if f.get('user_feedback') == 'inaccurate' and f.get('predicted_confidence', 0) > 0.8
-        ])
+        high_conf_errors = self.summary['high_confidence_errors']
         
         if high_conf_errors > 0:
             suggestions.append(f"⚠️ 发现 {high_conf_errors} 个高置信度错误，需要重点关注这些样本")
         
         # 分析情感分布偏差
-        sentiment_counts = Counter(f.get('predicted_sentiment') for f in self.feedback_data)
+        sentiment_counts = self.summary['sentiments']
         if sentiment_counts:
             max_count = max(sentiment_counts.values())
             min_count = min(sentiment_counts.values())
@@ -244,7 +428,15 @@ class FeedbackAnalyzer:
 
 def main():
     """主函数"""
-    analyzer = FeedbackAnalyzer()
+    parser = argparse.ArgumentParser(description="Analyze user feedback")
+    parser.add_argument('--feedback-dir', default="feedback_data")
+    parser.add_argument('--parquet', help="read a feedback.parquet export (tools/export_feedback.py) instead of the store")
+    parser.add_argument('--checkpoint', help=f"analysis checkpoint (default: <feedback-dir>/{CHECKPOINT_FILENAME})")
+    parser.add_argument('--no-checkpoint', action='store_true', help="rescan all feedback without reading or writing a checkpoint")
+    args = parser.parse_args()
+    
+    checkpoint = None if args.no_checkpoint else (args.checkpoint or os.path.join(args.feedback_dir, CHECKPOINT_FILENAME))
+    analyzer = FeedbackAnalyzer(args.feedback_dir, args.parquet, checkpoint_path=checkpoint)
     analyzer.load_feedback_data()
     analyzer.generate_report()
     
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+文本分析基准测试脚本
+在 100 KB 级别的页面上验证单遍文本分析与原有逐项辅助函数输出一致，并比较耗时
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from text_analytics import analyze_text, generate_investment_advice, generate_summary
+
+# 生成测试页面用的句子
+SAMPLE_SENTENCES = [
+    "Apple Inc reported exceptional quarterly earnings with revenue growth of 15% year-over-year.",
+    "The S&P 500 dropped 3.2% in its worst session since March as AAPL fell $4.50 to $187.",
+    "Tesla's gross margin improved to 18.1%, beating analyst expectations of 17.6%.",
+    "Investors are concerned about market volatility and the risk of a prolonged decline.",
+    "Goldman Sachs raised its price target and said the dividend is safe for now.",
+    "Shares plunged 12% after the company cut its full-year guidance and warned of losses.",
+    "The Federal Reserve left interest rates unchanged, in line with expectations.",
+    "Microsoft Corp announced a $10B buyback as cloud profit continued to surge.",
+    "Trading volumes were thin ahead of the holiday and the stock closed flat.",
+    "Analysts at Morgan Stanley expect a recovery in the second half of the year.",
+    "Oil prices crashed on concern about weaker demand from China.",
+    "The report showed a 2.5M increase in weekly jobless claims.",
+    "Revenue was flat as higher prices offset lower volumes in the quarter!",
+    "Is this the start of a broader market correction?",
+]
+
+LABELS = ['LABEL_0', 'LABEL_1', 'LABEL_2']
+CONFIDENCES = [0.5, 0.75, 0.95]
+SCORES = {'negative': 0.9, 'neutral': 0.05, 'positive': 0.9}
+
+
+# ---- 原有实现（每个函数各自重新扫描全文），作为一致性和耗时的参照 ----
+
+def legacy_extract_key_phrases(text):
+    """Extract key financial phrases from text"""
+    # Clean text
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    words = text.split()
+
+    # Find financial terms
+    financial_terms = []
+    for word in words:
+        if any(term in word for term in ['earn', 'revenue', 'profit', 'stock', 'market', 'price', 'share', 'dividend']):
+            financial_terms.append(word)
+
+    # Get most common terms
+    if financial_terms:
+        counter = Counter(financial_terms)
+        return [term for term, count in counter.most_common(3)]
+
+    return ['market', 'financial', 'analysis']
+
+
+def legacy_generate_summary(text, sentiment, confidence):
+    """Generate a smart summary based on sentiment and content"""
+    # Clean and split text into sentences
+    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+
+    if not sentences:
+        return "Unable to extract meaningful content for summary."
+
+    # Extract key phrases and entities
+    key_phrases = legacy_extract_key_phrases(text)
+
+    # Find the most relevant sentence based on sentiment
+    relevant_sentence = legacy_find_most_relevant_sentence(sentences, sentiment, key_phrases)
+
+    # Extract company names, numbers, and key metrics
+    companies = legacy_extract_companies(text)
+    numbers = legacy_extract_numbers(text)
+
+    # Generate context-aware summary
+    if sentiment == "LABEL_2":  # Positive
+        if confidence > 0.8:
+            summary = f"📈 Strong positive sentiment: {relevant_sentence}"
+            if companies:
+                summary += f" {companies[0]} shows promising performance"
+            if numbers:
+                summary += f" with {numbers[0]} growth"
+            summary += ". The analysis suggests optimistic market conditions."
+        else:
+            summary = f"📊 Moderately positive outlook: {relevant_sentence}"
+            summary += ". Consider monitoring for stronger confirmation signals."
+
+    elif sentiment == "LABEL_0":  # Negative
+        if confidence > 0.8:
+            summary = f"📉 Strong negative sentiment: {relevant_sentence}"
+            if companies:
+                summary += f" {companies[0]} faces challenges"
+            if numbers:
+                summary += f" with {numbers[0]} decline"
+            summary += ". The analysis suggests potential risks ahead."
+        else:
+            summary = f"⚠️ Moderately negative outlook: {relevant_sentence}"
+            summary += ". Exercise caution and monitor developments."
+
+    else:  # Neutral
+        summary = f"📊 Balanced analysis: {relevant_sentence}"
+        if companies:
+            summary += f" {companies[0]} presents mixed signals"
+        summary += ". The article requires careful consideration."
+
+    return summary
+
+
+def legacy_find_most_relevant_sentence(sentences, sentiment, key_phrases):
+    """Find the most relevant sentence based on sentiment and key phrases"""
+    if not sentences:
+        return "The article discusses market developments."
+
+    # Score sentences based on relevance
+    sentence_scores = []
+    for sentence in sentences:
+        score = 0
+        sentence_lower = sentence.lower()
+        
+        # Score based on key phrases
+        for phrase in key_phrases:
+            if phrase.lower() in sentence_lower:
+                score += 2
+        
+        # Score based on sentiment indicators
+        if sentiment == "LABEL_2":  # Positive
+            positive_words = ['growth', 'profit', 'gain', 'increase', 'rise', 'surge', 'success', 'positive']
+            score += sum(1 for word in positive_words if word in sentence_lower)
+        elif sentiment == "LABEL_0":  # Negative
+            negative_words = ['loss', 'decline', 'fall', 'drop', 'crash', 'risk', 'concern', 'negative']
+            score += sum(1 for word in negative_words if word in sentence_lower)
+        
+        # Prefer sentences with numbers (metrics)
+        if re.search(r'\d+%|\d+\.\d+', sentence):
+            score += 1
+        
+        sentence_scores.append((score, sentence))
+
+    # Return the highest scoring sentence, or first sentence if no clear winner
+    sentence_scores.sort(reverse=True)
+    return sentence_scores[0][1] if sentence_scores[0][0] > 0 else sentences[0]
+
+
+def legacy_extract_companies(text):
+    """Extract company names from text"""
+    # Common company patterns
+    company_patterns = [
+        r'\b[A-Z][a-z]+ (Inc|Corp|Ltd|LLC|Company|Co)\b',
+        r'\b[A-Z]{2,}\b',  # All caps words (like AAPL, GOOGL)
+        r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'  # Two word companies
+    ]
+
+    companies = []
+    for pattern in company_patterns:
+        matches = re.findall(pattern, text)
+        companies.extend(matches)
+
+    # Remove duplicates and common false positives
+    companies = list(set(companies))
+    false_positives = ['The', 'This', 'That', 'They', 'When', 'What', 'Where', 'Why', 'How']
+    companies = [c for c in companies if c not in false_positives]
+
+    return companies[:3]  # Return top 3 companies
+
+
+def legacy_extract_numbers(text):
+    """Extract significant numbers from text"""
+    # Find percentages, currency amounts, and other metrics
+    number_patterns = [
+        r'\d+\.?\d*%',  # Percentages
+        r'\$\d+\.?\d*[MBK]?',  # Currency amounts
+        r'\d+\.?\d*[MBK]',  # Numbers with M/B/K suffixes
+    ]
+
+    numbers = []
+    for pattern in number_patterns:
+        matches = re.findall(pattern, text)
+        numbers.extend(matches)
+
+    return numbers[:2]  # Return top 2 numbers
+
+
+def legacy_generate_investment_advice(scores, sentiment, confidence, text):
+    """Generate investment advice based on sentiment analysis"""
+    # Extract market context
+    has_earnings = 'earnings' in text.lower() or 'revenue' in text.lower()
+    has_stock = 'stock' in text.lower() or 'share' in text.lower()
+    has_market = 'market' in text.lower() or 'trading' in text.lower()
+
+    advice = ""
+
+    if confidence < 0.6:
+        advice = "⚠️ Low confidence analysis. Consider gathering additional information from multiple sources before making investment decisions."
+
+    elif sentiment == "LABEL_2":  # Positive
+        if scores['positive'] > 0.85:
+            advice = "🚀 Strong bullish signals detected. Consider increasing exposure to related assets while maintaining proper risk management and stop-loss orders."
+        elif scores['positive'] > 0.7:
+            advice = "📈 Positive market sentiment suggests favorable conditions. Monitor for technical confirmation and consider gradual position building."
+        else:
+            advice = "📊 Moderately positive outlook. Maintain current positions and watch for stronger confirmation signals."
+
+    elif sentiment == "LABEL_0":  # Negative
+        if scores['negative'] > 0.85:
+            advice = "🔻 Strong bearish signals detected. Consider defensive positions, hedging strategies, or reducing exposure to related assets."
+        elif scores['negative'] > 0.7:
+            advice = "📉 Negative sentiment suggests caution. Review portfolio risk exposure and consider protective measures."
+        else:
+            advice = "⚠️ Moderately negative outlook. Exercise caution and avoid aggressive positions until sentiment improves."
+
+    else:  # Neutral
+        advice = "⚖️ Neutral sentiment indicates mixed signals. Focus on fundamental analysis, technical indicators, and wait for clearer directional signals."
+
+    # Add context-specific advice
+    if has_earnings:
+        advice += " Pay attention to upcoming earnings reports and analyst expectations."
+    if has_stock:
+        advice += " Monitor stock-specific news and technical levels."
+    if has_market:
+        advice += " Consider broader market trends and sector performance."
+
+    return advice
+
+
+def build_page(target_bytes, seed=0):
+    """随机拼接样本句子，生成指定大小的页面"""
+    rng = random.Random(seed)
+    sentences = []
+    size = 0
+    while size < target_bytes:
+        sentence = rng.choice(SAMPLE_SENTENCES)
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return ' '.join(sentences)
+
+
+def legacy_outputs(text, label, confidence):
+    """原有实现：摘要和投资建议各自分析一遍全文"""
+    return (legacy_generate_summary(text, label, confidence),
+            legacy_generate_investment_advice(SCORES, label, confidence, text))
+
+
+def single_pass_outputs(text, label, confidence):
+    """单遍分析：摘要和投资建议共享同一份文本特征"""
+    features = analyze_text(text)
+    return (generate_summary(text, label, confidence, features),
+            generate_investment_advice(SCORES, label, confidence, text, features))
+
+
+def time_per_page(fn, pages, repeats):
+    """每页平均耗时（毫秒），覆盖所有标签和置信度组合"""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for page in pages:
+            for label in LABELS:
+                for confidence in CONFIDENCES:
+                    fn(page, label, confidence)
+    calls = repeats * len(pages) * len(LABELS) * len(CONFIDENCES)
+    return (time.perf_counter() - started) * 1000.0 / calls
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Benchmark single-pass text analytics against the original helpers")
+    parser.add_argument('--page-kb', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print("⏱️ FinKnows 文本分析基准测试")
+    print("=" * 50)
+
+    pages = [build_page(args.page_kb * 1024, seed) for seed in range(args.pages)]
+
+    print("🔍 检查输出一致性...")
+    mismatches = 0
+    for page in pages:
+        for label in LABELS:
+            for confidence in CONFIDENCES:
+                if legacy_outputs(page, label, confidence) != single_pass_outputs(page, label, confidence):
+                    mismatches += 1
+    if mismatches:
+        print(f"❌ {mismatches} 组输出不一致")
+        sys.exit(1)
+    print("✅ 所有输出一致")
+
+    legacy_ms = time_per_page(legacy_outputs, pages, args.repeats)
+    single_pass_ms = time_per_page(single_pass_outputs, pages, args.repeats)
+
+    print(f"\n📄 页面: {args.pages} × {args.page_kb} KB")
+    print(f"   原有实现: {legacy_ms:.2f} ms/页")
+    print(f"   单遍分析: {single_pass_ms:.2f} ms/页")
+    print(f"🚀 加速比: {legacy_ms / single_pass_ms:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+知识蒸馏脚本
+用现有模型（教师）在反馈文本和无标注语料上的软标签训练一个更小的学生模型，
+并输出教师、学生以及"学生 + 低置信度时教师兜底"三种服务方式的延迟/准确率对比表
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+from transformers import DistilBertConfig, TFDistilBertForSequenceClassification
+
+from evaluate_model import ModelEvaluator, classification_metrics, iter_feedback_examples, iter_labeled_file
+from fine_tune import (MIXED_PRECISION_MODES, SHUFFLE_BUFFER, VALIDATION_PERCENT, FineTuner,
+                       batch_count, configure_mixed_precision, shard_dataset, split_sizes)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from bucketing import bucket_by_length, pad_batch
+from feedback_store import FeedbackCursor, iter_feedback
+from result_cache import model_fingerprint
+from token_cache import TOKENIZER_FILES, TokenShardCache, in_validation_split, text_hash
+from tokenization import load_tokenizer
+
+MAX_LENGTH = 512
+MIN_TEXT_LENGTH = 10
+UNLABELED = -1
+CORPUS_COMPLETE = {'complete': True}
+LATENCY_SAMPLES = 200
+
+
+def distillation_loss(temperature):
+    """教师与学生在温度 T 下软化分布之间的交叉熵（乘 T² 保持梯度量级）"""
+
+    def loss(teacher_logits, student_logits):
+        soft_labels = tf.nn.softmax(teacher_logits / temperature, axis=-1)
+        return temperature ** 2 * tf.nn.softmax_cross_entropy_with_logits(
+            labels=soft_labels, logits=student_logits / temperature
+        )
+
+    return loss
+
+
+def iter_corpus_texts(path):
+    """无标注语料：纯文本（每行一篇）、JSONL 或 CSV（text 列）"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            texts = (row.get('text') or '' for row in csv.DictReader(f))
+        elif path.endswith('.jsonl'):
+            texts = (json.loads(line).get('text') or '' for line in f if line.strip())
+        else:
+            texts = f
+        for text in texts:
+            text = text.strip()
+            if len(text) >= MIN_TEXT_LENGTH:
+                yield text
+
+
+def iter_feedback_texts(records):
+    """反馈中的文本（与用户是否认可预测无关，软标签来自教师模型）"""
+    for feedback in records:
+        text = (feedback.get('text') or '').strip()
+        if len(text) >= MIN_TEXT_LENGTH:
+            yield text
+
+
+def latency_percentiles(latencies_ms):
+    return {
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'mean_ms': float(np.mean(latencies_ms))
+    }
+
+
+class ModelDistiller:
+    def __init__(self, teacher_path="../models/finbert", feedback_dir="../feedback_data",
+                 output_dir="../models/finbert_student", batch_size=32, cache_dir=None):
+        self.teacher_path = teacher_path
+        self.feedback_dir = feedback_dir
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.cache_dir = cache_dir or os.path.join(feedback_dir, 'distill_cache')
+        self.tokenizer = None
+        self.teacher = None
+        self.student = None
+        self._teacher_forward = None
+
+    def load_teacher(self):
+        """加载教师模型和分词器"""
+        print("🔄 加载教师模型和分词器...")
+        self.tokenizer = load_tokenizer(self.teacher_path)
+        self.teacher = TFDistilBertForSequenceClassification.from_pretrained(self.teacher_path)
+        self._teacher_forward = tf.function(
+            lambda input_ids, attention_mask: tf.cast(self.teacher(
+                {'input_ids': input_ids, 'attention_mask': attention_mask}, training=False
+            ).logits, tf.float32),
+            reduce_retracing=True
+        )
+        print(f"✅ 教师模型加载完成 ({self.teacher.count_params() / 1e6:.1f}M 参数)")
+
+    def teacher_logits(self, encoded):
+        """一批分词结果的教师 logits（按长度分桶推理）"""
+        logits = np.zeros((len(encoded), self.teacher.config.num_labels), dtype=np.float32)
+        for batch in bucket_by_length([len(ids) for ids in encoded], self.batch_size):
+            input_ids, attention_mask = pad_batch(
+                [encoded[i] for i in batch], self.tokenizer.pad_token_id, 8, MAX_LENGTH
+            )
+            logits[batch] = self._teacher_forward(input_ids, attention_mask).numpy()
+        return logits
+
+    @staticmethod
+    def _corpus_examples(path, position):
+        """语料文件读完后把 position 标记为完成，最后一个分片随之记录"""
+        for text in iter_corpus_texts(path):
+            yield text, UNLABELED
+        position['complete'] = True
+
+    def _encode(self, texts):
+        return self.tokenizer(texts, truncation=True, max_length=MAX_LENGTH)['input_ids']
+
+    def prepare_soft_labels(self, corpus_paths=(), shard_size=50000):
+        """分词并计算教师软标签，写入分片缓存；返回所有缓存
+
+        缓存目录以教师模型指纹命名：反馈部分按读取位置增量追加，
+        每个语料文件按文件指纹缓存一次
+        """
+        print("🔧 计算教师软标签...")
+        root = os.path.join(self.cache_dir, f"{model_fingerprint(self.teacher_path)}-{MAX_LENGTH}")
+        caches = []
+
+        cache = TokenShardCache(root, 'feedback', shard_size)
+        cursor = FeedbackCursor(self.feedback_dir, state=cache.position)
+        if not cursor.is_valid():
+            print("⚠️ 反馈缓存的读取位置已失效，重新构建")
+            cache.reset()
+            cursor = FeedbackCursor(self.feedback_dir)
+        examples = ((text, UNLABELED) for text in iter_feedback_texts(cursor))
+        added = cache.extend(examples, self._encode, position=cursor.state, target_fn=self.teacher_logits)
+        print(f"📚 反馈: 新增 {added} 条，共 {len(cache)} 条")
+        caches.append(cache)
+
+        for path in corpus_paths:
+            cache = TokenShardCache(root, f"corpus-{model_fingerprint(path)}", shard_size)
+            if cache.position != CORPUS_COMPLETE:
+                cache.reset()  # 第一次处理，或者上次中途退出
+                position = {'complete': False}
+                cache.extend(self._corpus_examples(path, position), self._encode, position=position,
+                             target_fn=self.teacher_logits)
+            print(f"📚 语料 {path}: {len(cache)} 条")
+            caches.append(cache)
+        return caches
+
+    def build_student(self, layers=2, dim=None):
+        """创建层数更少（可选隐藏维度更小）的学生模型
+
+        隐藏维度与教师相同时，从教师复制词嵌入、均匀间隔选取的若干层和分类头作为初始化
+        """
+        teacher_config = self.teacher.config
+        config = DistilBertConfig.from_dict(teacher_config.to_dict())
+        config.n_layers = layers
+        if dim and dim != teacher_config.dim:
+            config.dim = dim
+            config.hidden_dim = 4 * dim
+            config.n_heads = next(heads for heads in range(teacher_config.n_heads, 0, -1) if dim % heads == 0)
+
+        self.student = TFDistilBertForSequenceClassification(config)
+        self.student(self.student.dummy_inputs)
+        if config.dim == teacher_config.dim:
+            student, teacher = self.student.distilbert, self.teacher.distilbert
+            student.embeddings.set_weights(teacher.embeddings.get_weights())
+            picks = np.linspace(0, teacher_config.n_layers - 1, layers).round().astype(int)
+            for index, source in enumerate(picks):
+                student.transformer.layer[index].set_weights(teacher.transformer.layer[source].get_weights())
+            self.student.pre_classifier.set_weights(self.teacher.pre_classifier.get_weights())
+            self.student.classifier.set_weights(self.teacher.classifier.get_weights())
+            print(f"🧬 学生模型: {layers} 层 (从教师第 {', '.join(str(i) for i in picks)} 层初始化)")
+        else:
+            print(f"🧬 学生模型: {layers} 层, 隐藏维度 {config.dim} (随机初始化)")
+        print(f"   参数量: {self.student.count_params() / 1e6:.1f}M (教师 {self.teacher.count_params() / 1e6:.1f}M)")
+        return self.student
+
+    def train(self, caches, temperature=2.0, epochs=3, learning_rate=1e-4, accumulation_steps=1, patience=2):
+        """用教师软标签训练学生
+
+        检查点在 output_dir/training：中断后用同样的数据和参数重新运行会继续；
+        学生结构（--layers/--dim）、温度或软标签数据变了则从头训练
+        """
+        shards = [shard for cache in caches for shard in cache.shards()]
+        if not shards:
+            print("❌ 没有可用于蒸馏的文本")
+            return False
+        train_size, val_size = split_sizes(shards, VALIDATION_PERCENT)
+        if not train_size or not val_size:
+            print("❌ 文本太少，无法划分训练集和验证集")
+            return False
+        print(f"📊 训练集: {train_size} 条, 验证集: {val_size} 条")
+
+        pad_id = self.tokenizer.pad_token_id
+        train_dataset = lambda epoch: shard_dataset(shards, pad_id, False, batch_size=self.batch_size,
+                                                    shuffle_buffer=SHUFFLE_BUFFER, seed=epoch, soft_targets=True)
+        val_dataset = shard_dataset(shards, pad_id, True, batch_size=self.batch_size, soft_targets=True)
+
+        print("🚀 开始蒸馏训练...")
+        trainer = FineTuner(
+            self.student,
+            os.path.join(self.output_dir, 'training'),
+            epochs=epochs,
+            learning_rate=learning_rate,
+            accumulation_steps=accumulation_steps,
+            patience=patience,
+            loss_fn=distillation_loss(temperature),
+            run_key={
+                'caches': [(cache.directory, cache.manifest['shards']) for cache in caches],
+                'temperature': temperature,
+                'batch_size': self.batch_size
+            }
+        )
+        trainer.fit(train_dataset, val_dataset, batch_count(shards, False, VALIDATION_PERCENT, self.batch_size))
+        print("✅ 蒸馏训练完成")
+        return True
+
+    def save_student(self):
+        """保存学生模型，并原样复制教师的分词器文件
+
+        服务器按文件指纹确认学生和教师共用分词器；tokenizer.save_pretrained 会重写
+        tokenizer_config.json 并新增 tokenizer.json，指纹就对不上了
+        """
+        self.student.save_pretrained(self.output_dir)
+        for name in TOKENIZER_FILES:
+            source = os.path.join(self.teacher_path, name)
+            target = os.path.join(self.output_dir, name)
+            if os.path.exists(source):
+                shutil.copy2(source, target)
+            elif os.path.exists(target):
+                os.remove(target)  # 之前保存留下的、教师没有的文件
+        print(f"💾 学生模型已保存到: {self.output_dir}")
+
+    def evaluation_set(self, data_path=None, limit=2000):
+        """(文本, 标签或 None)：标注文件、反馈验证集，或者没有标签时的验证集文本"""
+        source = iter_labeled_file(data_path) if data_path else iter_feedback_examples(self.feedback_dir)
+        texts, labels = [], []
+        for text, label in source:
+            if len(texts) >= limit:
+                break
+            texts.append(text)
+            labels.append(label)
+        if texts:
+            return texts, np.array(labels)
+
+        for text in iter_feedback_texts(iter_feedback(self.feedback_dir)):
+            if len(texts) >= limit:
+                break
+            if in_validation_split([text_hash(text)], VALIDATION_PERCENT)[0]:
+                texts.append(text)
+        return texts, None
+
+    def comparison_report(self, texts, labels=None, min_confidence=0.8, latency_samples=LATENCY_SAMPLES):
+        """教师、学生、学生 + 教师兜底的延迟和准确率对比"""
+        print("📏 对比教师与学生...")
+        teacher = ModelEvaluator(self.teacher_path, self.batch_size)
+        student = ModelEvaluator(self.output_dir, self.batch_size)
+
+        teacher_probabilities = teacher.predict(texts)
+        student_probabilities = student.predict(texts)
+        fallback = student_probabilities.max(axis=1) < min_confidence
+        cascade_probabilities = np.where(fallback[:, None], teacher_probabilities, student_probabilities)
+
+        # 单条请求延迟（batch 1，与服务器处理单个 /analyze 请求相同）
+        samples = texts[:latency_samples]
+        teacher.predict(samples[:8])
+        student.predict(samples[:8])
+        teacher_ms, student_ms = [], []
+        for text in samples:
+            started = time.perf_counter()
+            teacher.predict([text])
+            teacher_ms.append((time.perf_counter() - started) * 1000.0)
+            started = time.perf_counter()
+            student.predict([text])
+            student_ms.append((time.perf_counter() - started) * 1000.0)
+        teacher_ms, student_ms = np.array(teacher_ms), np.array(student_ms)
+        cascade_ms = student_ms + np.where(fallback[:len(samples)], teacher_ms, 0.0)
+
+        teacher_labels = teacher_probabilities.argmax(axis=1)
+        rows = {}
+        for name, probabilities, latencies, params, teacher_calls in (
+            ('teacher', teacher_probabilities, teacher_ms, teacher.model.count_params(), 1.0),
+            ('student', student_probabilities, student_ms, student.model.count_params(), 0.0),
+            (f'student+fallback@{min_confidence}', cascade_probabilities, cascade_ms,
+             student.model.count_params() + teacher.model.count_params(), float(fallback.mean()))
+        ):
+            row = {
+                'parameters': int(params),
+                'teacher_call_rate': teacher_calls,
+                'agreement_with_teacher': float((probabilities.argmax(axis=1) == teacher_labels).mean())
+            }
+            row.update(latency_percentiles(latencies))
+            if labels is not None:
+                metrics = classification_metrics(labels, probabilities)
+                row['accuracy'] = metrics['accuracy']
+                row['ece'] = metrics['ece']
+            rows[name] = row
+
+        report = {
+            'teacher_path': self.teacher_path,
+            'student_path': self.output_dir,
+            'evaluation_examples': len(texts),
+            'labeled': labels is not None,
+            'latency_samples': len(samples),
+            'min_confidence': min_confidence,
+            'models': rows
+        }
+        report_file = os.path.join(self.output_dir, 'distillation_report.json')
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print()
+        print(format_report_table(rows))
+        print(f"\n📄 对比报告已保存到: {report_file}")
+        return report
+
+
+def format_report_table(rows):
+    """延迟/准确率对比表"""
+    columns = [
+        ('params', lambda r: f"{r['parameters'] / 1e6:.1f}M"),
+        ('p50 ms', lambda r: f"{r['p50_ms']:.1f}"),
+        ('p95 ms', lambda r: f"{r['p95_ms']:.1f}"),
+        ('accuracy', lambda r: f"{r['accuracy']:.2%}" if 'accuracy' in r else 'n/a'),
+        ('ECE', lambda r: f"{r['ece']:.4f}" if 'ece' in r else 'n/a'),
+        ('agree w/ teacher', lambda r: f"{r['agreement_with_teacher']:.2%}"),
+        ('teacher calls', lambda r: f"{r['teacher_call_rate']:.1%}")
+    ]
+    width = max(len(name) for name in rows)
+    header = 'model'.ljust(width) + ''.join(f" | {title:>16}" for title, _ in columns)
+    lines = [header, '-' * len(header)]
+    for name, row in rows.items():
+        lines.append(name.ljust(width) + ''.join(f" | {value(row):>16}" for _, value in columns))
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Distill the sentiment model into a smaller student")
+    parser.add_argument('--teacher', default="../models/finbert")
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--corpus', nargs='*', default=[], help="unlabeled texts: .txt (one per line), .jsonl or .csv")
+    parser.add_argument('--output-dir', default="../models/finbert_student")
+    parser.add_argument('--layers', type=int, default=2, help="student transformer layers (teacher: 6)")
+    parser.add_argument('--dim', type=int, help="student hidden size (default: the teacher's, which allows layer copying)")
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--accumulation-steps', type=int, default=1)
+    parser.add_argument('--patience', type=int, default=2)
+    parser.add_argument('--mixed-precision', choices=MIXED_PRECISION_MODES, default='auto')
+    parser.add_argument('--min-confidence', type=float, default=0.8, help="student confidence below which the teacher answers")
+    parser.add_argument('--data', help="labeled JSONL/CSV for the accuracy columns (default: feedback validation split)")
+    parser.add_argument('--eval-limit', type=int, default=2000)
+    args = parser.parse_args()
+
+    print("🎓 FinKnows 模型蒸馏工具")
+    print("=" * 50)
+
+    if configure_mixed_precision(args.mixed_precision):
+        print("⚡ 使用 bfloat16 混合精度")
+
+    distiller = ModelDistiller(args.teacher, args.feedback_dir, args.output_dir, args.batch_size)
+    distiller.load_teacher()
+    caches = distiller.prepare_soft_labels(args.corpus)
+    distiller.build_student(args.layers, args.dim)
+    if not distiller.train(caches, args.temperature, args.epochs, args.learning_rate,
+                           args.accumulation_steps, args.patience):
+        sys.exit(1)
+    distiller.save_student()
+
+    texts, labels = distiller.evaluation_set(args.data, args.eval_limit)
+    if not texts:
+        print("⚠️ 没有可用于对比的文本，跳过对比表")
+        return
+    distiller.comparison_report(texts, labels, args.min_confidence)
+
+    print(f"\n🎉 蒸馏完成！启动服务器时设置:")
+    print(f"   FINANSWER_STUDENT_MODEL_PATH={args.output_dir} FINANSWER_STUDENT_MIN_CONFIDENCE={args.min_confidence}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+模型批量评估脚本
+在带标签的数据集上按长度分桶批量推理，用 NumPy 计算准确率、各类别的
+精确率/召回率、混淆矩阵和校准误差（ECE），并可以并排比较两个模型目录
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+from transformers import TFAutoModelForSequenceClassification
+
+from fine_tune import MIXED_PRECISION_MODES, VALIDATION_PERCENT, configure_mixed_precision
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from bucketing import bucket_by_length, pad_batch
+from feedback_store import iter_feedback
+from token_cache import in_validation_split, text_hash
+from tokenization import load_tokenizer
+
+CLASS_NAMES = ['negative', 'neutral', 'positive']  # LABEL_0, LABEL_1, LABEL_2
+ECE_BINS = 15
+
+
+def parse_label(value):
+    """0/1/2、"LABEL_1" 或 "neutral" 形式的标签转换为类别编号"""
+    text = str(value).strip()
+    if text.isdigit():
+        return int(text)
+    if text.upper().startswith('LABEL_'):
+        return int(text[len('LABEL_'):])
+    return CLASS_NAMES.index(text.lower())
+
+
+def iter_labeled_file(path):
+    """流式读取 JSONL 或 CSV 文件中的 (text, label)"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            text = (row.get('text') or '').strip()
+            if text:
+                yield text, parse_label(row['label'])
+
+
+def iter_feedback_examples(feedback_dir, validation_percent=VALIDATION_PERCENT):
+    """反馈中可用作标签的样本；默认只取重训练时留作验证集的那部分（按文本哈希划分）"""
+    from retrain_with_feedback import training_example  # 重训练脚本也导入本模块，这里延迟导入
+
+    for feedback in iter_feedback(feedback_dir):
+        example = training_example(feedback)
+        if example is None:
+            continue
+        if validation_percent is not None and not in_validation_split([text_hash(example[0])], validation_percent)[0]:
+            continue
+        yield example
+
+
+def classification_metrics(labels, probabilities, num_classes=len(CLASS_NAMES), bins=ECE_BINS):
+    """准确率、各类别精确率/召回率/F1、混淆矩阵（行是真实类别，列是预测类别）和 ECE"""
+    labels = np.asarray(labels, dtype=np.int64)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    predictions = probabilities.argmax(axis=1)
+    confidence = probabilities.max(axis=1)
+    correct = predictions == labels
+    total = len(labels)
+
+    confusion = np.bincount(labels * num_classes + predictions, minlength=num_classes * num_classes)
+    confusion = confusion.reshape(num_classes, num_classes)
+    true_positives = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = np.divide(true_positives, predicted, out=np.zeros(num_classes), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros(num_classes), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(num_classes),
+                   where=(precision + recall) > 0)
+
+    # 期望校准误差：按置信度等宽分箱，|准确率 - 平均置信度| 按箱内样本数加权
+    bin_index = np.minimum((confidence * bins).astype(np.int64), bins - 1)
+    bin_confidence = np.bincount(bin_index, weights=confidence, minlength=bins)
+    bin_correct = np.bincount(bin_index, weights=correct, minlength=bins)
+    ece = float(np.abs(bin_correct - bin_confidence).sum() / total) if total else 0.0
+
+    return {
+        'examples': int(total),
+        'accuracy': float(correct.mean()) if total else 0.0,
+        'precision': precision.tolist(),
+        'recall': recall.tolist(),
+        'f1': f1.tolist(),
+        'support': support.tolist(),
+        'confusion_matrix': confusion.tolist(),
+        'ece': ece,
+        'mean_confidence': float(confidence.mean()) if total else 0.0
+    }
+
+
+def predict_dataset(model, dataset):
+    """在 (features, labels) 批次数据集上推理，返回 (labels, probabilities)"""
+    forward = tf.function(
+        lambda features: tf.nn.softmax(tf.cast(model(features, training=False).logits, tf.float32), axis=-1),
+        reduce_retracing=True
+    )
+    labels, probabilities = [], []
+    for features, batch_labels in dataset:
+        probabilities.append(forward(features).numpy())
+        labels.append(np.asarray(batch_labels))
+    if not labels:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, len(CLASS_NAMES)), dtype=np.float32)
+    return np.concatenate(labels), np.concatenate(probabilities)
+
+
+class ModelEvaluator:
+    def __init__(self, model_path, batch_size=64, chunk_size=4096, max_length=512, pad_multiple=8):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.max_length = max_length
+        self.pad_multiple = pad_multiple
+        self.tokenizer = load_tokenizer(model_path)
+        self.model = TFAutoModelForSequenceClassification.from_pretrained(model_path)
+        self._forward = tf.function(self._probabilities, reduce_retracing=True)
+
+    def _probabilities(self, input_ids, attention_mask):
+        logits = self.model({'input_ids': input_ids, 'attention_mask': attention_mask}, training=False).logits
+        return tf.nn.softmax(tf.cast(logits, tf.float32), axis=-1)
+
+    def predict(self, texts):
+        """一组文本的类别概率（按长度分桶，每个批次只填充到自身最大长度）"""
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)['input_ids']
+        probabilities = np.zeros((len(encoded), self.model.config.num_labels), dtype=np.float32)
+        for batch in bucket_by_length([len(ids) for ids in encoded], self.batch_size):
+            input_ids, attention_mask = pad_batch(
+                [encoded[i] for i in batch], self.tokenizer.pad_token_id, self.pad_multiple, self.max_length
+            )
+            probabilities[batch] = self._forward(input_ids, attention_mask).numpy()
+        return probabilities
+
+    def evaluate(self, examples):
+        """按块读取 (text, label) 并推理，返回指标和吞吐量"""
+        labels, probabilities = [], []
+        texts, chunk_labels = [], []
+        started = time.time()
+        for text, label in examples:
+            texts.append(text)
+            chunk_labels.append(label)
+            if len(texts) >= self.chunk_size:
+                probabilities.append(self.predict(texts))
+                labels.extend(chunk_labels)
+                texts, chunk_labels = [], []
+        if texts:
+            probabilities.append(self.predict(texts))
+            labels.extend(chunk_labels)
+        elapsed = time.time() - started
+
+        if not labels:
+            return None
+        metrics = classification_metrics(labels, np.concatenate(probabilities), self.model.config.num_labels)
+        metrics['seconds'] = elapsed
+        metrics['examples_per_second'] = len(labels) / elapsed if elapsed else 0.0
+        return metrics
+
+
+def format_comparison(reports):
+    """多个模型的指标并排成文本表格；reports 为 {模型名: 指标}"""
+    names = list(reports)
+    rows = [('examples', lambda m: str(m['examples'])),
+            ('accuracy', lambda m: f"{m['accuracy']:.2%}"),
+            ('ECE', lambda m: f"{m['ece']:.4f}"),
+            ('mean confidence', lambda m: f"{m['mean_confidence']:.4f}"),
+            ('examples/sec', lambda m: f"{m['examples_per_second']:.1f}")]
+    for index, name in enumerate(CLASS_NAMES):
+        rows.append((f'{name} precision', lambda m, i=index: f"{m['precision'][i]:.2%}"))
+        rows.append((f'{name} recall', lambda m, i=index: f"{m['recall'][i]:.2%}"))
+        rows.append((f'{name} f1', lambda m, i=index: f"{m['f1'][i]:.4f}"))
+
+    width = max(len(label) for label, _ in rows)
+    columns = [max(len(name), 12) for name in names]
+    lines = [' ' * width + ' | ' + ' | '.join(name.rjust(w) for name, w in zip(names, columns))]
+    lines.append('-' * len(lines[0]))
+    for label, value in rows:
+        lines.append(label.ljust(width) + ' | ' + ' | '.join(
+            value(reports[name]).rjust(w) for name, w in zip(names, columns)
+        ))
+    for name in names:
+        lines.append('')
+        lines.append(f"confusion matrix ({name}; rows = true, columns = predicted)")
+        lines.append(' ' * 10 + ''.join(label[:8].rjust(10) for label in CLASS_NAMES))
+        for label, row in zip(CLASS_NAMES, reports[name]['confusion_matrix']):
+            lines.append(label[:8].ljust(10) + ''.join(str(count).rjust(10) for count in row))
+    return '\n'.join(lines)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Evaluate one or two sentiment models on a labeled set")
+    parser.add_argument('models', nargs='+', help="model directories (two for a side-by-side comparison)")
+    parser.add_argument('--data', help="labeled JSONL or CSV with text and label columns "
+                                       "(default: the validation split of the feedback)")
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--all-feedback', action='store_true', help="use all labeled feedback, not only the validation split")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--limit', type=int, help="evaluate at most N examples")
+    parser.add_argument('--mixed-precision', choices=MIXED_PRECISION_MODES, default='off')
+    parser.add_argument('--output', help="write the metrics as JSON")
+    args = parser.parse_args()
+
+    print("📏 FinKnows 模型评估工具")
+    print("=" * 50)
+
+    def examples():
+        if args.data:
+            source = iter_labeled_file(args.data)
+        else:
+            source = iter_feedback_examples(args.feedback_dir, None if args.all_feedback else VALIDATION_PERCENT)
+        for index, example in enumerate(source):
+            if args.limit is not None and index >= args.limit:
+                break
+            yield example
+
+    configure_mixed_precision(args.mixed_precision)
+    reports = {}
+    for model_path in args.models:
+        print(f"🔄 评估 {model_path} ...")
+        metrics = ModelEvaluator(model_path, args.batch_size).evaluate(examples())
+        if metrics is None:
+            print("❌ 没有带标签的样本")
+            sys.exit(1)
+        print(f"✅ {metrics['examples']} 条样本, {metrics['seconds']:.1f}s ({metrics['examples_per_second']:.1f} 条/秒)")
+        reports[model_path] = metrics
+
+    print()
+    print(format_comparison(reports))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n📄 评估结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
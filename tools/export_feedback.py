@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+反馈数据列式导出脚本
+把反馈语料（SQLite、日志分段和旧文件）按块流式压缩为一个 Parquet 文件，
+分析脚本可以只读取需要的列，内存占用与总记录数无关
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from feedback_store import iter_feedback
+
+COLUMNS = ['feedback_id', 'timestamp', 'predicted_sentiment', 'predicted_confidence',
+           'user_feedback', 'model_version', 'text']
+CATEGORY_COLUMNS = ['predicted_sentiment', 'user_feedback', 'model_version']
+DEFAULT_FILENAME = 'feedback.parquet'
+
+
+def records_to_frame(records):
+    """反馈记录列表转换为固定列的 DataFrame"""
+    frame = pd.DataFrame.from_records(records, columns=COLUMNS)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True, errors='coerce', format='ISO8601')
+    frame['predicted_confidence'] = pd.to_numeric(frame['predicted_confidence'], errors='coerce')
+    for column in ('feedback_id', 'text'):
+        frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].astype(str).where(frame[column].notna(), None).astype('category')
+    return frame
+
+
+def iter_feedback_frames(feedback_dir, chunk_size=100000):
+    """按块读取反馈，每块一个 DataFrame"""
+    return iter_record_frames(iter_feedback(feedback_dir), chunk_size)
+
+
+def iter_record_frames(records, chunk_size=100000):
+    """把任意记录流按块转换为 DataFrame"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield records_to_frame(chunk)
+            chunk = []
+    if chunk:
+        yield records_to_frame(chunk)
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('feedback_id', pa.string()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('predicted_sentiment', category),
+        ('predicted_confidence', pa.float64()),
+        ('user_feedback', category),
+        ('model_version', category),
+        ('text', pa.string()),
+    ])
+
+
+class FeedbackExporter:
+    def __init__(self, feedback_dir="../feedback_data", output=None, chunk_size=100000, compression='zstd'):
+        self.feedback_dir = feedback_dir
+        self.output = output or os.path.join(feedback_dir, DEFAULT_FILENAME)
+        self.chunk_size = chunk_size
+        self.compression = compression
+
+    def export(self):
+        """流式写出 Parquet（每块一个 row group），完成后原子替换旧文件，返回记录数"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = parquet_schema()
+        tmp = self.output + '.tmp'
+        rows = 0
+        with pq.ParquetWriter(tmp, schema, compression=self.compression) as writer:
+            for frame in iter_feedback_frames(self.feedback_dir, self.chunk_size):
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                rows += len(frame)
+        os.replace(tmp, self.output)
+        return rows
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Export the feedback corpus to a Parquet file")
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--output', help=f"default: <feedback-dir>/{DEFAULT_FILENAME}")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="records per row group")
+    parser.add_argument('--compression', default='zstd')
+    args = parser.parse_args()
+
+    print("📦 FinKnows 反馈数据列式导出工具")
+    print("=" * 50)
+
+    if not os.path.isdir(args.feedback_dir):
+        print(f"❌ 反馈数据目录不存在: {args.feedback_dir}")
+        sys.exit(1)
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("❌ 需要安装 pyarrow: pip install pyarrow")
+        sys.exit(1)
+
+    exporter = FeedbackExporter(args.feedback_dir, args.output, args.chunk_size, args.compression)
+    started = time.time()
+    rows = exporter.export()
+    size_mb = os.path.getsize(exporter.output) / (1024 * 1024)
+    print(f"✅ 导出 {rows} 条反馈到 {exporter.output} ({size_mb:.1f} MB, {time.time() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
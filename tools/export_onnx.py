@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ONNX 模型导出脚本
+把 FinBERT 分类器转换为 ONNX，并在样本文本上检查与 TensorFlow 模型的一致性
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+import tf2onnx
+from tf2onnx import utils
+from tf2onnx.handler import tf_op
+from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from bucketing import pad_batch
+from inference import OnnxClassifier
+
+# 一致性检查使用的样本文本
+SAMPLE_TEXTS = [
+    "The stock market is performing exceptionally well with record-breaking gains.",
+    "Company profits are declining rapidly due to poor management decisions.",
+    "The quarterly earnings report shows stable growth in revenue.",
+    "Investors are concerned about the market volatility and economic uncertainty.",
+    "The new product launch exceeded all expectations and boosted sales significantly.",
+    "The Federal Reserve left interest rates unchanged, in line with analyst expectations.",
+    "Shares plunged 12% after the company cut its full-year guidance.",
+    "Revenue was flat year-over-year as higher prices offset lower volumes.",
+]
+
+
+# 较新的 TensorFlow 把精确 GELU 降级为 Erfc，部分 tf2onnx 版本没有对应的转换规则
+if not any('Erfc' in handlers for handlers in tf_op.get_opsets().get('', [])):
+    @tf_op("Erfc")
+    class _Erfc:
+        @classmethod
+        def version_9(cls, ctx, node, **kwargs):
+            """erfc(x) = 1 - erf(x)"""
+            x = node.input[0]
+            dtype = ctx.get_dtype(x)
+            shape = ctx.get_shape(x)
+            erf = ctx.make_node("Erf", [x])
+            one = ctx.make_const(utils.make_name("one"), np.array(1, dtype=utils.map_onnx_to_numpy_type(dtype)))
+            ctx.remove_node(node.name)
+            ctx.make_node("Sub", [one.output[0], erf.output[0]], outputs=node.output,
+                          name=node.name, shapes=[shape], dtypes=[dtype])
+
+
+class OnnxExporter:
+    def __init__(self, model_path="../models/finbert", output_dir="../models/finbert_onnx", opset=17):
+        self.model_path = model_path
+        self.output_dir = output_dir
+        self.opset = opset
+        self.tokenizer = None
+        self.model = None
+
+    def load_model_and_tokenizer(self):
+        """加载 TensorFlow 模型和分词器"""
+        print("🔄 加载 TensorFlow 模型和分词器...")
+        self.tokenizer = DistilBertTokenizer.from_pretrained(self.model_path)
+        self.model = TFDistilBertForSequenceClassification.from_pretrained(self.model_path)
+        print("✅ 模型加载完成")
+
+    def convert(self):
+        """导出带动态 batch/序列长度、直接输出概率的 ONNX 模型"""
+        print(f"⚙️ 导出 ONNX 模型 (opset {self.opset})...")
+        model = self.model
+
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None, None), dtype=tf.int32, name='input_ids'),
+            tf.TensorSpec(shape=(None, None), dtype=tf.int32, name='attention_mask')
+        ])
+        def serving(input_ids, attention_mask):
+            logits = model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+            return {'probabilities': tf.nn.softmax(logits, axis=-1)}
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        onnx_path = os.path.join(self.output_dir, 'model.onnx')
+        tf2onnx.convert.from_function(
+            serving,
+            input_signature=serving.input_signature,
+            opset=self.opset,
+            output_path=onnx_path
+        )
+        print(f"💾 已保存: {onnx_path} ({os.path.getsize(onnx_path) / 1e6:.1f} MB)")
+        return onnx_path
+
+    def parity_check(self, onnx_path, texts, tolerance=1e-3):
+        """在样本文本上比较 TensorFlow 与 ONNX Runtime 的输出"""
+        print("🔍 检查 TensorFlow / ONNX Runtime 一致性...")
+        onnx_model = OnnxClassifier(onnx_path)
+
+        encoded = self.tokenizer(texts, truncation=True, max_length=512)['input_ids']
+        input_ids, attention_mask = pad_batch(encoded, self.tokenizer.pad_token_id)
+
+        started = time.perf_counter()
+        logits = self.model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+        tf_probs = tf.nn.softmax(logits, axis=-1).numpy()
+        tf_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        onnx_probs = onnx_model.predict(input_ids, attention_mask)
+        onnx_time = time.perf_counter() - started
+
+        max_diff = float(np.abs(tf_probs - onnx_probs).max())
+        agreement = float(np.mean(tf_probs.argmax(axis=1) == onnx_probs.argmax(axis=1)))
+        report = {
+            "export_date": datetime.now().isoformat(),
+            "model_path": self.model_path,
+            "onnx_path": onnx_path,
+            "opset": self.opset,
+            "sample_texts": len(texts),
+            "max_abs_prob_diff": max_diff,
+            "label_agreement": agreement,
+            "tensorflow_batch_ms": tf_time * 1000.0,
+            "onnxruntime_batch_ms": onnx_time * 1000.0,
+            "passed": max_diff <= tolerance and agreement == 1.0
+        }
+
+        report_file = os.path.join(self.output_dir, 'parity_report.json')
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        status = "✅ 一致性检查通过" if report['passed'] else "❌ 一致性检查未通过"
+        print(f"{status}: 最大概率差 {max_diff:.2e}, 标签一致率 {agreement:.2%}")
+        print(f"   批次耗时: TensorFlow {report['tensorflow_batch_ms']:.1f} ms, "
+              f"ONNX Runtime {report['onnxruntime_batch_ms']:.1f} ms")
+        print(f"📄 报告已保存到: {report_file}")
+        return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Export FinBERT to ONNX and check parity")
+    parser.add_argument('--model-path', default="../models/finbert")
+    parser.add_argument('--output-dir', default="../models/finbert_onnx")
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--tolerance', type=float, default=1e-3)
+    args = parser.parse_args()
+
+    print("📤 FinKnows ONNX 导出工具")
+    print("=" * 50)
+
+    exporter = OnnxExporter(args.model_path, args.output_dir, args.opset)
+    exporter.load_model_and_tokenizer()
+    onnx_path = exporter.convert()
+    report = exporter.parity_check(onnx_path, SAMPLE_TEXTS, args.tolerance)
+
+    if not report['passed']:
+        sys.exit(1)
+
+    print(f"\n🎉 导出完成！启动服务器时设置:")
+    print(f"   FINANSWER_BACKEND=onnx FINANSWER_ONNX_MODEL={onnx_path}")
+
+
+if __name__ == "__main__":
+    main()
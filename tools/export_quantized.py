@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+量化模型导出脚本
+把 FinBERT 分类器导出为 TFLite（动态范围或 int8 量化），
+并生成与浮点模型对比的精度差异报告
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification
+
+from fine_tune import VALIDATION_PERCENT
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from bucketing import pad_batch
+from feedback_store import iter_feedback
+from inference import TFLiteClassifier
+from token_cache import in_validation_split, text_hash
+
+# 评估集少于这么多条时一致率和概率差没有意义，不生成报告
+MIN_EVALUATION_TEXTS = 20
+
+# 反馈数据不足时使用的校准/评估样本
+SAMPLE_TEXTS = [
+    "The stock market is performing exceptionally well with record-breaking gains.",
+    "Company profits are declining rapidly due to poor management decisions.",
+    "The quarterly earnings report shows stable growth in revenue.",
+    "Investors are concerned about the market volatility and economic uncertainty.",
+    "The new product launch exceeded all expectations and boosted sales significantly.",
+    "The Federal Reserve left interest rates unchanged, in line with analyst expectations.",
+    "Shares plunged 12% after the company cut its full-year guidance.",
+    "Revenue was flat year-over-year as higher prices offset lower volumes.",
+]
+
+
+class QuantizedExporter:
+    def __init__(self, model_path="../models/finbert", feedback_dir="../feedback_data",
+                 output_dir="../models/finbert_tflite", seq_length=128):
+        self.model_path = model_path
+        self.feedback_dir = feedback_dir
+        self.output_dir = output_dir
+        self.seq_length = seq_length
+        self.tokenizer = None
+        self.model = None
+
+    def load_model_and_tokenizer(self):
+        """加载浮点模型和分词器"""
+        print("🔄 加载浮点模型和分词器...")
+        self.tokenizer = DistilBertTokenizer.from_pretrained(self.model_path)
+        self.model = TFDistilBertForSequenceClassification.from_pretrained(self.model_path)
+        print("✅ 模型加载完成")
+
+    def load_texts(self, limit=200):
+        """从反馈数据中读取文本，按文本哈希分成互不重叠的 (校准集, 评估集)
+
+        评估集是重训练留作验证集的那部分文本，量化模型在评估时没有见过它们
+        """
+        calibration, evaluation = [], []
+
+        def add(text):
+            # 与重训练相同的按文本哈希划分：验证集一侧只用于评估，不参与 int8 校准
+            side = evaluation if in_validation_split([text_hash(text)], VALIDATION_PERCENT)[0] else calibration
+            if len(side) < limit:
+                side.append(text)
+
+        for record in iter_feedback(self.feedback_dir):
+            text = (record.get('text') or '').strip()
+            if text:
+                add(text)
+            if len(calibration) >= limit and len(evaluation) >= limit:
+                break
+        for text in SAMPLE_TEXTS:
+            add(text)
+        print(f"📚 校准集 {len(calibration)} 条, 评估集 {len(evaluation)} 条（不重叠）")
+        return calibration, evaluation
+
+    def _encode(self, texts):
+        """分词并填充到固定长度"""
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.seq_length)['input_ids']
+        return pad_batch(encoded, self.tokenizer.pad_token_id, multiple=self.seq_length, max_length=self.seq_length)
+
+    def convert(self, mode, calibration_texts):
+        """转换为 TFLite；mode 为 dynamic（动态范围）或 int8（需要校准集）"""
+        print(f"⚙️ 导出 TFLite 模型 (模式: {mode})...")
+        model = self.model
+
+        @tf.function(input_signature=[
+            tf.TensorSpec(shape=(None, None), dtype=tf.int32, name='input_ids'),
+            tf.TensorSpec(shape=(None, None), dtype=tf.int32, name='attention_mask')
+        ])
+        def serving(input_ids, attention_mask):
+            logits = model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+            return tf.nn.softmax(logits, axis=-1)
+
+        converter = tf.lite.TFLiteConverter.from_concrete_functions(
+            [serving.get_concrete_function()], model
+        )
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if mode == 'int8':
+            input_ids, attention_mask = self._encode(calibration_texts)
+
+            def representative_dataset():
+                for row in range(len(input_ids)):
+                    yield [input_ids[row:row + 1], attention_mask[row:row + 1]]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [
+                tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                tf.lite.OpsSet.TFLITE_BUILTINS
+            ]
+        elif mode != 'dynamic':
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+        tflite_model = converter.convert()
+        os.makedirs(self.output_dir, exist_ok=True)
+        tflite_path = os.path.join(self.output_dir, 'model.tflite')
+        with open(tflite_path, 'wb') as f:
+            f.write(tflite_model)
+        print(f"💾 已保存: {tflite_path} ({len(tflite_model) / 1e6:.1f} MB)")
+        return tflite_path
+
+    def accuracy_delta_report(self, tflite_path, texts, mode, min_texts=MIN_EVALUATION_TEXTS):
+        """逐条比较浮点模型与量化模型的预测，生成精度差异报告
+
+        评估集少于 ``min_texts`` 条时抛出 ValueError，不写报告
+        """
+        if len(texts) < max(min_texts, 1):
+            raise ValueError(f"Evaluation set has {len(texts)} texts, at least {max(min_texts, 1)} are required")
+        print("📊 对比浮点模型与量化模型...")
+        quantized = TFLiteClassifier(tflite_path)
+
+        float_probs, quant_probs = [], []
+        float_time = quant_time = 0.0
+        for text in texts:
+            input_ids, attention_mask = self._encode([text])
+
+            started = time.perf_counter()
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask, training=False).logits
+            float_probs.append(tf.nn.softmax(logits, axis=-1).numpy()[0])
+            float_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            quant_probs.append(quantized.predict(input_ids, attention_mask)[0])
+            quant_time += time.perf_counter() - started
+
+        float_probs = np.array(float_probs)
+        quant_probs = np.array(quant_probs)
+        agreement = float(np.mean(float_probs.argmax(axis=1) == quant_probs.argmax(axis=1)))
+        abs_diff = np.abs(float_probs - quant_probs)
+
+        float_size = sum(
+            os.path.getsize(os.path.join(self.model_path, name))
+            for name in os.listdir(self.model_path)
+            if name.endswith(('.h5', '.safetensors', '.bin'))
+        )
+        report = {
+            "export_date": datetime.now().isoformat(),
+            "model_path": self.model_path,
+            "tflite_path": tflite_path,
+            "mode": mode,
+            "eval_texts": len(texts),
+            "label_agreement": agreement,
+            "mean_abs_prob_diff": float(abs_diff.mean()),
+            "max_abs_prob_diff": float(abs_diff.max()),
+            "float_latency_ms": float_time / len(texts) * 1000.0,
+            "quantized_latency_ms": quant_time / len(texts) * 1000.0,
+            "float_size_mb": float_size / 1e6,
+            "quantized_size_mb": os.path.getsize(tflite_path) / 1e6
+        }
+
+        report_file = os.path.join(self.output_dir, 'quantization_report.json')
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        print(f"   标签一致率: {agreement:.2%}")
+        print(f"   平均概率差: {report['mean_abs_prob_diff']:.4f} (最大 {report['max_abs_prob_diff']:.4f})")
+        print(f"   延迟: {report['float_latency_ms']:.1f} ms → {report['quantized_latency_ms']:.1f} ms")
+        print(f"   大小: {report['float_size_mb']:.1f} MB → {report['quantized_size_mb']:.1f} MB")
+        print(f"📄 报告已保存到: {report_file}")
+        return report
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Export FinBERT to a quantized TFLite model")
+    parser.add_argument('--model-path', default="../models/finbert")
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--output-dir', default="../models/finbert_tflite")
+    parser.add_argument('--mode', choices=['dynamic', 'int8'], default='dynamic')
+    parser.add_argument('--seq-length', type=int, default=128)
+    parser.add_argument('--min-eval-texts', type=int, default=MIN_EVALUATION_TEXTS,
+                        help="held-out feedback texts required for the accuracy report")
+    args = parser.parse_args()
+
+    print("🗜️ FinKnows 量化模型导出工具")
+    print("=" * 50)
+
+    exporter = QuantizedExporter(args.model_path, args.feedback_dir, args.output_dir, args.seq_length)
+    exporter.load_model_and_tokenizer()
+    calibration_texts, evaluation_texts = exporter.load_texts()
+    if len(evaluation_texts) < max(args.min_eval_texts, 1):
+        # 在转换之前失败：没有可信的精度报告就不应该部署量化模型
+        print(f"❌ 评估集只有 {len(evaluation_texts)} 条文本，至少需要 {max(args.min_eval_texts, 1)} 条；"
+              f"请先收集更多反馈（评估集约占反馈文本的 {VALIDATION_PERCENT}%）")
+        sys.exit(1)
+    tflite_path = exporter.convert(args.mode, calibration_texts)
+    exporter.accuracy_delta_report(tflite_path, evaluation_texts, args.mode)
+
+    print(f"\n🎉 导出完成！启动服务器时设置:")
+    print(f"   FINANSWER_BACKEND=tflite FINANSWER_TFLITE_MODEL={tflite_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+TensorFlow 微调循环
+供重训练和蒸馏脚本使用的 Keras 原生训练循环：可选 bfloat16 混合精度、
+梯度累积、早停、可断点续训的检查点，以及按步打印吞吐量（样本/秒）
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+from transformers import create_optimizer
+from transformers.modeling_tf_utils import keras
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from token_cache import in_validation_split
+
+MIXED_PRECISION_MODES = ('auto', 'bf16', 'off')
+BUCKET_BOUNDARIES = (16, 32, 64, 128, 256)
+# 按文本哈希划出的验证集比例；重训练、蒸馏、评估和量化导出共用这一个划分
+VALIDATION_PERCENT = 20
+SHUFFLE_BUFFER = 10000
+RUN_FILENAME = 'run.json'
+
+
+def bfloat16_supported():
+    """CPU 是否有原生 bfloat16 指令（AVX512-BF16 / AMX），或者有 GPU"""
+    if tf.config.list_physical_devices('GPU'):
+        return True
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+
+def configure_mixed_precision(mode='auto'):
+    """设置全局精度策略，必须在创建模型之前调用；返回是否启用了 bfloat16"""
+    if mode not in MIXED_PRECISION_MODES:
+        raise ValueError(f"Unknown mixed precision mode: {mode}")
+    enabled = mode == 'bf16' or (mode == 'auto' and bfloat16_supported())
+    keras.mixed_precision.set_global_policy('mixed_bfloat16' if enabled else 'float32')
+    return enabled
+
+
+def split_sizes(shards, validation_percent=VALIDATION_PERCENT):
+    """(训练集, 验证集) 样本数，只读取各分片的哈希列"""
+    val_size = sum(int(in_validation_split(shard.hashes, validation_percent).sum()) for shard in shards)
+    return sum(len(shard) for shard in shards) - val_size, val_size
+
+
+def bucket_boundaries(max_length=512):
+    return [length for length in BUCKET_BOUNDARIES if length < max_length]
+
+
+def batch_count(shards, validation, validation_percent=VALIDATION_PERCENT, batch_size=8, max_length=512):
+    """shard_dataset 一轮产生的批次数（只读取长度和哈希列）
+
+    每个长度桶各自凑批，每个桶最后都可能剩一个不满的批次，
+    所以批次数是各桶 ``ceil(样本数 / batch_size)`` 之和，而不是 ``ceil(总数 / batch_size)``
+    """
+    boundaries = bucket_boundaries(max_length)
+    counts = np.zeros(len(boundaries) + 1, dtype=np.int64)
+    for shard in shards:
+        lengths = shard.lengths()[in_validation_split(shard.hashes, validation_percent) == validation]
+        # 与 bucket_by_sequence_length 相同：长度 >= 边界的样本进入下一个桶
+        counts += np.bincount(np.searchsorted(boundaries, lengths, side='right'), minlength=len(counts))
+    return int((-(-counts // batch_size)).sum())
+
+
+def shard_dataset(shards, pad_id, validation, validation_percent=VALIDATION_PERCENT, batch_size=8,
+                  pad_multiple=8, shuffle_buffer=0, seed=None, soft_targets=False, max_length=512):
+    """从内存映射分片流式读取一侧的样本，按长度分桶并动态填充成批次数据集
+
+    样本按文本哈希确定性地归入训练集或验证集；``shuffle_buffer`` 大于 0 时
+    打乱分片顺序并在有界缓冲区内打乱样本。给定 ``seed`` 时批次顺序完全确定
+    （每轮用不同的 seed 重新创建数据集），断点续训跳过的正是已经训练过的批次。
+    ``soft_targets`` 时目标是分片中保存的每样本浮点向量（如教师模型的 logits），
+    否则是整数标签
+    """
+
+    def examples(index):
+        shard = shards[index]
+        for i in np.flatnonzero(in_validation_split(shard.hashes, validation_percent) == validation):
+            target = shard.targets[i].astype(np.float32) if soft_targets else np.int32(shard.labels[i])
+            yield shard.ids(i).astype(np.int32), target
+
+    if soft_targets:
+        target_spec = tf.TensorSpec(shape=(shards[0].targets.shape[1],), dtype=tf.float32)
+    else:
+        target_spec = tf.TensorSpec(shape=(), dtype=tf.int32)
+
+    def read_shard(index):
+        return tf.data.Dataset.from_generator(
+            examples,
+            args=(index,),
+            output_signature=(tf.TensorSpec(shape=(None,), dtype=tf.int32), target_spec)
+        )
+
+    deterministic = seed is not None or not shuffle_buffer
+    dataset = tf.data.Dataset.range(len(shards))
+    if shuffle_buffer:
+        dataset = dataset.shuffle(len(shards), seed=seed, reshuffle_each_iteration=not deterministic)
+    # 并行读取多个分片；没有 seed 的训练集不要求确定的交错顺序
+    dataset = dataset.interleave(
+        read_shard,
+        cycle_length=min(len(shards), os.cpu_count() or 1),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=deterministic
+    )
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=not deterministic)
+
+    dataset = dataset.map(lambda ids, target: (ids, tf.ones_like(ids), target))
+    boundaries = bucket_boundaries(max_length)
+    dataset = dataset.bucket_by_sequence_length(
+        lambda ids, mask, target: tf.shape(ids)[0],
+        bucket_boundaries=boundaries,
+        bucket_batch_sizes=[batch_size] * (len(boundaries) + 1),
+        padding_values=(tf.constant(pad_id, tf.int32), 0, tf.zeros((), target_spec.dtype))
+    )
+
+    def to_features(ids, mask, targets):
+        # 宽度向上取整到 pad_multiple 的倍数
+        width = tf.shape(ids)[1]
+        padding = [[0, 0], [0, (pad_multiple - width % pad_multiple) % pad_multiple]]
+        return (
+            {'input_ids': tf.pad(ids, padding, constant_values=pad_id), 'attention_mask': tf.pad(mask, padding)},
+            targets
+        )
+
+    return dataset.map(to_features, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def classification_loss(labels, logits):
+    """默认损失：整数标签的交叉熵"""
+    return tf.nn.sparse_softmax_cross_entropy_with_logits(labels=labels, logits=logits)
+
+
+class FineTuner:
+    """训练 TF 序列分类模型
+
+    ``loss_fn(targets, logits)`` 返回每个样本的损失，targets 是数据集中的标签
+    （蒸馏时可以是教师模型的软标签）。检查点写在 ``output_dir/checkpoints``，
+    中断后重新运行会从最近的检查点继续：恢复权重、优化器状态和当前轮次，
+    并跳过本轮已经训练过的批次。只有同一次训练才会续训：``run_key``（训练数据的
+    标识）、模型结构或超参数变了的检查点会被丢弃，训练正常结束后检查点也会删除，
+    所以下一次重训练总是从头开始。
+    """
+
+    def __init__(self, model, output_dir, epochs=3, learning_rate=5e-5, warmup_steps=100,
+                 weight_decay=0.01, accumulation_steps=1, patience=2, checkpoint_steps=100,
+                 log_steps=10, loss_fn=classification_loss, run_key=None):
+        self.model = model
+        self.output_dir = output_dir
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.warmup_steps = warmup_steps
+        self.weight_decay = weight_decay
+        self.accumulation_steps = max(1, accumulation_steps)
+        self.patience = patience
+        self.checkpoint_steps = checkpoint_steps
+        self.log_steps = log_steps
+        self.loss_fn = loss_fn
+        self.run_key = run_key
+
+        self.optimizer = None
+        self._accumulators = None
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.batch = tf.Variable(0, dtype=tf.int64, trainable=False)  # 本轮已训练的批次
+        self.best_loss = tf.Variable(math.inf, dtype=tf.float64, trainable=False)
+        self.bad_epochs = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self._checkpoint = None
+        self._manager = None
+
+    def _build(self, train_batches):
+        """创建优化器、梯度累积变量和检查点（训练步数决定学习率衰减）"""
+        # 每轮结束时不足一次累积的梯度也会单独更新一步
+        num_train_steps = max(1, math.ceil(train_batches / self.accumulation_steps) * self.epochs)
+        self.optimizer, _ = create_optimizer(
+            init_lr=self.learning_rate,
+            num_train_steps=num_train_steps,
+            num_warmup_steps=min(self.warmup_steps, num_train_steps // 2),
+            weight_decay_rate=self.weight_decay
+        )
+        self._checkpoint = tf.train.Checkpoint(
+            model=self.model, optimizer=self.optimizer, epoch=self.epoch, batch=self.batch,
+            best_loss=self.best_loss, bad_epochs=self.bad_epochs
+        )
+        self._manager = tf.train.CheckpointManager(
+            self._checkpoint, self._checkpoint_dir, max_to_keep=2
+        )
+        self._best = tf.train.Checkpoint(model=self.model)
+
+    @property
+    def _checkpoint_dir(self):
+        return os.path.join(self.output_dir, 'checkpoints')
+
+    def _run_id(self, train_batches):
+        """本次训练的标识：数据、模型结构和影响训练过程的超参数"""
+        run = {
+            'run_key': self.run_key,
+            'model': self.model.config.to_dict(),
+            'train_batches': train_batches,
+            'epochs': self.epochs,
+            'learning_rate': self.learning_rate,
+            'warmup_steps': self.warmup_steps,
+            'weight_decay': self.weight_decay,
+            'accumulation_steps': self.accumulation_steps
+        }
+        return hashlib.sha256(json.dumps(run, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+    def _clear_checkpoints(self):
+        for name in ('checkpoints', 'best'):
+            shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+
+    def _start_run(self, run_id):
+        """检查点属于另一次训练时先清掉，再记下本次训练的标识"""
+        run_file = os.path.join(self._checkpoint_dir, RUN_FILENAME)
+        saved = None
+        if os.path.exists(run_file):
+            with open(run_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get('run_id')
+        if saved != run_id:
+            if os.path.exists(self._checkpoint_dir):
+                print("🧹 检查点属于另一次训练（数据、模型或参数不同），从头开始")
+            self._clear_checkpoints()
+            os.makedirs(self._checkpoint_dir, exist_ok=True)
+            with open(run_file, 'w', encoding='utf-8') as f:
+                json.dump({'run_id': run_id}, f)
+
+    def _ensure_accumulators(self):
+        if self._accumulators is None:
+            self._accumulators = [
+                tf.Variable(tf.zeros_like(variable), trainable=False)
+                for variable in self.model.trainable_variables
+            ]
+
+    def _logits(self, features, training):
+        # 混合精度下 logits 为 bfloat16，损失统一按 float32 计算
+        return tf.cast(self.model(features, training=training).logits, tf.float32)
+
+    @tf.function(reduce_retracing=True)
+    def _accumulate(self, features, targets):
+        """前向 + 反向，把梯度累加到累积变量，返回批次损失"""
+        with tf.GradientTape() as tape:
+            loss = tf.reduce_mean(self.loss_fn(targets, self._logits(features, True)))
+            scaled = loss / self.accumulation_steps
+        gradients = tape.gradient(scaled, self.model.trainable_variables)
+        for accumulator, gradient in zip(self._accumulators, gradients):
+            if gradient is not None:
+                accumulator.assign_add(tf.convert_to_tensor(gradient))
+        return loss
+
+    @tf.function
+    def _apply(self):
+        """用累积的梯度更新一次参数并清零"""
+        self.optimizer.apply_gradients(zip(
+            [tf.identity(accumulator) for accumulator in self._accumulators], self.model.trainable_variables
+        ))
+        for accumulator in self._accumulators:
+            accumulator.assign(tf.zeros_like(accumulator))
+
+    @tf.function(reduce_retracing=True)
+    def _evaluate_batch(self, features, targets):
+        logits = self._logits(features, False)
+        return tf.reduce_sum(self.loss_fn(targets, logits)), logits
+
+    def evaluate(self, dataset):
+        """验证集上的平均损失和准确率（软标签时按 argmax 比较）"""
+        total_loss, correct, count = 0.0, 0, 0
+        for features, targets in dataset:
+            loss, logits = self._evaluate_batch(features, targets)
+            labels = targets if targets.shape.rank == 1 else tf.argmax(targets, axis=-1, output_type=tf.int32)
+            total_loss += float(loss)
+            correct += int(tf.reduce_sum(tf.cast(tf.argmax(logits, axis=-1, output_type=tf.int32) == labels, tf.int32)))
+            count += int(tf.shape(labels)[0])
+        if not count:
+            return {'loss': math.inf, 'accuracy': 0.0}
+        return {'loss': total_loss / count, 'accuracy': correct / count}
+
+    def fit(self, train_dataset, val_dataset, train_batches):
+        """训练直到跑完所有轮次或早停，结束时载入验证损失最低的权重；返回历史记录
+
+        ``train_dataset`` 可以是数据集，也可以是 ``epoch -> 数据集`` 的函数；
+        中途续训会跳过本轮已训练的批次，所以每轮的批次顺序必须可以复现
+        （例如用 ``seed + epoch`` 调用 shard_dataset）。``train_batches`` 是每轮的
+        批次数（分片数据集用 batch_count 计算），用于学习率调度
+        """
+        if not self.model.built:
+            self.model(self.model.dummy_inputs, training=False)
+        self._start_run(self._run_id(train_batches))
+        self._build(train_batches)
+        if self._manager.latest_checkpoint:
+            self._checkpoint.restore(self._manager.latest_checkpoint)
+            print(f"♻️ 从检查点继续: {self._manager.latest_checkpoint} "
+                  f"(第 {int(self.epoch) + 1} 轮, 第 {int(self.batch)} 批)")
+        self._ensure_accumulators()
+
+        best_prefix = os.path.join(self.output_dir, 'best', 'weights')
+        history = []
+        while int(self.epoch) < self.epochs and int(self.bad_epochs) < self.patience:
+            self._train_epoch(train_dataset)
+
+            metrics = self.evaluate(val_dataset)
+            metrics['epoch'] = int(self.epoch) + 1
+            history.append(metrics)
+            print(f"📊 第 {metrics['epoch']} 轮: val_loss={metrics['loss']:.4f} val_accuracy={metrics['accuracy']:.2%}")
+
+            if metrics['loss'] < float(self.best_loss):
+                self.best_loss.assign(metrics['loss'])
+                self.bad_epochs.assign(0)
+                self._best.write(best_prefix)
+            else:
+                self.bad_epochs.assign_add(1)
+            self.epoch.assign_add(1)
+            self.batch.assign(0)
+            self._manager.save()
+
+        if int(self.bad_epochs) >= self.patience and int(self.epoch) < self.epochs:
+            print(f"⏹️ 验证损失连续 {self.patience} 轮没有下降，提前停止")
+        if tf.io.gfile.exists(best_prefix + '.index'):
+            self._best.read(best_prefix).expect_partial()
+        # 训练已完成，下次运行不应再从这里续训
+        self._clear_checkpoints()
+        return history
+
+    def _train_epoch(self, dataset):
+        if callable(dataset):
+            dataset = dataset(int(self.epoch))
+        skip = int(self.batch)
+        if skip:
+            dataset = dataset.skip(skip)
+        window_examples, window_started = 0, time.monotonic()
+        losses = []
+        for features, targets in dataset:
+            losses.append(float(self._accumulate(features, targets)))
+            window_examples += int(tf.shape(features['input_ids'])[0])
+            self.batch.assign_add(1)
+            if int(self.batch) % self.accumulation_steps:
+                continue
+
+            self._apply()
+            step = int(self.optimizer.iterations)
+            if self.log_steps and step % self.log_steps == 0:
+                elapsed = time.monotonic() - window_started
+                print(f"🚀 step {step}: loss={sum(losses) / len(losses):.4f} "
+                      f"{window_examples / elapsed if elapsed else 0.0:.1f} examples/sec")
+                window_examples, window_started, losses = 0, time.monotonic(), []
+            if self.checkpoint_steps and step % self.checkpoint_steps == 0:
+                self._manager.save()
+
+        if int(self.batch) % self.accumulation_steps:
+            # 本轮剩余不足一次累积的梯度
+            self._apply()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+反馈数据迁移脚本
+把 feedback_data 目录中每条一个文件的旧格式反馈 (feedback_*.json) 按时间顺序
+追加到分段日志 feedback_data/log/，并把已迁移的文件移动到 legacy/ 目录
+使用 --backend sqlite 时迁移到 feedback_data/feedback.db，日志分段也一并导入；
+仍在运行的服务器进程正在追加的分段会被跳过，停止服务器后再运行一次即可导入
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from feedback_log import INDEX_SUFFIX, SEGMENT_SUFFIX, FeedbackLogReader, iter_legacy_files, log_directory
+from feedback_store import SQLiteFeedbackStore, database_path, open_feedback_store
+
+
+class FeedbackMigrator:
+    def __init__(self, feedback_dir="../feedback_data", keep_files=False, backend='log'):
+        self.feedback_dir = feedback_dir
+        self.keep_files = keep_files
+        self.backend = backend
+        self.archive_dir = os.path.join(feedback_dir, 'legacy')
+        self.skipped_segments = []
+
+    def migrate(self):
+        """逐个读取旧文件（sqlite 时还有日志分段）并写入目标存储，返回迁移条数"""
+        store = open_feedback_store(self.backend, self.feedback_dir)
+        migrated = 0
+        try:
+            before = store.count() if self.backend == 'sqlite' else 0
+            for filename, record in iter_legacy_files(self.feedback_dir):
+                store.append(record)
+                migrated += 1
+                if not self.keep_files:
+                    # 移走已迁移的文件，重复运行不会产生重复记录
+                    self._archive(self.feedback_dir, filename)
+            if self.backend == 'sqlite':
+                self._migrate_log(store)
+                # 数据库按 feedback_id 去重：--keep-files 重复运行或归档前中断后重跑，
+                # 已导入的记录会被忽略，这里按实际新增的行数计
+                migrated = store.count() - before
+        finally:
+            store.close()
+        return migrated
+
+    def _migrate_log(self, store):
+        """每个日志分段在一个事务里导入数据库（跳过仍在写入的分段）"""
+        reader = FeedbackLogReader(log_directory(self.feedback_dir))
+        migrated = 0
+        active = reader.active_segments()
+        self.skipped_segments = sorted(active)
+        for segment in reader.segments():
+            if segment in active:
+                # 写入进程还活着：复制之后追加的记录会随分段一起被移走而丢失
+                continue
+            records = list(reader.iter_segment(segment))
+            store.append_many(records)
+            migrated += len(records)
+            if not self.keep_files:
+                for suffix in (SEGMENT_SUFFIX, INDEX_SUFFIX):
+                    if os.path.exists(os.path.join(reader.directory, segment + suffix)):
+                        self._archive(reader.directory, segment + suffix, 'log')
+        return migrated
+
+    def _archive(self, directory, filename, subdir=''):
+        archive_dir = os.path.join(self.archive_dir, subdir)
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(os.path.join(directory, filename), os.path.join(archive_dir, filename))
+
+    def total(self):
+        """目标存储中的记录总数"""
+        if self.backend == 'sqlite':
+            store = SQLiteFeedbackStore(database_path(self.feedback_dir))
+            try:
+                return store.count()
+            finally:
+                store.close()
+        return FeedbackLogReader(log_directory(self.feedback_dir)).count()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description="Migrate per-file feedback JSON into the segmented feedback log or SQLite",
+        epilog="With --backend sqlite, log segments that a running server process is still appending to "
+               "are skipped; stop the server (or switch it to FINANSWER_FEEDBACK_BACKEND=sqlite) and "
+               "run the migration again to import them. Run it on the host that serves the log."
+    )
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--backend', choices=['log', 'sqlite'], default='log')
+    parser.add_argument('--keep-files', action='store_true', help="leave the migrated files in place")
+    args = parser.parse_args()
+
+    print("📦 FinKnows 反馈数据迁移工具")
+    print("=" * 50)
+
+    if not os.path.isdir(args.feedback_dir):
+        print(f"❌ 反馈数据目录不存在: {args.feedback_dir}")
+        sys.exit(1)
+
+    migrator = FeedbackMigrator(args.feedback_dir, args.keep_files, args.backend)
+    migrated = migrator.migrate()
+    total = migrator.total()
+
+    print(f"✅ 迁移了 {migrated} 条反馈，{args.backend} 存储中共有 {total} 条记录")
+    if migrated and not args.keep_files:
+        print(f"📁 原文件已移动到: {migrator.archive_dir}")
+    if migrator.skipped_segments:
+        print(f"⚠️ 跳过了 {len(migrator.skipped_segments)} 个仍在写入的日志分段: "
+              f"{', '.join(migrator.skipped_segments)}")
+        print("   停止服务器后重新运行以导入这些分段")
+
+
+if __name__ == "__main__":
+    main()
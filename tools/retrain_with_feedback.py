@@ -4,170 +4,211 @@
 利用收集的用户反馈数据来改进 FinBERT 模型
 """
 
+import argparse
 import json
 import os
-import numpy as np
-import tensorflow as tf
-from transformers import DistilBertTokenizer, TFDistilBertForSequenceClassification, TrainingArguments, Trainer
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import pandas as pd
+import sys
+
+from transformers import TFDistilBertForSequenceClassification
 from datetime import datetime
 
+from evaluate_model import CLASS_NAMES, classification_metrics, predict_dataset
+from fine_tune import (MIXED_PRECISION_MODES, SHUFFLE_BUFFER, VALIDATION_PERCENT, FineTuner, batch_count,
+                       configure_mixed_precision, shard_dataset, split_sizes)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from feedback_store import HIGH_CONFIDENCE, FeedbackCursor, SQLiteFeedbackStore, database_path
+from token_cache import TokenShardCache, tokenizer_fingerprint
+from tokenization import load_tokenizer
+
+LABEL_MAP = {
+    'LABEL_0': 0,  # Negative
+    'LABEL_1': 1,  # Neutral
+    'LABEL_2': 2   # Positive
+}
+MAX_LENGTH = 512
+
+
+def training_example(feedback):
+    """一条反馈对应的 (文本, 标签)，不能用于训练时返回 None"""
+    text = feedback.get('text', '').strip()
+    if not text or len(text) < 10:  # 过滤太短的文本
+        return None
+
+    # 只使用用户反馈为"accurate"的数据，将预测结果作为训练标签；
+    # "inaccurate" 的样本需要人工标注正确标签，暂时跳过
+    if feedback.get('user_feedback') != 'accurate':
+        return None
+
+    label = LABEL_MAP.get(feedback.get('predicted_sentiment'))
+    if label is None:
+        return None
+    return text, label
+
+
+def empty_counters():
+    return {'total': 0, 'accurate': 0, 'high_confidence_errors': 0, 'sentiments': {}}
+
+
+def count_feedback(counters, feedback):
+    """把一条反馈计入汇总计数"""
+    counters['total'] += 1
+    if feedback.get('user_feedback') == 'accurate':
+        counters['accurate'] += 1
+    elif feedback.get('user_feedback') == 'inaccurate' and (feedback.get('predicted_confidence') or 0) > HIGH_CONFIDENCE:
+        counters['high_confidence_errors'] += 1
+    sentiment = feedback.get('predicted_sentiment')
+    counters['sentiments'][sentiment] = counters['sentiments'].get(sentiment, 0) + 1
+
+
 class FeedbackBasedRetrainer:
-    def __init__(self, model_path="../models/finbert", feedback_dir="../feedback_data"):
+    def __init__(self, model_path="../models/finbert", feedback_dir="../feedback_data", cache_dir=None):
         self.model_path = model_path
         self.feedback_dir = feedback_dir
+        self.cache_dir = cache_dir or os.path.join(feedback_dir, 'token_cache')
         self.tokenizer = None
         self.model = None
-        self.feedback_data = []
+        self.feedback_summary = {}
+        self.train_batches = 0
         
-    def load_model_and_tokenizer(self):
-        """加载现有模型和分词器"""
+    def load_model_and_tokenizer(self, mixed_precision='auto'):
+        """加载现有模型和分词器（精度策略要在创建模型之前设置）"""
         print("🔄 加载现有模型和分词器...")
-        self.tokenizer = DistilBertTokenizer.from_pretrained(self.model_path)
+        if configure_mixed_precision(mixed_precision):
+            print("⚡ 使用 bfloat16 混合精度")
+        self.tokenizer = load_tokenizer(self.model_path)
         self.model = TFDistilBertForSequenceClassification.from_pretrained(self.model_path)
         print("✅ 模型加载完成")
     
-    def load_feedback_data(self):
-        """加载用户反馈数据"""
+    def load_feedback_data(self, cache):
+        """汇总用户反馈统计，不再单独遍历语料
+
+        日志分段和旧文件的计数由 prepare_training_data 在分词缓存的清单中增量维护，
+        数据库中的反馈用 SQL 聚合和索引计数
+        """
         print("📊 加载用户反馈数据...")
-        
+
+        counters = cache.position['counters']
+        summary = {'total': 0, 'accurate': 0, 'high_confidence_errors': 0, 'sentiments': {}}
+        if os.path.exists(database_path(self.feedback_dir)):
+            # 数据库中的反馈用 SQL 聚合和索引计数，不逐条读取
+            store = SQLiteFeedbackStore(database_path(self.feedback_dir))
+            try:
+                stats = store.statistics(HIGH_CONFIDENCE)
+                summary['total'] = stats['total_feedback']
+                summary['accurate'] = stats['accurate_predictions']
+                summary['high_confidence_errors'] = store.count(user_feedback='inaccurate', min_confidence=HIGH_CONFIDENCE)
+                summary['sentiments'] = stats['sentiment_distribution']
+            finally:
+                store.close()
+        for key in ('total', 'accurate', 'high_confidence_errors'):
+            summary[key] += counters[key]
+        for sentiment, count in counters['sentiments'].items():
+            summary['sentiments'][sentiment] = summary['sentiments'].get(sentiment, 0) + count
+        self.feedback_summary = summary
+
+        print(f"📈 加载了 {summary['total']} 条反馈数据")
+        return summary['total'] > 0
+
+    def prepare_training_data(self, shard_size=50000):
+        """把新增反馈分词后追加到分词缓存，返回缓存；反馈目录不存在时返回 None
+
+        缓存目录以分词器指纹命名，更换分词器会自动使用新的缓存；
+        已分词的样本不再重复分词，每次只处理上次之后新增的反馈。
+        清单中的读取位置是 ``{'cursor': 游标状态, 'counters': 反馈计数}``，
+        日志分段和旧文件的计数随同一次读取更新，与分片一起提交
+        """
+        print("🔧 准备训练数据...")
+
         if not os.path.exists(self.feedback_dir):
             print(f"❌ 反馈数据目录不存在: {self.feedback_dir}")
-            return False
-            
-        # 加载所有反馈文件
-        for filename in os.listdir(self.feedback_dir):
-            if filename.endswith('.json') and filename.startswith('feedback_'):
-                filepath = os.path.join(self.feedback_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        self.feedback_data.append(data)
-                except Exception as e:
-                    print(f"⚠️ 无法读取文件 {filename}: {e}")
-        
-        print(f"📈 加载了 {len(self.feedback_data)} 条反馈数据")
-        return len(self.feedback_data) > 0
-    
-    def prepare_training_data(self):
-        """准备训练数据"""
-        print("🔧 准备训练数据...")
-        
-        training_data = []
-        
-        for feedback in self.feedback_data:
-            text = feedback.get('text', '').strip()
-            if not text or len(text) < 10:  # 过滤太短的文本
-                continue
-                
-            predicted_sentiment = feedback.get('predicted_sentiment')
-            user_feedback = feedback.get('user_feedback')
-            confidence = feedback.get('predicted_confidence', 0)
-            
-            # 只使用用户反馈为"inaccurate"的数据进行重训练
-            if user_feedback == 'inaccurate':
-                # 这里需要用户提供正确的标签
-                # 在实际应用中，可能需要人工标注或使用其他方法
-                # 暂时跳过这些样本
-                continue
-            
-            # 使用用户反馈为"accurate"的数据作为正样本
-            if user_feedback == 'accurate':
-                # 将预测结果作为训练标签
-                label_map = {
-                    'LABEL_0': 0,  # Negative
-                    'LABEL_1': 1,  # Neutral
-                    'LABEL_2': 2   # Positive
-                }
-                
-                if predicted_sentiment in label_map:
-                    training_data.append({
-                        'text': text,
-                        'label': label_map[predicted_sentiment],
-                        'confidence': confidence
-                    })
-        
-        print(f"📚 准备了 {len(training_data)} 条训练数据")
-        return training_data
-    
-    def create_dataset(self, training_data):
-        """创建 TensorFlow 数据集"""
-        if not training_data:
+            return None
+
+        cache = TokenShardCache(self.cache_dir, tokenizer_fingerprint(self.model_path, MAX_LENGTH), shard_size)
+        position = cache.position or {'cursor': None, 'counters': empty_counters()}
+        cursor = FeedbackCursor(self.feedback_dir, state=position.get('cursor'))
+        if 'counters' not in position or not cursor.is_valid():
+            # 反馈被迁移或归档过（或缓存来自没有计数的旧版本），读取位置已失效，需要重建缓存
+            print("⚠️ 分词缓存的读取位置已失效，重新构建")
+            cache.reset()
+            cursor = FeedbackCursor(self.feedback_dir)
+            position = {'cursor': None, 'counters': empty_counters()}
+        position['cursor'] = cursor.state
+
+        def read():
+            for feedback in cursor:
+                if cursor.source != 'database':
+                    count_feedback(position['counters'], feedback)
+                example = training_example(feedback)
+                if example is not None:
+                    yield example
+
+        def encode(texts):
+            # 分词（不填充，由分桶批次各自填充）
+            return self.tokenizer(texts, truncation=True, max_length=MAX_LENGTH)['input_ids']
+
+        added = cache.extend(read(), encode, position=position)
+
+        print(f"📚 新增 {added} 条训练数据，缓存共 {len(cache)} 条")
+        return cache
+
+    def create_dataset(self, cache, batch_size=8, pad_multiple=8, validation_percent=VALIDATION_PERCENT,
+                       shuffle_buffer=SHUFFLE_BUFFER, seed=0):
+        """创建流式 TensorFlow 数据集（按长度分桶，每个批次只填充到自身最大长度）
+
+        样本按文本哈希确定性地划分训练集和验证集，语料增长时已有样本不会换边；
+        训练集在有界缓冲区内打乱，内存占用与语料规模无关。训练集是 ``epoch -> 数据集``
+        的函数，第 N 轮用 ``seed + N`` 打乱，中断后续训时批次顺序与中断前一致
+        """
+        if cache is None or not len(cache):
             print("❌ 没有足够的训练数据")
             return None, None
-            
-        texts = [item['text'] for item in training_data]
-        labels = [item['label'] for item in training_data]
-        
-        # 分词
-        encodings = self.tokenizer(
-            texts,
-            truncation=True,
-            padding=True,
-            max_length=512,
-            return_tensors="tf"
-        )
-        
-        # 创建数据集
-        dataset = tf.data.Dataset.from_tensor_slices((
-            {
-                'input_ids': encodings['input_ids'],
-                'attention_mask': encodings['attention_mask']
-            },
-            labels
-        ))
-        
-        # 分割训练集和验证集
-        total_size = len(training_data)
-        train_size = int(0.8 * total_size)
-        
-        train_dataset = dataset.take(train_size)
-        val_dataset = dataset.skip(train_size)
-        
+
+        # 分割训练集和验证集（只读取各分片的哈希列）
+        shards = cache.shards()
+        train_size, val_size = split_sizes(shards, validation_percent)
+        # 学习率调度按实际批次数计算：分桶后每个桶的最后一批可能不满
+        self.train_batches = batch_count(shards, False, validation_percent, batch_size, MAX_LENGTH)
+
+        pad_id = self.tokenizer.pad_token_id
+        train_dataset = (lambda epoch: shard_dataset(
+            shards, pad_id, False, validation_percent, batch_size, pad_multiple, shuffle_buffer, seed + epoch
+        )) if train_size else None
+        val_dataset = shard_dataset(
+            shards, pad_id, True, validation_percent, batch_size, pad_multiple
+        ) if val_size else None
+
         print(f"📊 训练集: {train_size} 样本")
-        print(f"📊 验证集: {total_size - train_size} 样本")
-        
+        print(f"📊 验证集: {val_size} 样本")
+
         return train_dataset, val_dataset
-    
-    def retrain_model(self, train_dataset, val_dataset):
-        """重训练模型"""
+
+    def retrain_model(self, train_dataset, val_dataset, output_dir="./retrained_model", epochs=3,
+                      learning_rate=5e-5, accumulation_steps=1, patience=2, run_key=None):
+        """重训练模型（检查点保存在 output_dir；同一份训练数据中断后重新运行会继续训练）"""
         if not train_dataset or not val_dataset:
             print("❌ 无法重训练：数据集为空")
             return False
             
         print("🚀 开始模型重训练...")
         
-        # 设置训练参数
-        training_args = TrainingArguments(
-            output_dir="./retrained_model",
-            num_train_epochs=3,
-            per_device_train_batch_size=8,
-            per_device_eval_batch_size=8,
+        trainer = FineTuner(
+            self.model,
+            output_dir,
+            epochs=epochs,
+            learning_rate=learning_rate,
             warmup_steps=100,
             weight_decay=0.01,
-            logging_dir="./logs",
-            logging_steps=10,
-            evaluation_strategy="steps",
-            eval_steps=50,
-            save_steps=100,
-            load_best_model_at_end=True,
-            metric_for_best_model="accuracy"
-        )
-        
-        # 创建训练器
-        trainer = Trainer(
-            model=self.model,
-            args=training_args,
-            train_dataset=train_dataset,
-            eval_dataset=val_dataset,
-            tokenizer=self.tokenizer
+            accumulation_steps=accumulation_steps,
+            patience=patience,
+            checkpoint_steps=100,
+            log_steps=10,
+            run_key=run_key
         )
         
         # 开始训练
         try:
-            trainer.train()
+            trainer.fit(train_dataset, val_dataset, self.train_batches)
             print("✅ 模型重训练完成")
             return True
         except Exception as e:
@@ -189,60 +230,32 @@ class FeedbackBasedRetrainer:
             print(f"❌ 模型保存失败: {e}")
             return None
     
-    def evaluate_model(self, test_data=None):
-        """评估模型性能"""
+    def evaluate_model(self, dataset):
+        """在验证集上批量评估模型，返回指标（准确率、各类别精确率/召回率、混淆矩阵、ECE）"""
         print("📊 评估模型性能...")
         
-        if test_data is None:
-            # 使用部分反馈数据作为测试集
-            test_data = self.feedback_data[-min(50, len(self.feedback_data)):]
-        
-        if not test_data:
+        labels, probabilities = predict_dataset(self.model, dataset) if dataset is not None else ([], [])
+        if not len(labels):
             print("❌ 没有测试数据")
-            return
-        
-        correct = 0
-        total = 0
-        
-        for feedback in test_data:
-            text = feedback.get('text', '').strip()
-            if not text:
-                continue
-                
-            # 使用模型进行预测
-            inputs = self.tokenizer(
-                text,
-                truncation=True,
-                padding=True,
-                max_length=512,
-                return_tensors="tf"
-            )
-            
-            outputs = self.model(inputs)
-            predictions = tf.nn.softmax(outputs.logits, axis=-1)
-            predicted_label = tf.argmax(predictions, axis=-1).numpy()[0]
-            
-            # 检查预测是否正确（基于用户反馈）
-            user_feedback = feedback.get('user_feedback')
-            if user_feedback == 'accurate':
-                correct += 1
-            total += 1
+            return None
         
-        if total > 0:
-            accuracy = correct / total
-            print(f"📈 模型准确率: {accuracy:.2%} ({correct}/{total})")
-        else:
-            print("❌ 无法计算准确率")
+        metrics = classification_metrics(labels, probabilities)
+        correct = round(metrics['accuracy'] * metrics['examples'])
+        print(f"📈 模型准确率: {metrics['accuracy']:.2%} ({correct}/{metrics['examples']}), ECE: {metrics['ece']:.4f}")
+        for name, precision, recall in zip(CLASS_NAMES, metrics['precision'], metrics['recall']):
+            print(f"   {name}: precision {precision:.2%}, recall {recall:.2%}")
+        return metrics
     
-    def generate_retraining_report(self, training_data, output_dir):
+    def generate_retraining_report(self, training_data, output_dir, validation_metrics=None):
         """生成重训练报告"""
         report = {
             "retraining_date": datetime.now().isoformat(),
             "original_model_path": self.model_path,
             "retrained_model_path": output_dir,
-            "total_feedback_data": len(self.feedback_data),
+            "total_feedback_data": self.feedback_summary.get('total', 0),
             "training_samples": len(training_data),
             "feedback_accuracy": self._calculate_feedback_accuracy(),
+            "validation_metrics": validation_metrics,
             "model_improvements": self._suggest_improvements()
         }
         
@@ -256,30 +269,23 @@ class FeedbackBasedRetrainer:
     
     def _calculate_feedback_accuracy(self):
         """计算反馈数据的准确率"""
-        if not self.feedback_data:
+        if not self.feedback_summary.get('total'):
             return 0.0
             
-        accurate = sum(1 for f in self.feedback_data if f.get('user_feedback') == 'accurate')
-        return accurate / len(self.feedback_data)
+        return self.feedback_summary['accurate'] / self.feedback_summary['total']
     
     def _suggest_improvements(self):
         """建议改进措施"""
         suggestions = []
         
-        # 分析反馈数据
-        high_conf_errors = [
-            f for f in self.feedback_data 
-            if f.get('user_feedback') == 'inaccurate' and f.get('predicted_confidence', 0) > 0.8
-        ]
+        # 分析反馈数据（load_feedback_data 汇总的结果）
+        high_conf_errors = self.feedback_summary.get('high_confidence_errors', 0)
         
         if high_conf_errors:
-            suggestions.append(f"发现 {len(high_conf_errors)} 个高置信度错误，需要重点关注")
+            suggestions.append(f"发现 {high_conf_errors} 个高置信度错误，需要重点关注")
         
         # 分析情感分布
-        sentiment_counts = {}
-        for f in self.feedback_data:
-            sentiment = f.get('predicted_sentiment')
-            sentiment_counts[sentiment] = sentiment_counts.get(sentiment, 0) + 1
+        sentiment_counts = self.feedback_summary.get('sentiments', {})
         
         if sentiment_counts:
             max_count = max(sentiment_counts.values())
@@ -291,41 +297,57 @@ class FeedbackBasedRetrainer:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="Fine-tune the sentiment model on user feedback")
+    parser.add_argument('--model-path', default="../models/finbert")
+    parser.add_argument('--feedback-dir', default="../feedback_data")
+    parser.add_argument('--output-dir', default="./retrained_model",
+                        help="checkpoints; rerun to resume an interrupted run on the same data")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--learning-rate', type=float, default=5e-5)
+    parser.add_argument('--accumulation-steps', type=int, default=1,
+                        help="batches per optimizer step (effective batch = batch size x steps)")
+    parser.add_argument('--patience', type=int, default=2, help="epochs without val loss improvement before stopping")
+    parser.add_argument('--mixed-precision', choices=MIXED_PRECISION_MODES, default='auto',
+                        help="bfloat16 compute; auto enables it when the CPU supports it")
+    args = parser.parse_args()
+    
     print("🤖 FinKnows 模型重训练工具")
     print("=" * 50)
     
-    retrainer = FeedbackBasedRetrainer()
+    retrainer = FeedbackBasedRetrainer(args.model_path, args.feedback_dir)
     
     # 加载模型
-    retrainer.load_model_and_tokenizer()
+    retrainer.load_model_and_tokenizer(args.mixed_precision)
     
-    # 加载反馈数据
-    if not retrainer.load_feedback_data():
+    # 准备训练数据（读取新增反馈时同时更新反馈统计）
+    training_data = retrainer.prepare_training_data()
+    if training_data is None or not retrainer.load_feedback_data(training_data):
         print("❌ 无法加载反馈数据，退出")
         return
-    
-    # 准备训练数据
-    training_data = retrainer.prepare_training_data()
-    if not training_data:
+    if not len(training_data):
         print("❌ 没有足够的训练数据，退出")
         return
     
     # 创建数据集
-    train_dataset, val_dataset = retrainer.create_dataset(training_data)
+    train_dataset, val_dataset = retrainer.create_dataset(training_data, batch_size=args.batch_size)
     if not train_dataset or not val_dataset:
         print("❌ 无法创建数据集，退出")
         return
     
     # 重训练模型
-    if retrainer.retrain_model(train_dataset, val_dataset):
+    # 新反馈会追加分片：训练数据变了就不再续训上一次中断的检查点
+    run_key = {'shards': training_data.manifest['shards'], 'batch_size': args.batch_size}
+    if retrainer.retrain_model(train_dataset, val_dataset, args.output_dir, args.epochs, args.learning_rate,
+                               args.accumulation_steps, args.patience, run_key):
         # 保存模型
         output_dir = retrainer.save_retrained_model()
         if output_dir:
             # 评估模型
-            retrainer.evaluate_model()
+            metrics = retrainer.evaluate_model(val_dataset)
             
             # 生成报告
-            retrainer.generate_retraining_report(training_data, output_dir)
+            retrainer.generate_retraining_report(training_data, output_dir, metrics)
             
             print(f"\n🎉 模型重训练完成！")
             print(f"📁 新模型保存在: {output_dir}")